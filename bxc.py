@@ -4,99 +4,447 @@
 # Requires Python3 >= 3.10
 
 # --------------------------------------------------------------------
+# Only the modules needed to parse the command line are imported here:
+# the compiler itself (PLY, parser tables, passes, backend...), the
+# server and the parallel machinery are imported by the functions
+# using them, so that `--help` or a build cache hit never load them.
+# See unit_tests/bench_startup.py.
+
+from __future__ import annotations
+
 import argparse
 import os
 import subprocess as sp
 import sys
+import typing as tp
+
+from bxlib.bxtoolchain  import EMITS, commands as gcc_commands
+
+if tp.TYPE_CHECKING:
+    import asyncio
+    import concurrent.futures as cf
+
+    from bxlib.bxbuildcache import BuildCache
+    from bxlib.bxtiming     import PassTimer
+
+TARGET  = 'x64-linux'
+PARSERS = ('ply', 'rd')                 # See bxlib.bxapi.PARSERS
 
-from bxlib.bxast        import *
-from bxlib.bxerrors     import Reporter, DefaultReporter
-from bxlib.bxparser     import Parser
-from bxlib.bxmm         import MM
-from bxlib.bxtychecker  import check as tycheck
-from bxlib.bxasmgen     import AsmGen
-from bxlib.bxtac        import *
-from bxlib.bxcfg        import tac2cfg, cfg2tac, uce, jthreading
+# Format of the written TAC -> extension. Files with the extension of
+# a saved (bin/jsonl) format are accepted as inputs. See bxlib/bxtacio.py
+TAC_FORMATS = { 'text': 'tac', 'bin': 'btac', 'jsonl': 'jtac' }
+TAC_INPUTS  = ('.btac', '.jtac')
 
 # ====================================================================
 # Parse command line arguments
 
 def parse_args():
-    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+    parser = argparse.ArgumentParser(
+        prog                  = os.path.basename(sys.argv[0]),
+        fromfile_prefix_chars = '@',
+    )
 
     parser.add_argument("--tac", "-t", action = "store_true", help = "flag to generate intermediate TAC")
-    parser.add_argument('input', help = 'input file (.bx)')
+    parser.add_argument("--emit", choices = list(EMITS), default = 'exe',
+                        help = "stop after producing the TAC, assembly, object file or executable (default: %(default)s)")
+    parser.add_argument("--tac-format", choices = list(TAC_FORMATS), default = 'text',
+                        help = "write the TAC as text, or in a binary/JSON-lines format that can be compiled again (default: %(default)s)")
+    parser.add_argument("--no-optimize", action = "store_true",
+                        help = "skip the CFG optimizations (e.g. to save munched TAC)")
+    parser.add_argument("--parser", choices = PARSERS, default = 'ply',
+                        help = "use the PLY parser, or the hand-written one (default: %(default)s)")
+    parser.add_argument("--flat-ast", action = "store_true",
+                        help = "store the AST in flat arrays, using less memory on huge inputs")
+    parser.add_argument("--no-cache", action = "store_true",
+                        help = "do not reuse nor store previously generated assembly")
+    parser.add_argument("--jobs", "-j", type = int, metavar = 'N', default = None,
+                        help = "compile with N parallel jobs, skipping up-to-date executables")
+    parser.add_argument("--proc-jobs", type = int, metavar = 'N', default = None,
+                        help = "optimize & lower the procedures of each file with N parallel jobs")
+    parser.add_argument("--server", action = "store_true",
+                        help = "run as a resident compile server (see bxclient.py)")
+    parser.add_argument("--socket", default = None,
+                        help = "path of the server socket (default: $XDG_RUNTIME_DIR/bxc-$UID.sock)")
+    parser.add_argument("--idle-timeout", type = float, metavar = 'SECONDS', default = 600,
+                        help = "stop the server after SECONDS without requests (default: %(default)s)")
+    parser.add_argument("--time-passes", action = "store_true",
+                        help = "report the time spent & IR sizes in each compiler phase")
+    parser.add_argument("--time-passes-json", metavar = 'FILE', default = None,
+                        help = "write the --time-passes records as JSON to FILE")
+    parser.add_argument("--mem-report", action = "store_true",
+                        help = "report the peak & retained memory, and top allocation sites, of each phase")
+    parser.add_argument('input', nargs = '*', help = 'input files (.bx, or saved TAC), or @FILE to read them from FILE')
 
     aout = parser.parse_args()
 
-    if os.path.splitext(aout.input)[1].lower() != '.bx':
-        parser.error('input filename must end with the .bx extension')
+    if aout.server:
+        if aout.input:
+            parser.error('no input file is accepted in server mode')
+        return aout
+
+    if not aout.input:
+        parser.error('at least one input file is required')
+
+    for input in aout.input:
+        if os.path.splitext(input)[1].lower() not in ('.bx',) + TAC_INPUTS:
+            parser.error(f'input filename must end with the .bx, .btac or .jtac extension: {input}')
+
+    # Inputs are identified by their names (e.g. in the timing reports),
+    # and their outputs are named after their basenames, in the current
+    # directory: inputs sharing a basename would overwrite each other's
+    # outputs (concurrently with --jobs)
+    seen = dict()
+
+    for input in aout.input:
+        basename = output_basename(input)
+        if basename in seen:
+            if os.path.normpath(input) == os.path.normpath(seen[basename]):
+                parser.error(f'input file given more than once: {input}')
+            parser.error(f'input files {seen[basename]} and {input} would write the same output files ({basename}.*)')
+        seen[basename] = input
+
+    if aout.jobs is not None and aout.jobs < 1:
+        parser.error('the number of jobs must be positive')
+
+    if aout.proc_jobs is not None:
+        if aout.proc_jobs < 1:
+            parser.error('the number of jobs must be positive')
+        if aout.jobs is not None:
+            parser.error('--jobs and --proc-jobs cannot be used together')
+
+    if aout.time_passes_json is not None:
+        aout.time_passes = True
+
+    if (aout.time_passes or aout.mem_report) and aout.jobs is not None:
+        parser.error('--time-passes/--mem-report cannot be used with --jobs')
 
     return aout
 
 # ====================================================================
-# Main entry point
+# Compile a single file
 
-def _main():
-    args = parse_args()
-    basename = os.path.splitext(args.input)[0]
-    basename = os.path.basename(basename)
+def output_basename(filename: str) -> str:
+    return os.path.basename(os.path.splitext(filename)[0])
+
+def output_filename(filename: str, emit: str, tac_format: str = 'text') -> str:
+    if emit == 'tac':
+        return f'{output_basename(filename)}.{TAC_FORMATS[tac_format]}'
+    return f'{output_basename(filename)}.{EMITS[emit]}'
+
+def is_tac_input(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in TAC_INPUTS
+
+def wants_tac(args) -> bool:
+    return args.tac or args.emit == 'tac'
+
+def open_cache(args) -> BuildCache | None:
+    if args.no_cache:
+        return None
+
+    from bxlib.bxbuildcache import BuildCache
+    return BuildCache.open()
+
+def compile_to_asm(
+        args,
+        filename : str,
+        cache    : BuildCache | None = None,
+        pool     : cf.Executor | None = None,
+        timer    : PassTimer | None = None,
+) -> bool:
+    """
+    Compiles `filename` with bxlib.bxapi.compile_source (or, for saved
+    TAC, bxlib.bxapi.compile_tac), producing the assembly file
+    `basename.s` in the current directory (or only the TAC file
+    `basename.tac`, `.btac` or `.jtac` when emitting TAC). If a build
+    cache is given, unchanged files & procedures are not recompiled.
+    If a pool is given, procedures are optimized & lowered in parallel.
+    A timer (None to disable timing) records the time of each phase.
+    """
+    basename = output_basename(filename)
 
     try:
-        with open(args.input, 'r') as stream:
+        with open(filename, 'rb' if is_tac_input(filename) else 'r') as stream:
             prgm = stream.read()
 
     except IOError as e:
-        print(f'cannot read input file {args.input}: {e}')
-        exit(1)
+        print(f'cannot read input file {filename}: {e}')
+        return False
 
-    reporter = DefaultReporter(source = prgm)
-    prgm = Parser(reporter = reporter).parse(prgm)
+    # An unchanged file is looked up before loading the compiler. When
+    # timing, compile_cached does (and records) the lookup instead.
+    if cache is not None and timer is None and not is_tac_input(filename) \
+       and not wants_tac(args) and not args.no_optimize:
+        path = cache.path(cache.file_key(prgm, TARGET))
+        if path is not None:
+            return copy_asm(basename, path)
 
-    if prgm is None:
-        exit(1)
+    from bxlib.bxapi    import CompileOptions, compile_source, compile_tac
+    from bxlib.bxtiming import NO_TIMER
 
-    if not tycheck(prgm, reporter = reporter):
-        exit(1)
+    options = CompileOptions(
+        target   = TARGET,
+        cache    = cache,
+        pool     = pool,
+        timer    = NO_TIMER if timer is None else timer,
+        parser   = args.parser,
+        flat     = args.flat_ast,
+        optimize = not args.no_optimize,
+    )
 
-    tac = MM.mm(prgm)
+    if is_tac_input(filename):
+        from bxlib.bxtacio import loads as load_tac
 
-    for decl in tac:
-        match decl:
-            case TACProc(tac = ptac):
-                # We here do TAC -> CFG -> JTHREADING -> UCE -> TAC
-                # Other CFG-based optimizations should be inserted here
-                decl.tac = cfg2tac(uce(jthreading(tac2cfg(ptac))))
+        try:
+            stage, tac = load_tac(prgm)
 
+        except ValueError as e:
+            print(f'cannot read input file {filename}: {e}')
+            return False
 
-    if args.tac : 
-        try :
-            with open(f"{basename}.tac", "w") as stream : 
-                for tac_cmd in tac :
-                    stream.write(repr(tac_cmd) + "\n\n") 
+        result = compile_tac(tac, stage, options)
 
-        except IOError as e:
-            print(f'cannot write TAC file {args.output}: {e}')
-            exit(1)
+    else:
+        # The TAC is not available for cached files/procedures: when
+        # it is needed, it is computed (or taken from the TAC cache)
+        # and then lowered
+        result = compile_source(
+            prgm,
+            emit    = 'tac' if wants_tac(args) else 'asm',
+            options = options,
+        )
+
+    print(result.messages, end = '', file = sys.stderr)
 
+    if result.error is not None:
+        raise result.error
 
-    abk = AsmGen.get_backend('x64-linux')
-    asm = abk.lower(tac)
+    if not result.ok:
+        return False
 
+    if wants_tac(args):
+        if not write_tac(args, basename, result):
+            return False
 
+    if args.emit == 'tac':
+        return True
 
+    # Unless taken from the cache, the assembly is written to the
+    # output file as it is produced
     try:
         with open(f'{basename}.s', 'w') as stream:
-            stream.write(asm)
+            written = result.write_asm(stream)
 
     except IOError as e:
-        print(f'cannot write output file {args.output}: {e}')
-        exit(1)
+        print(f'cannot write output file {basename}.s: {e}')
+        return False
+
+    if result.error is not None:
+        raise result.error
+
+    return written
+
+def write_tac(args, basename: str, result) -> bool:
+    filename = f'{basename}.{TAC_FORMATS[args.tac_format]}'
+
+    try:
+        if args.tac_format == 'text':
+            with open(filename, 'w') as stream:
+                stream.write(result.tac_text())
+        else:
+            from bxlib.bxtacio import dump as dump_tac
+
+            with open(filename, 'wb') as stream:
+                dump_tac(result.tac, stream, args.tac_format, result.stage)
+
+    except IOError as e:
+        print(f'cannot write TAC file {filename}: {e}')
+        return False
+
+    return True
+
+def copy_asm(basename: str, path: str) -> bool:
+    import shutil
+
+    try:
+        with open(path, 'r') as entry, open(f'{basename}.s', 'w') as stream:
+            shutil.copyfileobj(entry, stream)
+
+    except IOError as e:
+        print(f'cannot write output file {basename}.s: {e}')
+        return False
+
+    return True
+
+def toolchain(args, filename: str) -> list[list[str]]:
+    """
+    Returns the commands assembling (& linking) the output of compile_to_asm
+    """
+    return gcc_commands(output_basename(filename), args.emit)
+
+def compile_file(
+        args,
+        filename : str,
+        cache    : BuildCache | None = None,
+        pool     : cf.Executor | None = None,
+        timer    : PassTimer | None = None,
+) -> bool:
+    if not compile_to_asm(args, filename, cache, pool, timer):
+        return False
 
-    bxruntime = os.path.join(os.path.dirname(__file__), 'bxlib', 'bxruntime.c')
+    for cmd in toolchain(args, filename):
+        if timer is None:
+            status = sp.call(cmd)
+        else:
+            with timer.phase('gcc'):
+                status = sp.call(cmd)
+        if status != 0:
+            return False
 
-    sp.call(['gcc', '-g', '-c', '-o', f'{basename}.o', f'{basename}.s'])
-    sp.call(['gcc', '-g', '-o', f'{basename}.exe', bxruntime, f'{basename}.o'])
+    return True
+
+# ====================================================================
+# Parallel compilation
+#
+# The front/middle/back ends run in a pool of worker processes (each
+# with its own warm parser), while the assembling & linking of the
+# files that are done with the Python phases run as asynchronous gcc
+# subprocesses, overlapping with the compilation of the other files.
+
+_worker_cache = None
+
+def _worker_init(args):
+    global _worker_cache
+    _worker_cache = open_cache(args)
+
+def _worker_compile(args, filename: str) -> bool:
+    return compile_to_asm(args, filename, _worker_cache)
+
+def is_up_to_date(args, filename: str) -> bool:
+    output = output_filename(filename, args.emit, args.tac_format)
+    try:
+        return os.path.getmtime(output) >= os.path.getmtime(filename)
+    except OSError:
+        return False
+
+async def _run_toolchain(args, filename: str, gcc: asyncio.Semaphore) -> bool:
+    import asyncio
+
+    async with gcc:
+        for cmd in toolchain(args, filename):
+            process = await asyncio.create_subprocess_exec(*cmd)
+            if await process.wait() != 0:
+                return False
+    return True
+
+async def _compile_all(args, filenames: list[str]) -> list[bool]:
+    import asyncio
+    import concurrent.futures as cf
+
+    loop = asyncio.get_running_loop()
+    gcc  = asyncio.Semaphore(args.jobs)
+
+    with cf.ProcessPoolExecutor(args.jobs, initializer = _worker_init, initargs = (args,)) as pool:
+        async def build(filename: str) -> bool:
+            if is_up_to_date(args, filename):
+                return True
+            if not await loop.run_in_executor(pool, _worker_compile, args, filename):
+                return False
+            return await _run_toolchain(args, filename, gcc)
+
+        return await asyncio.gather(*(build(x) for x in filenames))
+
+def compile_parallel(args, filenames: list[str]) -> list[bool]:
+    import asyncio
+
+    return asyncio.run(_compile_all(args, filenames))
+
+# ====================================================================
+# --time-passes / --mem-report reports
+
+def new_timer(args) -> PassTimer | None:
+    if not (args.time_passes or args.mem_report):
+        return None
+
+    from bxlib.bxtiming import PassTimer, MemoryTracker
+
+    return MemoryTracker() if args.mem_report else PassTimer()
+
+def report_timers(args, timers: dict[str, PassTimer]):
+    from bxlib.bxtiming import dump_json
+
+    for filename, timer in timers.items():
+        print(f'==== {filename}', file = sys.stderr)
+        if args.time_passes:
+            timer.report(sys.stderr)
+            print(file = sys.stderr)
+        if args.mem_report:
+            timer.mem_report(sys.stderr)
+            print(file = sys.stderr)
+
+    if args.time_passes_json is not None:
+        try:
+            with open(args.time_passes_json, 'w') as stream:
+                dump_json(timers, stream)
+
+        except IOError as e:
+            print(f'cannot write output file {args.time_passes_json}: {e}')
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args = parse_args()
+
+    if args.mem_report:
+        import tracemalloc
+        tracemalloc.start()
+
+    if args.server:
+        from bxlib.bxserver import CompileServer, default_socket_path
+
+        path = args.socket or default_socket_path()
+
+        try:
+            server = CompileServer(
+                path,
+                idle_timeout = args.idle_timeout if args.idle_timeout > 0 else None,
+                parser       = args.parser,
+            )
+
+        except OSError as e:
+            print(f'cannot start the compile server at {path}: {e}')
+            exit(1)
+
+        server.serve()
+        return
+
+    if args.jobs is None:
+        import contextlib as cl
+
+        cache = open_cache(args)
+
+        with cl.ExitStack() as stack:
+            pool = None
+            if args.proc_jobs is not None and args.proc_jobs > 1:
+                import concurrent.futures as cf
+                pool = stack.enter_context(cf.ProcessPoolExecutor(args.proc_jobs))
+
+            timers  = { x: new_timer(args) for x in args.input }
+            results = [compile_file(args, x, cache, pool, timers[x]) for x in args.input]
+
+        if args.time_passes or args.mem_report:
+            report_timers(args, timers)
+    else:
+        results = compile_parallel(args, args.input)
+
+    results = list(zip(args.input, results))
+
+    if len(results) > 1:
+        for filename, ok in results:
+            print(f'{filename}: {"ok" if ok else "FAILED"}', file = sys.stderr)
+
+    if not all(ok for _, ok in results):
+        exit(1)
 
 # --------------------------------------------------------------------
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Thin client for the resident compile server (`bxc.py --server`).
+#
+# Only the standard library is imported, so that a request costs little
+# more than the interpreter startup. The protocol is documented in
+# bxlib/bxserver.py.
+
+# --------------------------------------------------------------------
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# ====================================================================
+# Must be kept in sync with bxlib.bxserver.default_socket_path
+
+def default_socket_path() -> str:
+    rundir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(rundir, f'bxc-{os.getuid()}.sock')
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--tac", "-t", action = "store_true", help = "flag to generate intermediate TAC")
+    parser.add_argument("--socket", default = default_socket_path(),
+                        help = "path of the server socket (default: %(default)s)")
+    parser.add_argument('input', help = 'input file (.bx)')
+
+    aout = parser.parse_args()
+
+    if os.path.splitext(aout.input)[1].lower() != '.bx':
+        parser.error('input filename must end with the .bx extension')
+
+    return aout
+
+# ====================================================================
+# Send one compilation request
+
+def request(path: str, source: str, tac: bool = False) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(dict(source = source, tac = tac)).encode('utf-8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+
+        with sock.makefile('rb') as stream:
+            return json.loads(stream.readline())
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args = parse_args()
+    basename = os.path.basename(os.path.splitext(args.input)[0])
+
+    try:
+        with open(args.input, 'r') as stream:
+            prgm = stream.read()
+
+    except IOError as e:
+        print(f'cannot read input file {args.input}: {e}')
+        exit(1)
+
+    try:
+        reply = request(args.socket, prgm, tac = args.tac)
+
+    except (OSError, ValueError) as e:
+        print(f'cannot reach the compile server at {args.socket}: {e}')
+        exit(1)
+
+    print(reply['diagnostics'], end = '', file = sys.stderr)
+
+    if not reply['ok']:
+        exit(1)
+
+    outputs = [(f'{basename}.s', reply['asm'])]
+    if args.tac:
+        outputs.append((f'{basename}.tac', reply['tac']))
+
+    for filename, contents in outputs:
+        try:
+            with open(filename, 'w') as stream:
+                stream.write(contents)
+
+        except IOError as e:
+            print(f'cannot write output file {filename}: {e}')
+            exit(1)
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
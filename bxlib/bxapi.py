@@ -0,0 +1,209 @@
+# --------------------------------------------------------------------
+import concurrent.futures as cf
+import dataclasses as dc
+import functools as ft
+import io
+import typing as tp
+
+from typing import Optional as Opt
+
+from .bxbuildcache import BuildCache
+from .bxdriver     import frontend, middleend, optimize_all, write_backend, compile_cached
+from .bxerrors     import Diagnostic, CollectingReporter, DefaultReporter
+from .bxparser     import Parser
+from .bxrdparser   import RDParser
+from .bxtac        import *
+from .bxtacio      import dumps as dump_tac, loads as load_tac
+from .bxtiming     import PassTimer, NO_TIMER
+
+# ====================================================================
+# In-memory compilation API
+#
+#   result = compile_source(text)
+#   if result.ok:
+#       print(result.asm)
+#   else:
+#       print(result.messages)
+#
+# Nothing is read from, nor written to, the filesystem (except for the
+# build cache, if one is given in the options). All the compilations of
+# a process share the same (warm) parser.
+#
+# The pipeline can also be resumed from a saved TAC program (see
+# bxtacio.py & compile_tac).
+
+EMITS = ('tac', 'asm')
+
+# The PLY parser & the hand-written one (same ASTs, see bxrdparser.py)
+PARSERS = { 'ply': Parser, 'rd': RDParser }
+
+@ft.cache
+def shared_parser(kind: str = 'ply') -> Parser | RDParser:
+    """
+    Returns the parser (of the given kind) of this process, built on
+    first use. Only its per-program state (reporter, lexer position) is
+    reset between two compilations.
+    """
+    return PARSERS[kind](reporter = DefaultReporter(source = ''))
+
+# --------------------------------------------------------------------
+@dc.dataclass
+class CompileOptions:
+    target   : str              = 'x64-linux'
+    cache    : Opt[BuildCache]  = None      # Reuse & store the generated assembly/TAC
+    pool     : Opt[cf.Executor] = None      # Optimize & lower procedures in parallel
+    timer    : PassTimer        = NO_TIMER
+    parser   : str              = 'ply'     # See PARSERS
+    flat     : bool             = False     # Use a flat AST (see bxflatast.py)
+    optimize : bool             = True      # Run the CFG optimizations
+
+# --------------------------------------------------------------------
+@dc.dataclass
+class CompileResult:
+    ok          : bool
+    diagnostics : list[Diagnostic]
+    messages    : str                                   # The diagnostics, formatted
+    tac         : Opt[list[TACProc | TACVar]] = None    # None if not computed
+    stage       : str = 'opt'                           # Stage of the TAC (see bxtacio.STAGES)
+    error       : Opt[Exception] = None                 # Internal error, if the compiler crashed
+    options     : CompileOptions = dc.field(default_factory = CompileOptions, repr = False)
+    _asm        : Opt[str]       = dc.field(default = None, repr = False)
+    _writer     : Opt[tp.Callable[[tp.TextIO], None]] = dc.field(default = None, repr = False)
+
+    @property
+    def asm(self) -> Opt[str]:
+        """
+        The assembly of the program (lowered on first access), or None
+        if the program is not valid or if lowering it failed (see error)
+        """
+        if self._asm is None and self.ok:
+            aout = io.StringIO()
+            if self._lower(aout):
+                self._asm = aout.getvalue()
+        return self._asm
+
+    def write_asm(self, stream: tp.TextIO) -> bool:
+        """
+        Writes the assembly of the program to `stream`. If it has not
+        been lowered yet, it is written as it is lowered, and not kept.
+        Returns False if the program is not valid or if lowering it
+        failed (see error).
+        """
+        if self._asm is not None:
+            stream.write(self._asm)
+            return True
+        return self.ok and self._lower(stream)
+
+    def _lower(self, stream: tp.TextIO) -> bool:
+        # Internal errors of the (lazy) middle & back ends are recorded
+        # as those of the front end. I/O errors (e.g. of `stream`) are
+        # not internal errors, and are raised.
+        try:
+            if self._writer is not None:
+                self._writer(stream)
+            elif self.tac is not None:
+                write_backend(stream, self.tac, self.options.target, self.options.pool, self.options.timer)
+            else:
+                return False
+
+        except OSError:
+            raise
+
+        except Exception as e:
+            self.ok, self.error = False, e
+            return False
+
+        return True
+
+    def tac_text(self) -> Opt[str]:
+        if self.tac is None:
+            return None
+        return ''.join(repr(x) + '\n\n' for x in self.tac)
+
+# --------------------------------------------------------------------
+def compile_source(
+        text    : str,
+        emit    : str = 'asm',
+        options : Opt[CompileOptions] = None,
+) -> CompileResult:
+    """
+    Compiles the BX program `text`:
+
+     - emit='tac' stops after the middle end. The TAC is then always
+       computed, but can be taken from (and is stored in) the build
+       cache;
+     - emit='asm' also produces the assembly. What is not taken from
+       the build cache is lowered on demand (see CompileResult.asm &
+       CompileResult.write_asm), so that it can be streamed.
+
+    An internal error of the compiler is returned in the `error` field
+    of the result (together with the diagnostics reported before it),
+    also when it happens while lowering the assembly on demand.
+    """
+    if emit not in EMITS:
+        raise ValueError(f'cannot emit {emit} in memory')
+
+    options  = CompileOptions() if options is None else options
+    parser   = shared_parser(options.parser)
+    reporter = CollectingReporter(source = text)
+    stage    = 'opt' if options.optimize else 'mm'
+
+    def result(ok: bool, **kw) -> CompileResult:
+        return CompileResult(ok, reporter.diagnostics, reporter.text, options = options, stage = stage, **kw)
+
+    # An internal error is returned with the diagnostics reported before
+    # it, that would otherwise be lost with the reporter
+    try:
+        # The assembly cache only holds optimized code
+        if emit == 'asm' and options.cache is not None and options.optimize:
+            writer = compile_cached(
+                text, parser, reporter, options.cache,
+                options.target, options.pool, options.timer, options.flat,
+            )
+            return result(writer is not None, _writer = writer)
+
+        if emit == 'tac' and options.cache is not None:
+            with options.timer.phase('cache-lookup'):
+                key  = options.cache.tac_key(text, stage)
+                data = options.cache.get_bytes(key)
+
+                try:
+                    if data is not None:
+                        return result(True, tac = load_tac(data)[1])
+                except ValueError:
+                    pass
+
+        prgm = frontend(text, parser, reporter, options.timer, options.flat)
+
+        if prgm is None:
+            return result(False)
+
+        tac = middleend(prgm, options.pool, options.timer, options.optimize)
+
+        if emit == 'tac' and options.cache is not None:
+            options.cache.put_bytes(key, dump_tac(tac, stage = stage))
+
+        return result(True, tac = tac)
+
+    except Exception as e:
+        return result(False, error = e)
+
+# --------------------------------------------------------------------
+def compile_tac(
+        tac     : list[TACProc | TACVar],
+        stage   : str = 'opt',
+        options : Opt[CompileOptions] = None,
+) -> CompileResult:
+    """
+    Resumes the compilation of a TAC program (e.g. loaded with
+    bxtacio.load) at the given stage: munched TAC ('mm') is first
+    optimized (unless disabled in the options). The assembly is then
+    lowered on demand, as for compile_source.
+    """
+    options = CompileOptions() if options is None else options
+
+    if stage == 'mm' and options.optimize:
+        optimize_all(tac, options.pool, options.timer)
+        stage = 'opt'
+
+    return CompileResult(True, [], '', tac = tac, stage = stage, options = options)
@@ -1,26 +1,41 @@
 # --------------------------------------------------------------------
 import abc
+import concurrent.futures as cf
+import io
+import typing as tp
 
-from .bxtac import *
+from typing import Optional as Opt
+
+from .bxctac    import CompactProc
+from .bxsymbols import Kind, Symbol
+from .bxtac     import *
 
 # --------------------------------------------------------------------
 class AsmGen(abc.ABC):
     BACKENDS   = {}
+    CHUNKSIZE  = 32             # Number of declarations per parallel task
+    HANDLERS   = ()             # Integer opcode -> _emit_* method
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        cls.HANDLERS = tuple(
+            getattr(cls, f'_emit_{x}', None) for x in OPNAMES
+        ) + (cls._emit_label,)
 
     def __init__(self):
         self._tparams = dict()
         self._temps   = dict()
         self._current_index = 0 #represents the byte size of the stack divided by 8
-        self._temp_sizes : dict[str, int] = dict() 
+        self._temp_sizes : dict[Symbol, int] = dict() 
 
         self._asm     = []
 
-    def set_temp_sizes(self, temp_sizes : dict[str, int]):
+    def set_temp_sizes(self, temp_sizes : dict[Symbol, int]):
         self._temp_sizes = temp_sizes
 
-    def _temp(self, temp):
-        if temp.startswith('@'):
-            return self._format_temp(temp[1:])
+    def _temp(self, temp: Symbol):
+        if temp.kind == Kind.GLOBAL:
+            return self._format_temp(temp.name[1:])
         if temp in self._tparams:
             return self._format_param(self._tparams[temp])
         
@@ -51,18 +66,29 @@ class AsmGen(abc.ABC):
     def _format_param(self, index):
         pass
 
-    def __call__(self, instr: TAC | str):
-        if isinstance(instr, str):
-            self._asm.append(instr)
+    def __call__(self, instr: TAC | Symbol):
+        if isinstance(instr, Symbol):
+            self._emit_label(instr)
             return
 
-        opcode = instr.opcode
-        args   = instr.arguments[:]
+        handler = self.HANDLERS[OPIDS[instr.opcode]]
 
-        if instr.result is not None:
-            args.append(instr.result)
+        if instr.result is None:
+            handler(self, *instr.arguments)
+        else:
+            handler(self, *instr.arguments, instr.result)
 
-        getattr(self, f'_emit_{opcode}')(*args)
+    def emit_compact(self, proc: CompactProc):
+        """
+        Emits the body of a compact procedure
+        """
+        handlers = self.HANDLERS
+
+        for op, arguments, result in proc.instructions():
+            if result is None:
+                handlers[op](self, *arguments)
+            else:
+                handlers[op](self, *arguments, result)
 
     def _get_asm(self, opcode, *args):
         if not args:
@@ -173,11 +199,11 @@ class AsmGen_x64_Linux(AsmGen):
         self._emit('callq', 'printf@PLT')
 
     def _emit_jmp(self, lbl):
-        self._emit('jmp', lbl)
+        self._emit('jmp', lbl.name)
 
     def _emit_cjmp(self, cd, op, lbl):
         self._emit('cmpq', '$0', self._temp(op))
-        self._emit(cd, lbl)
+        self._emit(cd, lbl.name)
 
     def _emit_jz(self, op, lbl):
         self._emit_cjmp('jz', op, lbl)
@@ -215,7 +241,7 @@ class AsmGen_x64_Linux(AsmGen):
         for x in self._params[6:][::-1]:
             self._emit('pushq', self._temp(x))
 
-        self._emit('callq', lbl)
+        self._emit('callq', lbl.name)
 
         if qarg > 0:
             self._emit('addq', f'${qarg + qarg & 0x1}', '%rsp')
@@ -230,7 +256,7 @@ class AsmGen_x64_Linux(AsmGen):
             self._emit('movq', self._temp(ret), '%rax')
         self._emit('jmp', self._endlbl)
 
-    def _emit_load(self, address : str | tuple[str, int], dest):
+    def _emit_load(self, address : Symbol | tuple[Symbol, int], dest):
         #argument overloads
         if isinstance(address, tuple):
             address_reg = address[0]
@@ -243,7 +269,7 @@ class AsmGen_x64_Linux(AsmGen):
         self._emit("movq", f"{offset}(%rax)", "%rbx")
         self._emit("movq", "%rbx", self._temp(dest))
         
-    def _emit_store(self, value_temp, address : str | tuple[str, int]):
+    def _emit_store(self, value_temp, address : Symbol | tuple[Symbol, int]):
         #argument overloads
         if isinstance(address, tuple):
             address_reg = address[0]
@@ -261,7 +287,7 @@ class AsmGen_x64_Linux(AsmGen):
         self._emit("leaq", self._temp(refed), "%rax")
         self._emit("movq", "%rax", self._temp(dest))
 
-    def _emit_alloc(self, bcount : str, bsize : int, dest):
+    def _emit_alloc(self, bcount : Symbol, bsize : int, dest):
         #use runtime malloc
         self._emit('xorq', '%rax', '%rax')
         self._emit("movq", self._temp(bcount), "%rdi")
@@ -270,13 +296,13 @@ class AsmGen_x64_Linux(AsmGen):
         self._emit("movq", "%rax", self._temp(dest))
 
 
-    def _emit_zero_out(self, address_temp : str, nbytes : int):
+    def _emit_zero_out(self, address_temp : Symbol, nbytes : int):
         self._emit("xorq", "%rax", "%rax")
         self._emit("movq", self._temp(address_temp), "%rdi")
         self._emit("movq", f"${nbytes}", "%rsi")
         self._emit("callq", "zero_out")
 
-    def _emit_copy_array(self, dest : str, src : str, nbytes : int):
+    def _emit_copy_array(self, dest : Symbol, src : Symbol, nbytes : int):
         self._emit("xorq", "%rax", "%rax")
         self._emit("movq", self._temp(dest), "%rdi")
         self._emit("movq", self._temp(src), "%rsi")
@@ -285,7 +311,7 @@ class AsmGen_x64_Linux(AsmGen):
 
     
     @classmethod
-    def lower1(cls, tac: TACProc | TACVar) -> list[str]:
+    def lower1(cls, tac: TACProc | CompactProc | TACVar) -> list[str]:
         emitter = cls()
 
         match tac:
@@ -297,7 +323,9 @@ class AsmGen_x64_Linux(AsmGen):
 
                 return emitter._asm
 
-            case TACProc(name, arguments, ptac):
+            case TACProc() | CompactProc():
+                name, arguments = tac.name, tac.arguments
+
                 emitter._endlbl = f'.E_{name}'
                 emitter.set_temp_sizes(tac.temp_sizes)
 
@@ -307,8 +335,11 @@ class AsmGen_x64_Linux(AsmGen):
                 for i, arg in enumerate(arguments[6:]):
                     emitter._tparams[arg] = i
 
-                for instr in ptac:
-                    emitter(instr)
+                if isinstance(tac, CompactProc):
+                    emitter.emit_compact(tac)
+                else:
+                    for instr in tac.tac:
+                        emitter(instr)
 
                 nvars  = len(emitter._temps)
 
@@ -329,9 +360,35 @@ class AsmGen_x64_Linux(AsmGen):
                 ]
 
     @classmethod
-    def lower(cls, tacs: list[TACProc | TACVar]) -> str:
-        aout = [cls.lower1(tac) for tac in tacs]
-        aout = [x for tac in aout for x in tac]
-        return "\n".join(aout) + "\n"
+    def lower_to(
+            cls,
+            stream : tp.TextIO,
+            tacs   : tp.Iterable[TACProc | TACVar],
+            pool   : Opt[cf.Executor] = None,
+    ):
+        """
+        Lowers a TAC program, writing the assembly of each declaration
+        to `stream` as soon as it is produced: only the assembly of one
+        declaration is held in memory at a time. If a (process) pool is
+        given, the declarations are lowered in parallel -- the output
+        order is the same as for sequential lowering.
+        """
+        if pool is None:
+            aout = map(cls.lower1, tacs)
+        else:
+            aout = pool.map(cls.lower1, tacs, chunksize = cls.CHUNKSIZE)
+
+        for lines in aout:
+            stream.write("\n".join(lines))
+            stream.write("\n")
+
+    @classmethod
+    def lower(cls, tacs: list[TACProc | TACVar], pool: Opt[cf.Executor] = None) -> str:
+        """
+        Same as lower_to, but returns the assembly as a string
+        """
+        aout = io.StringIO()
+        cls.lower_to(aout, tacs, pool)
+        return aout.getvalue()
 
 AsmGen.BACKENDS['x64-linux'] = AsmGen_x64_Linux
@@ -1,35 +1,68 @@
 # --------------------------------------------------------------------
 import dataclasses as dc
 import enum
+import weakref
 
 from typing import Optional as Opt
 
 # ====================================================================
 # Parse tree / Abstract Syntax Tree
 
+#
+# All the nodes are slotted dataclasses (no per-instance __dict__), and
+# the positions are stored as flat ranges of ints: the AST of large
+# (e.g. generated) programs is then much smaller.
+# See unit_tests/bench_memory.py.
+
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class Range:
-    start: tuple[int, int]
-    end: tuple[int, int]
+    line      : int
+    column    : int
+    endline   : int
+    endcolumn : int
+
+    @property
+    def start(self) -> tuple[int, int]:
+        return (self.line, self.column)
+
+    @property
+    def end(self) -> tuple[int, int]:
+        return (self.endline, self.endcolumn)
 
     @staticmethod
     def of_position(line: int, column: int):
-        return Range((line, column), (line, column+1))
+        return Range(line, column, line, column+1)
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class AST:
     position: Opt[Range] = dc.field(kw_only = True, default = None)
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class Name(AST):
     value: str
 
 # --------------------------------------------------------------------
+# Types
+#
+# Pointer & array types are hash-consed: building one from canonical
+# targets returns the canonical object of its structure. Types keep
+# their structural equality (e.g. the ASTs of two parsers compare
+# equal), but the canonical ones -- those of the type checker & of the
+# muncher -- compare by identity first, in O(1), however deep they
+# are. Their (structural) hash is computed once, at creation. Struct
+# types are canonical by declaration. The canonical types are weakly
+# held by _TYPES, and are interned again when unpickled.
+#
+# The byte size of a type (see bxtysizer.py) is cached in `nbytes`,
+# and the field offsets of a struct in `attr_lookup`.
+
+_TYPES : weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
 class Type():
-    pass
+    __slots__ = ('__weakref__',)
 
 
 class BasicType(Type, enum.Enum):
@@ -49,83 +82,142 @@ class BasicType(Type, enum.Enum):
             case self.NULL :
                 return 'null' 
 
-@dc.dataclass
+@dc.dataclass(slots = True, eq = False, init = False)
 class PointerType(Type):
     target: Type
+    nbytes: Opt[int] = dc.field(init = False, repr = False, default = None)
+    hash_ : int      = dc.field(init = False, repr = False, default = 0)
+
+    def __new__(cls, target: Type):
+        key  = (cls, id(target))
+        self = _TYPES.get(key)
+        if self is None:
+            self = _TYPES[key] = object.__new__(cls)
+            self.target = target
+            self.nbytes = 8
+            self.hash_  = hash((cls, target))
+        return self
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not PointerType or self.hash_ != other.hash_:
+            return False
+        return self.target == other.target
+
+    def __hash__(self):
+        return self.hash_
+
+    def __reduce__(self):
+        return (PointerType, (self.target,))
     
     def __str__(self):
         return f"{self.target}*"
 
-@dc.dataclass
+@dc.dataclass(slots = True, eq = False, init = False)
 class ArrayType(Type):
     target: Type
     size: int
+    nbytes: Opt[int] = dc.field(init = False, repr = False, default = None)
+    hash_ : int      = dc.field(init = False, repr = False, default = 0)
+
+    def __new__(cls, target: Type, size: int):
+        key  = (cls, id(target), size)
+        self = _TYPES.get(key)
+        if self is None:
+            self = _TYPES[key] = object.__new__(cls)
+            self.target = target
+            self.size   = size
+            self.nbytes = None
+            self.hash_  = hash((cls, target, size))
+        return self
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not ArrayType or self.hash_ != other.hash_:
+            return False
+        return self.size == other.size and self.target == other.target
+
+    def __hash__(self):
+        return self.hash_
+
+    def __reduce__(self):
+        return (ArrayType, (self.target, self.size))
     
     def __str__(self):
         return f"{self.target}[{self.size}]"
 
-@dc.dataclass
+@dc.dataclass(slots = True)
 class StructType(Type):
     #set in parser
     attributes : list[tuple[Name, Type]]
 
     #set during type check
     attr_lookup : Opt[dict[str,   tuple[int, Type]    ]] = dc.field(kw_only = True, default = None)
+    nbytes      : Opt[int] = dc.field(kw_only = True, default = None, repr = False, compare = False)
+
+    def __hash__(self):
+        # Consistent with the (structural) equality
+        return hash(tuple(name.value for name, _ in self.attributes))
 
     def __str__(self):
         return f"struct"
 
 
-@dc.dataclass 
+@dc.dataclass(slots = True)
 class StandinType(Type):
     type_name : Name
 
+    def __hash__(self):
+        return hash(self.type_name.value)
+
 
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class Expression(AST):
     type_: Opt[Type] = dc.field(kw_only = True, default = None)
 
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class BoolExpression(Expression):
     value: bool
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class IntExpression(Expression):
     value: int
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class NullExpression(Expression):
     pass
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class OpAppExpression(Expression):
     operator: str
     arguments: list[Expression]
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class AllocExpression(Expression):
     alloctype : Type
     size : Expression
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class CallExpression(Expression):
     proc: Name
     arguments: list[Expression]
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class PrintExpression(Expression):
     argument: Expression
 
@@ -133,21 +225,21 @@ class PrintExpression(Expression):
 
 # --------------------------------------------------------------------
 class Assignable(Expression):
-    pass
+    __slots__ = ()
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class VarAssignable(Assignable):
     name : Name
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class DerefAssignable(Assignable):
     argument : Assignable
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class ArrayAssignable(Assignable):
     argument : Assignable
     index : Expression
@@ -155,99 +247,99 @@ class ArrayAssignable(Assignable):
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class AttributeAssignable(Assignable):
     argument : Assignable
     attribute : str
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class AttrPointerAssignable(Assignable):
     argument : Assignable
     attribute : str
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class RefExpression(Expression):
     argument: Assignable
 
 
 # --------------------------------------------------------------------
 class Statement(AST):
-    pass
+    __slots__ = ()
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class VarDeclStatement(Statement):
     name: Name
     init: Expression
     type_: Type
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class AssignStatement(Statement):
     lhs: Assignable
     rhs: Expression
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class ExprStatement(Statement):
     expression: Expression
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class PrintStatement(Statement):
     value: Expression
 
 
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class BlockStatement(Statement):
     body: list[Statement]
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class IfStatement(Statement):
     condition: Expression
     then: Statement
     else_: Opt[Statement] = None
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class WhileStatement(Statement):
     condition: Expression
     body: Statement
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class BreakStatement(Statement):
     pass
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class ContinueStatement(Statement):
     pass
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class ReturnStatement(Statement):
     expr: Opt[Expression]
 
 # --------------------------------------------------------------------
 class TopDecl(AST):
-    pass
+    __slots__ = ()
 
 # --------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class GlobVarDecl(TopDecl):
     name: Name
     init: Expression
     type_: Type
 
 #--------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class ProcDecl(TopDecl):
     name: Name
     arguments: list[tuple[Name, Type]]
@@ -255,7 +347,7 @@ class ProcDecl(TopDecl):
     body: Statement
 
 #--------------------------------------------------------------------
-@dc.dataclass
+@dc.dataclass(slots = True)
 class TypedefDecl(TopDecl):
     alias : Name
     original_type : Type
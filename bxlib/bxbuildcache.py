@@ -0,0 +1,198 @@
+# --------------------------------------------------------------------
+from __future__ import annotations
+
+import contextlib as cl
+import hashlib
+import os
+import typing as tp
+
+from typing import Optional as Opt
+
+from .bxcache   import cache_dir
+
+if tp.TYPE_CHECKING:
+    from .bxast import Program
+
+# ====================================================================
+# Content-addressed cache of generated assembly (and TAC)
+#
+# Assembly entries are stored at two granularities:
+#
+#  - whole files, keyed by the source text;
+#  - procedures, keyed by the source text of the procedure and by the
+#    context it is compiled in: the signatures of all the procedures,
+#    the typedefs and the global variables of the program.
+#
+# The TAC of whole files (i.e. the output of the middle end, see
+# bxtacio.py) is stored in binary entries, keyed by the source text
+# and the TAC stage.
+#
+# Since MM numbers temporaries and labels per procedure, the assembly
+# of a procedure only depends on this key. All keys also include a
+# fingerprint of the compiler sources, so that the cache is invalidated
+# whenever the compiler changes.
+
+class BuildCache:
+    def __init__(self, root: str):
+        self.root        = root
+        self.fingerprint = self._compiler_fingerprint()
+
+    @staticmethod
+    def open() -> Opt['BuildCache']:
+        """
+        Returns the build cache living in the user cache directory,
+        or None if caching is disabled
+        """
+        root = cache_dir('asm')
+        return None if root is None else BuildCache(root)
+
+    @staticmethod
+    def _compiler_fingerprint() -> str:
+        h = hashlib.sha256()
+        libdir = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(libdir)):
+            if name.endswith('.py'):
+                with open(os.path.join(libdir, name), 'rb') as stream:
+                    h.update(name.encode('utf-8'))
+                    h.update(stream.read())
+        return h.hexdigest()
+
+    def _key(self, kind: str, *parts: str) -> str:
+        h = hashlib.sha256()
+        h.update(self.fingerprint.encode('utf-8'))
+        h.update(kind.encode('utf-8'))
+        for part in parts:
+            h.update(b'\0')
+            h.update(part.encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def file_key(self, source: str, target: str) -> str:
+        return self._key('file', target, source)
+
+    def tac_key(self, source: str, stage: str) -> str:
+        return self._key('tac', stage, source)
+
+    def proc_keys(self, source: str, prgm: Program, target: str) -> dict[str, str]:
+        """
+        Computes the cache key of every procedure of a parsed program
+        """
+        # Not needed for whole-file lookups, that happen before parsing
+        from .bxast import ProcDecl, GlobVarDecl, TypedefDecl
+
+        lines = source.splitlines()
+
+        context, bodies = [], []
+
+        for decl in prgm:
+            match decl:
+                case ProcDecl(name, _, _, body):
+                    # Only the signature of the procedure is part of
+                    # the context of the other procedures
+                    context.append(_slice(lines, decl.position.start, body.position.start))
+                    bodies.append((name.value, _slice(lines, decl.position.start, decl.position.end)))
+
+                case GlobVarDecl() | TypedefDecl():
+                    context.append(_slice(lines, decl.position.start, decl.position.end))
+
+        context = self._key('context', *context)
+
+        return { name: self._key('proc', target, context, text) for name, text in bodies }
+
+    def path(self, key: str) -> Opt[str]:
+        """
+        Returns the path of the entry `key` (e.g. to stream it), or None
+        if there is no such entry
+        """
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def get(self, key: str) -> Opt[str]:
+        return self._read(key, 'r')
+
+    def put(self, key: str, contents: str):
+        self._write(key, contents, 'w')
+
+    def get_bytes(self, key: str) -> Opt[bytes]:
+        return self._read(key, 'rb')
+
+    def put_bytes(self, key: str, contents: bytes):
+        self._write(key, contents, 'wb')
+
+    @cl.contextmanager
+    def tee(self, key: str, stream: tp.TextIO) -> tp.Iterator[tp.Callable[[str], None]]:
+        """
+        Yields a function writing to `stream`, that also stores what it
+        writes under `key` once the block exits normally. The entry is
+        written to a temporary file as it goes, never held in memory.
+        """
+        path    = self._path(key)
+        tmppath = f'{path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            entry = open(tmppath, 'w')
+        except OSError:
+            entry = None
+
+        def write(contents: str):
+            nonlocal entry
+
+            stream.write(contents)
+
+            if entry is not None:
+                try:
+                    entry.write(contents)
+                except OSError:
+                    # The entry is incomplete: it is not stored
+                    with cl.suppress(OSError):
+                        entry.close()
+                    entry = None
+
+        complete = False
+
+        try:
+            yield write
+            complete = True
+
+        finally:
+            if entry is not None:
+                with cl.suppress(OSError):
+                    entry.close()
+                    if complete:
+                        os.replace(tmppath, path)
+            with cl.suppress(OSError):
+                os.unlink(tmppath)
+
+    def _read(self, key: str, mode: str) -> Opt[str | bytes]:
+        try:
+            with open(self._path(key), mode) as stream:
+                return stream.read()
+        except OSError:
+            return None
+
+    def _write(self, key: str, contents: str | bytes, mode: str):
+        path    = self._path(key)
+        tmppath = f'{path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            with open(tmppath, mode) as stream:
+                stream.write(contents)
+            os.replace(tmppath, path)
+        except OSError:
+            pass
+
+# --------------------------------------------------------------------
+def _slice(lines: list[str], start: tuple[int, int], end: tuple[int, int]) -> str:
+    """
+    Returns the source text between two (line, column) positions
+    """
+    (l1, c1), (l2, c2) = start, end
+
+    if l1 == l2:
+        return lines[l1-1][c1:c2]
+
+    return '\n'.join([lines[l1-1][c1:]] + lines[l1:l2-1] + [lines[l2-1][:c2]])
@@ -0,0 +1,35 @@
+# --------------------------------------------------------------------
+import os
+
+from typing import Optional as Opt
+
+# ====================================================================
+# On-disk cache location
+#
+# The cache directory is taken from $BXC_CACHE_DIR, and defaults to
+# $XDG_CACHE_HOME/bxc (i.e. ~/.cache/bxc). Setting $BXC_CACHE_DIR to
+# the empty string disables all on-disk caching.
+
+def cache_dir(*subdirs: str) -> Opt[str]:
+    """
+    Returns the (created) cache directory, or one of its sub-directories.
+    Returns None if caching is disabled or the directory is not usable.
+    """
+    root = os.environ.get('BXC_CACHE_DIR')
+
+    if root is None:
+        base = os.environ.get('XDG_CACHE_HOME') or \
+               os.path.join(os.path.expanduser('~'), '.cache')
+        root = os.path.join(base, 'bxc')
+
+    if not root:
+        return None
+
+    path = os.path.join(root, *subdirs)
+
+    try:
+        os.makedirs(path, exist_ok = True)
+    except OSError:
+        return None
+
+    return path if os.access(path, os.W_OK) else None
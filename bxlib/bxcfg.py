@@ -1,6 +1,7 @@
 # --------------------------------------------------------------------
-from .bxtac import *
-from .bxmm  import MM
+from .bxtac     import *
+from .bxmm      import MM
+from .bxsymbols import Symbol
 
 # --------------------------------------------------------------------
 class CFGNode:
@@ -23,8 +24,8 @@ def tac2cfg(tac : list[str | TAC]):
     while i < len(tac):
         blocks.append(CFGNode())
 
-        if isinstance(tac[i], str):
-            blocks[-1].label = tac[i][:-1]
+        if isinstance(tac[i], Symbol):
+            blocks[-1].label = tac[i]
             i += 1
         else:
             blocks[-1].label = MM.fresh_label()
@@ -34,7 +35,7 @@ def tac2cfg(tac : list[str | TAC]):
                 blocks[-2].jump = ('jmp', blocks[-1].label)
 
         while i < len(tac):
-            if isinstance(tac[i], str):
+            if isinstance(tac[i], Symbol):
                 break
 
             itac = tac[i]; i += 1
@@ -55,7 +56,7 @@ def tac2cfg(tac : list[str | TAC]):
 
     if not blocks:
         blocks.append(CFGNode())
-        blocks.label = MM.fresh_label()
+        blocks[-1].label = MM.fresh_label()
 
     if blocks[-1].jump is None:
         blocks[-1].jump = ('ret', [])
@@ -66,40 +67,50 @@ def tac2cfg(tac : list[str | TAC]):
 def cfg2tac(cfg: CFG):
     tac, visited = [], set()
 
+    # Depth-first, with an explicit stack of the blocks to emit: the
+    # target of the final jump is emitted first (right after its
+    # source, so that the jump can be dropped), then the targets of
+    # the conditional jumps, in order.
     def block2tac(name: str):
-        if name in visited:
-            return
+        stack = [name]
 
-        visited.add(name)
-        node = cfg.cfg[name]
+        while stack:
+            name = stack.pop()
 
-        tac.append(f'{node.label}:')
-        tac.extend(node.body)
+            if name in visited:
+                continue
 
-        for cjump, args in node.cjumps:
-            tac.append(TAC(cjump, args))
+            visited.add(name)
+            node = cfg.cfg[name]
 
-        match node.jump[0]:
-            case 'ret':
-                tac.append(TAC('ret', node.jump[1]))
+            tac.append(node.label)
+            tac.extend(node.body)
 
-            case 'jmp':
-                tac.append(TAC('jmp', [node.jump[1]]))
+            for cjump, args in node.cjumps:
+                tac.append(TAC(cjump, args))
 
-            case _:
-                assert(False)
+            match node.jump[0]:
+                case 'ret':
+                    tac.append(TAC('ret', node.jump[1]))
 
-        if node.jump[0] == 'jmp':
-            if node.jump[1] not in visited:
-                tac.pop()
-                block2tac(node.jump[1])
+                case 'jmp':
+                    tac.append(TAC('jmp', [node.jump[1]]))
 
-        for cjump in node.cjumps:
-            block2tac(cjump[1][1])
+                case _:
+                    assert(False)
+
+            for cjump in reversed(node.cjumps):
+                stack.append(cjump[1][1])
+
+            if node.jump[0] == 'jmp':
+                if node.jump[1] not in visited:
+                    tac.pop()
+                    stack.append(node.jump[1])
 
     block2tac(cfg.init)
     for name in cfg.cfg.keys():
-        block2tac(name)
+        if name not in visited:
+            block2tac(name)
 
     return tac
 
@@ -107,23 +118,39 @@ def cfg2tac(cfg: CFG):
 def jthreading(cfg: CFG) -> CFG:
     dests = {}
 
+    # Post-order traversal, with an explicit stack of the blocks to
+    # visit: a block is threaded (`None` entry, followed by the block)
+    # once all its successors have been visited.
     def visit(name: str):
-        if name in dests:
-            return
+        stack = [name]
+
+        while stack:
+            name = stack.pop()
+
+            if name is None:
+                name = stack.pop()
+                node = cfg.cfg[name]
+                dests[name] = dests[node.jump]
+                continue
+
+            if name in dests:
+                continue
 
-        node = cfg.cfg[name]
-        dests[name] = name
+            node = cfg.cfg[name]
+            dests[name] = name
 
-        if isinstance(node.jump, str):
-            visit(node.jump)
-        for cjump in node.cjumps:
-            visit(cjump[1][1])
+            if isinstance(node.jump, str) and len(node.body) == 1:
+                stack.append(name)
+                stack.append(None)
 
-        if isinstance(node.jump, str) and len(node.body) == 1:
-            dests[name] = dests[node.jump]
+            for cjump in reversed(node.cjumps):
+                stack.append(cjump[1][1])
+            if isinstance(node.jump, str):
+                stack.append(node.jump)
 
     for name in cfg.cfg.keys():
-        visit(name)
+        if name not in dests:
+            visit(name)
 
     for block in cfg.cfg.values():
         if block.jump[0] == 'jmp':
@@ -140,14 +167,17 @@ def uce(cfg: CFG) -> CFG:
     visited = set()
 
     def visit(name: str):
-        if name in visited:
-            return
-        visited.add(name)
-        node = cfg.cfg[name]
-        if node.jump[0] == 'jmp':
-            visit(node.jump[1])
-        for cjump in node.cjumps:
-            visit(cjump[1][1])
+        worklist = [name]
+        while worklist:
+            name = worklist.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            node = cfg.cfg[name]
+            if node.jump[0] == 'jmp':
+                worklist.append(node.jump[1])
+            for cjump in node.cjumps:
+                worklist.append(cjump[1][1])
 
     visit(cfg.init)
 
@@ -0,0 +1,205 @@
+# --------------------------------------------------------------------
+import array
+import typing as tp
+
+from typing import Optional as Opt
+
+from .bxsymbols import Symbol
+from .bxtac     import *
+
+# ====================================================================
+# Compact Three-Address Code
+#
+# A CompactProc holds the body of a procedure in three flat arrays
+# (one entry, or STRIDE entries, by instruction):
+#
+#  - ops      : the integer opcode (index in bxtac.OPNAMES), or LABEL;
+#  - shapes   : the number of arguments (bits 0-1), whether there is a
+#               result (bit 2) and whether the address argument is a
+#               (Symbol, offset) pair (bit 3);
+#  - operands : the arguments, followed by the offset of the address
+#               pair (if any), the result being in the last slot.
+#
+# Symbols are numbered locally, as indices in `symbols`, and labels by
+# block, as indices in `labels`: all operands are small ints. Labels
+# are LABEL instructions whose operand is their block.
+#
+# CompactProc.of_proc & CompactProc.to_proc convert from & to TACProc,
+# so that the passes working on TAC lists can be used on both. The
+# backend lowers both forms (see AsmGen.lower1).
+
+LABEL  = len(OPNAMES)
+STRIDE = 4
+
+_NARGS  = 0x3
+_RESULT = 0x4
+_PAIR   = 0x8
+
+_KINDS = [SIGNATURES[x] for x in OPNAMES]   # Integer opcode -> kinds
+
+# --------------------------------------------------------------------
+class CompactProc:
+    def __init__(
+            self,
+            name       : str,
+            arguments  : list[Symbol],
+            temp_sizes : dict[Symbol, int],
+            counter    : int = -1,
+    ):
+        self.name       = name
+        self.arguments  = arguments
+        self.temp_sizes = temp_sizes
+        self.counter    = counter
+        self.ops        = array.array('B')
+        self.shapes     = array.array('B')
+        self.operands   = array.array('q')
+        self.symbols    = []
+        self.labels     = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    @staticmethod
+    def of_proc(proc: TACProc) -> 'CompactProc':
+        aout = CompactProc(proc.name, proc.arguments, proc.temp_sizes, proc.counter)
+
+        symbols, labels = {}, {}
+
+        def symbol(x: Symbol) -> int:
+            index = symbols.get(x)
+            if index is None:
+                index = symbols[x] = len(aout.symbols)
+                aout.symbols.append(x)
+            return index
+
+        def label(x: Symbol) -> int:
+            index = labels.get(x)
+            if index is None:
+                index = labels[x] = len(aout.labels)
+                aout.labels.append(x)
+            return index
+
+        for instr in proc.tac:
+            slots = [0] * STRIDE
+
+            if isinstance(instr, Symbol):
+                slots[0] = label(instr)
+                aout.ops.append(LABEL)
+                aout.shapes.append(1)
+                aout.operands.extend(slots)
+                continue
+
+            shape = len(instr.arguments)
+
+            for i, (kind, x) in enumerate(zip(SIGNATURES[instr.opcode], instr.arguments)):
+                match kind:
+                    case 'S':
+                        slots[i] = symbol(x)
+                    case 'L':
+                        slots[i] = label(x)
+                    case 'I':
+                        slots[i] = x
+                    case 'A' if isinstance(x, tuple):
+                        slots[i], slots[i+1] = symbol(x[0]), x[1]
+                        shape |= _PAIR
+                    case 'A':
+                        slots[i] = symbol(x)
+
+            if instr.result is not None:
+                slots[STRIDE-1] = symbol(instr.result)
+                shape |= _RESULT
+
+            aout.ops.append(OPIDS[instr.opcode])
+            aout.shapes.append(shape)
+            aout.operands.extend(slots)
+
+        return aout
+
+    def to_proc(self) -> TACProc:
+        aout = TACProc(self.name, self.arguments)
+
+        aout.temp_sizes = self.temp_sizes
+        aout.counter    = self.counter
+
+        for op, arguments, result in self.instructions():
+            if op == LABEL:
+                aout.tac.append(arguments[0])
+            else:
+                aout.tac.append(TAC(OPNAMES[op], arguments, result))
+
+        return aout
+
+    def instructions(self) -> tp.Iterator[tuple[int, list[Symbol | int | tuple[Symbol, int]], Opt[Symbol]]]:
+        """
+        Yields the decoded instructions, as (opcode, arguments, result).
+        The argument of a LABEL instruction is the label.
+        """
+        symbols, labels = self.symbols, self.labels
+        operands        = self.operands.tolist()
+
+        for base, op, shape in zip(range(0, len(operands), STRIDE), self.ops, self.shapes):
+            if op == LABEL:
+                yield (op, [labels[operands[base]]], None)
+                continue
+
+            arguments = []
+
+            for j, kind in enumerate(_KINDS[op][:shape & _NARGS], base):
+                if kind == 'S':
+                    arguments.append(symbols[operands[j]])
+                elif kind == 'L':
+                    arguments.append(labels[operands[j]])
+                elif kind == 'I':
+                    arguments.append(operands[j])
+                elif shape & _PAIR:
+                    arguments.append((symbols[operands[j]], operands[j+1]))
+                else:
+                    arguments.append(symbols[operands[j]])
+
+            yield (op, arguments, symbols[operands[base+STRIDE-1]] if shape & _RESULT else None)
+
+    def validate(self):
+        """
+        Raises ValueError if the arrays do not encode valid instructions
+        (e.g. when read from a file): unknown opcodes, invalid shapes or
+        out-of-range symbols & labels
+        """
+        if len(self.shapes) != len(self.ops) or len(self.operands) != STRIDE * len(self.ops):
+            raise ValueError('inconsistent instruction arrays')
+
+        nsymbols, nlabels = len(self.symbols), len(self.labels)
+        operands          = self.operands.tolist()
+
+        def check(index: int, size: int):
+            if not 0 <= index < size:
+                raise ValueError(f'operand out of range: {index}')
+
+        for base, op, shape in zip(range(0, len(operands), STRIDE), self.ops, self.shapes):
+            if op == LABEL:
+                if shape != 1:
+                    raise ValueError(f'invalid label shape: {shape}')
+                check(operands[base], nlabels)
+                continue
+
+            if op > LABEL:
+                raise ValueError(f'unknown opcode: {op}')
+
+            kinds  = _KINDS[op][:shape & _NARGS]
+            result = bool(shape & _RESULT)
+
+            if shape & ~(_NARGS | _RESULT | _PAIR) \
+               or (shape & _NARGS, result) not in SHAPES[OPNAMES[op]] \
+               or (shape & _PAIR and 'A' not in kinds):
+                raise ValueError(f'invalid shape for {OPNAMES[op]}: {shape}')
+
+            for j, kind in enumerate(kinds, base):
+                if kind in 'SA':
+                    check(operands[j], nsymbols)
+                elif kind == 'L':
+                    check(operands[j], nlabels)
+
+            if result:
+                check(operands[base+STRIDE-1], nsymbols)
+
+    def __repr__(self):
+        return repr(self.to_proc())
@@ -0,0 +1,260 @@
+# --------------------------------------------------------------------
+import concurrent.futures as cf
+import contextlib as cl
+import functools as ft
+import io
+import shutil
+import typing as tp
+
+from typing import Optional as Opt
+
+from .bxast        import *
+from .bxbuildcache import BuildCache
+from .bxerrors     import Reporter
+from .bxflatast    import FlatAST
+from .bxparser     import Parser
+from .bxmm         import MM
+from .bxtychecker  import check as tycheck
+from .bxasmgen     import AsmGen
+from .bxtac        import *
+from .bxcfg        import tac2cfg, cfg2tac, uce, jthreading
+from .bxtiming     import PassTimer, NO_TIMER
+
+# ====================================================================
+# Compilation pipeline: source -> AST -> TAC -> assembly
+
+def frontend(
+        source   : str,
+        parser   : Parser,
+        reporter : Reporter,
+        timer    : PassTimer = NO_TIMER,
+        flat     : bool = False,
+) -> Opt[Program | FlatAST]:
+    """
+    Parses and type checks a program, reporting errors to `reporter`.
+    Returns None if the program is not valid. If `flat` is set, the
+    program is returned as a FlatAST (see bxflatast.py)
+    """
+    parser.reset(reporter)
+
+    with timer.phase('parse') as phase:
+        prgm = phase.after = parser.parse(source, flat = flat)
+
+    if prgm is None:
+        return None
+
+    with timer.phase('tycheck', before = prgm):
+        if not tycheck(prgm, reporter = reporter):
+            return None
+
+    return prgm
+
+# --------------------------------------------------------------------
+def middleend(
+        prgm     : Program | FlatAST,
+        pool     : Opt[cf.Executor] = None,
+        timer    : PassTimer = NO_TIMER,
+        optimize : bool = True,
+) -> list[TACProc | TACVar]:
+    """
+    Munches a (type checked) program to TAC and, unless `optimize` is
+    false, optimizes it (see optimize_all).
+    """
+    with timer.phase('mm', before = prgm) as phase:
+        tac = phase.after = MM.mm(prgm)
+
+    if optimize:
+        optimize_all(tac, pool, timer)
+
+    return tac
+
+def optimize_all(
+        tac   : list[TACProc | TACVar],
+        pool  : Opt[cf.Executor] = None,
+        timer : PassTimer = NO_TIMER,
+):
+    """
+    Optimizes (in place) the procedures of a munched TAC program. If a
+    (process) pool is given, the procedures are optimized in parallel.
+    """
+    if pool is None:
+        for decl in tac:
+            match decl:
+                case TACProc():
+                    optimize(decl, timer)
+
+    else:
+        # The workers return optimized copies of the procedures. Only
+        # the overall time of the CFG passes is recorded in this case.
+        index = [i for i, decl in enumerate(tac) if isinstance(decl, TACProc)]
+
+        with timer.phase('optimize', before = [tac[i] for i in index]) as phase:
+            procs = pool.map(_optimized, [tac[i] for i in index], chunksize = AsmGen.CHUNKSIZE)
+
+            for i, proc in zip(index, procs):
+                tac[i] = proc
+
+            phase.after = [tac[i] for i in index]
+
+# --------------------------------------------------------------------
+def optimize(proc: TACProc, timer: PassTimer = NO_TIMER):
+    """
+    Runs the CFG-based optimizations on a munched procedure
+    """
+    with MM.numbering(proc):
+        # We here do TAC -> CFG -> JTHREADING -> UCE -> TAC
+        # Other CFG-based optimizations should be inserted here
+        ir = proc.tac
+
+        for name, xpass in (
+            ('tac2cfg'   , tac2cfg   ),
+            ('jthreading', jthreading),
+            ('uce'       , uce       ),
+            ('cfg2tac'   , cfg2tac   ),
+        ):
+            with timer.phase(name, proc = proc.name, before = ir) as phase:
+                ir = phase.after = xpass(ir)
+
+        proc.tac = ir
+
+def _optimized(proc: TACProc) -> TACProc:
+    optimize(proc)
+    return proc
+
+def _optimized_asm(proc: TACProc, target: str, timer: PassTimer = NO_TIMER) -> str:
+    optimize(proc, timer)
+
+    with timer.phase('lower', proc = proc.name, before = proc) as phase:
+        asm = phase.after = AsmGen.get_backend(target).lower([proc])
+
+    return asm
+
+# --------------------------------------------------------------------
+def backend(
+        tac    : list[TACProc | TACVar],
+        target : str = 'x64-linux',
+        pool   : Opt[cf.Executor] = None,
+        timer  : PassTimer = NO_TIMER,
+) -> str:
+    """
+    Lowers a TAC program to assembly for the given target. If a
+    (process) pool is given, the procedures are lowered in parallel.
+    """
+    aout = io.StringIO()
+    write_backend(aout, tac, target, pool, timer)
+    return aout.getvalue()
+
+def write_backend(
+        stream : tp.TextIO,
+        tac    : list[TACProc | TACVar],
+        target : str = 'x64-linux',
+        pool   : Opt[cf.Executor] = None,
+        timer  : PassTimer = NO_TIMER,
+):
+    """
+    Same as backend, but writes the assembly to `stream` one
+    declaration at a time, instead of building it as a whole
+    """
+    abk = AsmGen.get_backend(target)
+
+    if pool is not None or not timer.enabled:
+        with timer.phase('lower', before = tac):
+            abk.lower_to(stream, tac, pool)
+        return
+
+    # Lowering declarations one by one gives the same output
+    for decl in tac:
+        with timer.phase('lower', proc = decl.name, before = decl) as phase:
+            asm = phase.after = abk.lower([decl])
+        stream.write(asm)
+
+# --------------------------------------------------------------------
+def compile_cached(
+        source   : str,
+        parser   : Parser,
+        reporter : Reporter,
+        cache    : BuildCache,
+        target   : str = 'x64-linux',
+        pool     : Opt[cf.Executor] = None,
+        timer    : PassTimer = NO_TIMER,
+        flat     : bool = False,
+) -> Opt[tp.Callable[[tp.TextIO], None]]:
+    """
+    Same as frontend + middleend + backend, but reuses the assembly
+    stored in `cache` for unchanged files and procedures (and stores
+    the assembly of the others). Returns None if the program is not
+    valid, and otherwise a function writing the assembly to a stream.
+    The assembly is produced (or copied from the cache) as it is
+    written.
+    """
+    with timer.phase('cache-lookup'):
+        key  = cache.file_key(source, target)
+        path = cache.path(key)
+
+    if path is not None:
+        return ft.partial(_copy_file, path)
+
+    prgm = frontend(source, parser, reporter, timer, flat)
+
+    if prgm is None:
+        return None
+
+    return ft.partial(_write_cached, prgm, source, key, cache, target, pool, timer)
+
+def _copy_file(path: str, stream: tp.TextIO):
+    with open(path, 'r') as entry:
+        shutil.copyfileobj(entry, stream)
+
+def _write_cached(
+        prgm   : Program | FlatAST,
+        source : str,
+        key    : str,
+        cache  : BuildCache,
+        target : str,
+        pool   : Opt[cf.Executor],
+        timer  : PassTimer,
+        stream : tp.TextIO,
+):
+    with timer.phase('cache-lookup'):
+        keys = cache.proc_keys(source, prgm, target)
+
+    mm     = MM()
+    hits   = []
+    misses = []
+
+    mm.for_globals(prgm)
+
+    for decl in prgm:
+        match decl:
+            case ProcDecl(name):
+                with timer.phase('cache-lookup', proc = name.value):
+                    hits.append(cache.get(keys[name.value]))
+
+                if hits[-1] is None:
+                    with timer.phase('mm', proc = name.value, before = [decl]) as phase:
+                        misses.append((name.value, mm.for_proc(decl)))
+                        phase.after = misses[-1][1]
+
+    # Optimize & lower the procedures that are not in the cache, in
+    # order, writing them (and the cached ones) as they come
+    procs = [x[1] for x in misses]
+    names = iter([x[0] for x in misses])
+
+    with cl.ExitStack() as stack:
+        if pool is None:
+            pasms = (_optimized_asm(proc, target, timer) for proc in procs)
+        else:
+            stack.enter_context(timer.phase('optimize+lower', before = procs))
+            lower = ft.partial(_optimized_asm, target = target)
+            pasms = pool.map(lower, procs, chunksize = AsmGen.CHUNKSIZE)
+
+        write = stack.enter_context(cache.tee(key, stream))
+
+        if mm.tac:
+            write(AsmGen.get_backend(target).lower(mm.tac))
+
+        for asm in hits:
+            if asm is None:
+                asm = next(pasms)
+                cache.put(keys[next(names)], asm)
+            write(asm)
@@ -1,8 +1,11 @@
 # --------------------------------------------------------------------
 import abc
 import contextlib as cl
+import dataclasses as dc
+import io
 import math
 import sys
+import typing as tp
 
 from typing import Optional as Opt
 
@@ -37,9 +40,13 @@ class Reporter(abc.ABC):
 
 # --------------------------------------------------------------------
 class DefaultReporter(Reporter):
+    def __init__(self, source: str, stream: Opt[tp.TextIO] = None):
+        super().__init__(source)
+        self.stream = stream
+
     def _report(self, message: str, position: Opt[Range]):
         def p(*x):
-            print(*x, file = sys.stderr)
+            print(*x, file = self.stream or sys.stderr)
 
         if self.nerrors > 1:
             p()
@@ -69,4 +76,29 @@ class DefaultReporter(Reporter):
                 p(f'| {i+1:0{width}}:', self.source[i])
 
             if c is not None:
-                print(' ' * (c[0]+width+3), '^' * (c[1]-c[0]))
+                p(' ' * (c[0]+width+3), '^' * (c[1]-c[0]))
+
+# --------------------------------------------------------------------
+@dc.dataclass(frozen = True)
+class Diagnostic:
+    message  : str
+    position : Opt[Range] = None
+
+# --------------------------------------------------------------------
+class CollectingReporter(DefaultReporter):
+    """
+    Records the reported diagnostics, together with their text as
+    formatted by DefaultReporter, instead of printing them
+    """
+
+    def __init__(self, source: str):
+        super().__init__(source, stream = io.StringIO())
+        self.diagnostics : list[Diagnostic] = []
+
+    def _report(self, message: str, position: Opt[Range]):
+        self.diagnostics.append(Diagnostic(message, position))
+        super()._report(message, position)
+
+    @property
+    def text(self) -> str:
+        return self.stream.getvalue()
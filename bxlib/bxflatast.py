@@ -0,0 +1,374 @@
+# --------------------------------------------------------------------
+import array
+import dataclasses as dc
+import typing as tp
+
+from typing import Optional as Opt
+
+from .bxast        import *
+from .bxtrampoline import Rec, trampoline
+
+# ====================================================================
+# Flat, array-backed, AST
+#
+# The declarations of a program are stored, as they are parsed, in a
+# handful of parallel arrays (one entry by node) instead of as Python
+# objects:
+#
+#  - kinds    : the node class (index in KINDS)
+#  - offsets  : the children of node `i` are children[offsets[i]:offsets[i+1]]
+#  - values   : the int/bool payload (e.g. IntExpression.value)
+#  - names    : the str payload (e.g. Name.value), as an index in `strings`
+#  - types    : the Type field (e.g. VarDeclStatement.type_), as an index in `typetab`
+#  - annots   : the type annotation (Expression.type_), as an index in `typetab`
+#  - spans    : the source range (4 ints by node, line 0 if none)
+#
+# Lists, (name, type) tuples and missing (None) nodes are nodes of their
+# own. Types are not flattened: they are shared objects (of `typetab`).
+#
+# The nodes are stored in post-order, so that each declaration is a
+# contiguous range of nodes ending with its root. Iterating a FlatAST
+# yields its declarations decoded as regular AST nodes, one at a time;
+# the changes made to their types (e.g. by the type checker) are stored
+# back when the iteration moves to the next declaration. The passes
+# (type checker, maximal munch...) can then run on a FlatAST as on a
+# list of declarations, never holding more than one declaration as
+# Python objects.
+
+KINDS = (
+    None, list, tuple,
+    Name,
+    BoolExpression, IntExpression, NullExpression, OpAppExpression,
+    AllocExpression, CallExpression, PrintExpression, RefExpression,
+    VarAssignable, DerefAssignable, ArrayAssignable,
+    AttributeAssignable, AttrPointerAssignable,
+    VarDeclStatement, AssignStatement, ExprStatement, PrintStatement,
+    BlockStatement, IfStatement, WhileStatement, BreakStatement,
+    ContinueStatement, ReturnStatement,
+    GlobVarDecl, ProcDecl, TypedefDecl,
+)
+
+NONE, LIST, TUPLE = 0, 1, 2
+
+KIND_IDS = { cls: i for i, cls in enumerate(KINDS) }
+
+# --------------------------------------------------------------------
+@dc.dataclass(frozen = True)
+class _Schema:
+    fields    : tuple[tuple[str, str], ...]     # (name, slot), in __init__ order
+    slots     : tuple[str, ...]                 # The slots of `fields`
+    simple    : bool                            # Only has children
+    type_     : Opt[str]                        # Name of the Type field
+    annotated : bool                            # Has a type annotation (type_)
+
+def _slot(hint) -> str:
+    if hint is str:
+        return 'name'
+    if hint is bool:
+        return 'bool'
+    if hint is int:
+        return 'int'
+
+    args = [x for x in tp.get_args(hint) if x is not type(None)] \
+        if tp.get_origin(hint) is tp.Union else [hint]
+
+    if len(args) == 1 and isinstance(args[0], type) and issubclass(args[0], Type):
+        return 'type'
+
+    return 'child'
+
+def _schema(cls) -> _Schema:
+    fields = tuple((f.name, _slot(f.type)) for f in dc.fields(cls) if not f.kw_only)
+    slots  = tuple(slot for _, slot in fields)
+    types  = [x for x, slot in fields if slot == 'type']
+
+    assert(len(types) <= 1)
+    assert(sum(slot in ('name', 'bool', 'int') for slot in slots) <= 1)
+
+    return _Schema(
+        fields    = fields,
+        slots     = slots,
+        simple    = all(slot == 'child' for slot in slots),
+        type_     = types[0] if types else None,
+        annotated = issubclass(cls, Expression),
+    )
+
+SCHEMAS = [None, None, None] + [_schema(cls) for cls in KINDS[3:]]
+
+# --------------------------------------------------------------------
+class FlatAST:
+    def __init__(self):
+        self.kinds    = array.array('B')
+        self.offsets  = array.array('I', [0])
+        self.children = array.array('I')
+        self.values   = array.array('q')
+        self.names    = array.array('i')
+        self.types    = array.array('i')
+        self.annots   = array.array('i')
+        self.spans    = array.array('I')
+        self.roots    = array.array('I')        # The declarations
+        self.strings  = []
+        self.typetab  = []
+        self.largeint = {}                      # Node -> int payload not fitting in `values`
+
+        self._strids  = {}
+        self._typeids = {}
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __iter__(self) -> tp.Iterator[TopDecl]:
+        lo = 0
+        for root in self.roots:
+            nodes = self._decode(lo, root)
+            try:
+                yield nodes[-1]
+            finally:
+                self._store(lo, nodes)
+            lo = root + 1
+
+    def append(self, decl: TopDecl):
+        """
+        Adds a declaration (that can then be dropped) to the program
+        """
+        self.roots.append(trampoline(self._encode(decl)))
+
+    @property
+    def nnodes(self) -> int:
+        """
+        Number of AST nodes (lists, tuples & None excluded)
+        """
+        return sum(1 for x in self.kinds if x > TUPLE)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the arrays (the strings & types tables excluded)
+        """
+        return sum(
+            x.itemsize * len(x) for x in (
+                self.kinds, self.offsets, self.children, self.values,
+                self.names, self.types, self.annots, self.spans, self.roots,
+            )
+        )
+
+    def view(self, index: int) -> 'FlatNode':
+        """
+        Returns a view of the node `index`. The views of the
+        declarations are those of the nodes `self.roots`
+        """
+        return FlatNode(self, index)
+
+    # ----------------------------------------------------------------
+    def _string(self, value: str) -> int:
+        index = self._strids.get(value)
+        if index is None:
+            index = self._strids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def _type(self, type_: Opt[Type]) -> int:
+        if type_ is None:
+            return -1
+        index = self._typeids.get(id(type_))
+        if index is None:
+            index = self._typeids[id(type_)] = len(self.typetab)
+            self.typetab.append(type_)
+        return index
+
+    def _node(
+            self,
+            kind     : int,
+            children : list[int],
+            position : Opt[Range] = None,
+            value    : int = 0,
+            name     : int = -1,
+            type_    : int = -1,
+            annot    : int = -1,
+    ) -> int:
+        index = len(self.kinds)
+
+        self.kinds.append(kind)
+        self.children.extend(children)
+        self.offsets.append(len(self.children))
+        self.names.append(name)
+        self.types.append(type_)
+        self.annots.append(annot)
+
+        try:
+            self.values.append(value)
+        except OverflowError:
+            self.values.append(0)
+            self.largeint[index] = value
+
+        if position is None:
+            self.spans.extend((0, 0, 0, 0))
+        else:
+            self.spans.extend((position.line, position.column, position.endline, position.endcolumn))
+
+        return index
+
+    def _encode(self, node: tp.Any) -> Rec:
+        match node:
+            case None:
+                return self._node(NONE, [])
+
+            case list():
+                children = []
+                for x in node:
+                    children.append((yield self._encode(x)))
+                return self._node(LIST, children)
+
+            case (x, Type() as type_):
+                return self._node(TUPLE, [(yield self._encode(x))], type_ = self._type(type_))
+
+        kind   = KIND_IDS[type(node)]
+        schema = SCHEMAS[kind]
+        kw     = dict(position = node.position)
+
+        children = []
+        for fname, slot in schema.fields:
+            value = getattr(node, fname)
+            match slot:
+                case 'child':
+                    children.append((yield self._encode(value)))
+                case 'type':
+                    kw['type_'] = self._type(value)
+                case 'name':
+                    kw['name'] = self._string(value)
+                case _:
+                    kw['value'] = int(value)
+
+        if schema.annotated:
+            kw['annot'] = self._type(node.type_)
+
+        return self._node(kind, children, **kw)
+
+    def _decode(self, lo: int, hi: int) -> list[tp.Any]:
+        """
+        Decodes the nodes lo..hi (a subtree, in post-order), returning
+        them as Python objects (the root being the last one)
+        """
+        nodes    = []
+        append   = nodes.append
+        kinds    = self.kinds
+        offsets  = self.offsets
+        children = self.children
+        spans    = self.spans
+        types    = self.types
+        annots   = self.annots
+        typetab  = self.typetab
+
+        for i in range(lo, hi+1):
+            kind = kinds[i]
+
+            if kind <= TUPLE:
+                if kind == NONE:
+                    append(None)
+                elif kind == LIST:
+                    append([nodes[x - lo] for x in children[offsets[i]:offsets[i+1]]])
+                else:
+                    append((nodes[children[offsets[i]] - lo], typetab[types[i]]))
+                continue
+
+            schema = SCHEMAS[kind]
+
+            if schema.simple:
+                args = [nodes[x - lo] for x in children[offsets[i]:offsets[i+1]]]
+            else:
+                args, child = [], offsets[i]
+                for slot in schema.slots:
+                    if slot == 'child':
+                        args.append(nodes[children[child] - lo])
+                        child += 1
+                    elif slot == 'type':
+                        args.append(None if types[i] < 0 else typetab[types[i]])
+                    elif slot == 'name':
+                        args.append(self.strings[self.names[i]])
+                    elif slot == 'bool':
+                        args.append(bool(self.values[i]))
+                    else:
+                        args.append(self.largeint.get(i, self.values[i]))
+
+            j        = 4 * i
+            position = None if spans[j] == 0 else Range(spans[j], spans[j+1], spans[j+2], spans[j+3])
+
+            if schema.annotated and annots[i] >= 0:
+                append(KINDS[kind](*args, position = position, type_ = typetab[annots[i]]))
+            else:
+                append(KINDS[kind](*args, position = position))
+
+        return nodes
+
+    def _store(self, lo: int, nodes: list[tp.Any]):
+        """
+        Stores back the types of the decoded nodes lo..
+        """
+        for i, node in enumerate(nodes, lo):
+            schema = SCHEMAS[self.kinds[i]]
+            if schema is None:
+                continue
+            if schema.type_ is not None:
+                self.types[i] = self._type(getattr(node, schema.type_))
+            if schema.annotated:
+                self.annots[i] = self._type(node.type_)
+
+    def _position(self, index: int) -> Opt[Range]:
+        line, column, endline, endcolumn = self.spans[4*index:4*index+4]
+        return None if line == 0 else Range(line, column, endline, endcolumn)
+
+    def _first(self, index: int) -> int:
+        # First node (in post-order) of the subtree rooted at `index`
+        while self.offsets[index] < self.offsets[index+1]:
+            index = self.children[self.offsets[index]]
+        return index
+
+# --------------------------------------------------------------------
+class FlatNode:
+    """
+    A view of a node of a FlatAST
+    """
+    __slots__ = ('ast', 'index')
+
+    def __init__(self, ast: FlatAST, index: int):
+        self.ast   = ast
+        self.index = index
+
+    @property
+    def kind(self) -> tp.Any:
+        return KINDS[self.ast.kinds[self.index]]
+
+    @property
+    def children(self) -> list['FlatNode']:
+        offsets = self.ast.offsets
+        return [
+            FlatNode(self.ast, x)
+            for x in self.ast.children[offsets[self.index]:offsets[self.index+1]]
+        ]
+
+    @property
+    def value(self) -> Opt[int | str]:
+        """
+        The payload (str, bool or int) of the node, if any
+        """
+        ast, i = self.ast, self.index
+        if ast.names[i] >= 0:
+            return ast.strings[ast.names[i]]
+        return ast.largeint.get(i, ast.values[i])
+
+    @property
+    def type_(self) -> Opt[Type]:
+        """
+        The Type field of the node, if any
+        """
+        return None if self.ast.types[self.index] < 0 else self.ast.typetab[self.ast.types[self.index]]
+
+    @property
+    def position(self) -> Opt[Range]:
+        return self.ast._position(self.index)
+
+    def decode(self) -> tp.Any:
+        """
+        Returns the subtree rooted at this node as Python objects
+        """
+        return self.ast._decode(self.ast._first(self.index), self.index)[-1]
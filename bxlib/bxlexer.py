@@ -2,8 +2,12 @@
 import bisect
 import ply.lex
 import re
+import sys
+
+from typing import Optional as Opt
 
 from .bxast    import Range
+from .bxcache  import cache_dir
 from .bxerrors import Reporter
 
 # ====================================================================
@@ -110,10 +114,20 @@ class Lexer:
     t_ignore_comment = r'//.*'
 
     def __init__(self, reporter: Reporter):
-        self.lexer    = ply.lex.lex(module = self)
+        self.lexer    = ply.lex.lex(module = self, lextabdir = cache_dir('lextab'))
         self.reporter = reporter
         self.bol      = [0]
 
+    def reset(self, reporter: Opt[Reporter] = None):
+        """
+        Resets the position tracking state (and optionally the reporter)
+        so that the lexer can be reused for another input
+        """
+        if reporter is not None:
+            self.reporter = reporter
+        self.bol          = [0]
+        self.lexer.lineno = 1
+
     def column_of_pos(self, pos: int) -> int:
         assert(0 <= pos)
         return pos - self.bol[bisect.bisect_right(self.bol, pos)-1]
@@ -127,6 +141,10 @@ class Lexer:
         r'[a-zA-Z_][a-zA-Z0-9_]*'
         if t.value in self.keywords:
             t.type  = self.keywords[t.value]
+        else:
+            # Identifiers are scope keys: all the occurrences of a name
+            # share the same string
+            t.value = sys.intern(t.value)
         return t
 
     def t_NUMBER(self, t):
@@ -3,20 +3,23 @@ import contextlib as cl
 
 from typing import Optional as Opt
 
-from .bxast   import *
-from .bxscope import Scope
-from .bxtac   import *
-from .bxtysizer import TypeSize
+from .bxast        import *
+from .bxscope      import Scope
+from .bxsymbols    import Symbol, intern, temp
+from .bxtac        import *
+from .bxtrampoline import Rec, trampoline
+from .bxtysizer    import TypeSize
 
 # ====================================================================
 # Maximal munch
 
 class MM:
     _counter = -1
+    _prefix  = ''
 
     PRINTS = {
-        BasicType.INT  : 'print_int',
-        BasicType.BOOL : 'print_bool',
+        BasicType.INT  : intern('print_int'),
+        BasicType.BOOL : intern('print_bool'),
     }
 
     def __init__(self):
@@ -33,28 +36,48 @@ class MM:
         return mm._tac
 
     @classmethod
-    def fresh_temporary(cls):
+    def reset(cls, prefix: str = '', counter: int = -1):
+        cls._counter = counter
+        cls._prefix  = prefix
+
+    @classmethod
+    @cl.contextmanager
+    def numbering(cls, proc: TACProc):
+        """
+        Numbers the fresh temporaries and labels of `proc` independently
+        of the other procedures: temporaries restart from %0 and labels
+        are qualified by the procedure name (.L<name>.<n>). This makes
+        the TAC of a procedure only depend on its own source.
+        """
+        cls.reset(f'{proc.name}.', proc.counter)
+        try:
+            yield
+        finally:
+            proc.counter = cls._counter
+
+    @classmethod
+    def fresh_temporary(cls) -> Symbol:
         cls._counter += 1
-        return f'%{cls._counter}'
+        return temp(cls._counter)
 
     @classmethod
-    def fresh_label(cls):
+    def fresh_label(cls) -> Symbol:
         cls._counter += 1
-        return f'.L{cls._counter}'
+        return intern(f'.L{cls._prefix}{cls._counter}')
 
     def push(
             self,
             opcode     : str,
-            *arguments : str | int,
-            result     : Opt[str] = None,
+            *arguments : Symbol | int,
+            result     : Opt[Symbol] = None,
     ):
         self._proc.tac.append(TAC(opcode, list(arguments), result))
 
-    def push_label(self, label: str):
-        self._proc.tac.append(f'{label}:')
+    def push_label(self, label: Symbol):
+        self._proc.tac.append(label)
 
     @cl.contextmanager
-    def in_loop(self, labels: tuple[str, str]):
+    def in_loop(self, labels: tuple[Symbol, Symbol]):
         self._loops.append(labels)
         try:
             yield
@@ -62,6 +85,14 @@ class MM:
             self._loops.pop()
 
     def for_program(self, prgm: Program):
+        self.for_globals(prgm)
+
+        for decl in prgm:
+            match decl:
+                case ProcDecl():
+                    self._tac.append(self.for_proc(decl))
+
+    def for_globals(self, prgm: Program):
         for decl in prgm:
             match decl:
                 case GlobVarDecl(name, init, type_):
@@ -69,36 +100,48 @@ class MM:
 
                     #any boolean constant gets converted to an int 
                     self._tac.append(TACVar(name.value, int(init.value)))
-                    self._scope.push(name.value, f'@{name.value}')
-                        
+                    self._scope.push(name.value, intern(f'@{name.value}'))
 
-        for decl in prgm:
-            match decl:
-                case ProcDecl(name, arguments, retty, body):
-                    assert(self._proc is None)
-                    with self._scope.in_subscope():
-                        self._proc = TACProc(
-                            name      = name.value,
-                            arguments = [f'%{x[0].value}' for x in arguments],
-                        )
+    def for_proc(self, decl: ProcDecl) -> TACProc:
+        """
+        Munches a single procedure. The globals must have been munched
+        first (see for_globals)
+        """
+        assert(self._proc is None)
+
+        name, arguments, body = decl.name, decl.arguments, decl.body
+
+        with self._scope.in_subscope():
+            self._proc = TACProc(
+                name      = name.value,
+                arguments = [intern(f'%{x[0].value}') for x in arguments],
+            )
+
+            with self.numbering(self._proc):
+                for argument, symbol in zip(arguments, self._proc.arguments):
+                    self._scope.push(argument[0].value, symbol)
 
-                        for argument in arguments:
-                            self._scope.push(argument[0].value, f'%{argument[0].value}')
+                self.for_statement(body)
 
-                        self.for_statement(body)
+                if name.value == 'main':
+                    self.for_statement(ReturnStatement(IntExpression(0)));
 
-                        if name.value == 'main':
-                            self.for_statement(ReturnStatement(IntExpression(0)));
+            proc, self._proc = self._proc, None
 
-                        self._tac.append(self._proc)
-                        self._proc = None
+        return proc
 
     def for_block(self, block: Block):
+        trampoline(self._for_block(block))
+
+    def _for_block(self, block: Block) -> Rec:
         with self._scope.in_subscope():
             for stmt in block:
-                self.for_statement(stmt)
+                yield self._for_statement(stmt)
 
     def for_statement(self, stmt: Statement):
+        trampoline(self._for_statement(stmt))
+
+    def _for_statement(self, stmt: Statement) -> Rec:
         match stmt:
             case VarDeclStatement(name, init, type):
                 new_temp = self.fresh_temporary()
@@ -122,32 +165,42 @@ class MM:
                     self.push("zero_out", struct_address, struct_size)
                     return
 
-                temp = self.for_expression(init)
+                temp = yield self._for_expression(init)
                 self.push('copy', temp, result = self._scope[name.value])
 
             case AssignStatement(lhs, rhs):
                 self.for_assignment(lhs, rhs)
 
             case ExprStatement(expr):
-                self.for_expression(expr)
+                yield self._for_expression(expr)
 
             case PrintStatement(value):
-                temp = self.for_expression(value)
+                temp = yield self._for_expression(value)
                 self.push('print', temp)
 
-            case IfStatement(condition, then, else_):
-                tlabel = self.fresh_label()
-                flabel = self.fresh_label()
-                olabel = self.fresh_label()
+            case IfStatement():
+                # `else if` chains are munched iteratively: the exit
+                # labels of the nested if statements are pushed last
+                olabels = []
 
-                self.for_bexpression(condition, tlabel, flabel)
-                self.push_label(tlabel)
-                self.for_statement(then)
-                self.push('jmp', olabel)
-                self.push_label(flabel)
-                if else_ is not None:
-                    self.for_statement(else_)
-                self.push_label(olabel)
+                while isinstance(stmt, IfStatement):
+                    tlabel = self.fresh_label()
+                    flabel = self.fresh_label()
+                    olabel = self.fresh_label()
+
+                    yield self._for_bexpression(stmt.condition, tlabel, flabel)
+                    self.push_label(tlabel)
+                    yield self._for_statement(stmt.then)
+                    self.push('jmp', olabel)
+                    self.push_label(flabel)
+
+                    olabels.append(olabel)
+                    stmt = stmt.else_
+
+                if stmt is not None:
+                    yield self._for_statement(stmt)
+                for olabel in reversed(olabels):
+                    self.push_label(olabel)
 
             case WhileStatement(condition, body):
                 clabel = self.fresh_label()
@@ -156,9 +209,9 @@ class MM:
 
                 with self.in_loop((clabel, olabel)):
                     self.push_label(clabel)
-                    self.for_bexpression(condition, blabel, olabel)
+                    yield self._for_bexpression(condition, blabel, olabel)
                     self.push_label(blabel)
-                    self.for_statement(body)
+                    yield self._for_statement(body)
                     self.push('jmp', clabel)
                     self.push_label(olabel)
 
@@ -169,13 +222,13 @@ class MM:
                 self.push('jmp', self._loops[-1][1])
 
             case BlockStatement(body):
-                self.for_block(body)
+                yield self._for_block(body)
 
             case ReturnStatement(expr):
                 if expr is None:
                     self.push('ret')
                 else:
-                    temp = self.for_expression(expr)
+                    temp = yield self._for_expression(expr)
                     self.push('ret', temp)
 
             case _:
@@ -219,7 +272,10 @@ class MM:
                 self.push("store", rhs_val, lhs_address)
 
 
-    def for_expression(self, expr: Expression, force = False) -> str:
+    def for_expression(self, expr: Expression, force = False) -> Symbol:
+        return trampoline(self._for_expression(expr, force))
+
+    def _for_expression(self, expr: Expression, force = False) -> Rec:
         target = None
 
         if not force and expr.type_ == BasicType.BOOL:
@@ -228,7 +284,7 @@ class MM:
             flabel = self.fresh_label()
 
             self.push('const', 0, result = target)
-            self.for_bexpression(expr, tlabel, flabel)
+            yield self._for_bexpression(expr, tlabel, flabel)
             self.push_label(tlabel)
             self.push('const', 1, result = target)
             self.push_label(flabel)
@@ -247,42 +303,44 @@ class MM:
                     self.push("const", 0, result = target)
 
                 case OpAppExpression(operator, arguments):
-                    target    = self.fresh_temporary()
-                    arguments = [self.for_expression(e) for e in arguments]
-                    self.push(OPCODES[operator], *arguments, result = target)
+                    target = self.fresh_temporary()
+                    temps  = []
+                    for e in arguments:
+                        temps.append((yield self._for_expression(e)))
+                    self.push(OPCODES[operator], *temps, result = target)
 
                 case CallExpression(proc, arguments):
                     for i, argument in enumerate(arguments):
-                        temp = self.for_expression(argument)
+                        temp = yield self._for_expression(argument)
                         self.push('param', i+1, temp)
                     if expr.type_ != BasicType.VOID:
                         target = self.fresh_temporary()
-                    self.push('call', proc.value, len(arguments), result = target)
+                    self.push('call', intern(proc.value), len(arguments), result = target)
 
                 case PrintExpression(argument):
-                    temp = self.for_expression(argument)
+                    temp = yield self._for_expression(argument)
                     self.push('param', 1, temp)
                     proc = self.PRINTS[argument.type_]
                     self.push('call', proc, 1)
 
                 case DerefAssignable(argument) : 
                     assert(isinstance(argument.type_, PointerType))
-                    address = self.for_expression(argument)
+                    address = yield self._for_expression(argument)
                     target = self.fresh_temporary()
 
                     self.push("load", address, result = target)
 
                 case ArrayAssignable() | AttributeAssignable() | AttrPointerAssignable():
-                    address = self.store_elem_address(expr)
+                    address = yield self._store_elem_address(expr)
                     target = self.fresh_temporary()
                     self.push("load", address, result = target)
 
                 case RefExpression(argument):
-                    target = self.store_elem_address(argument)
+                    target = yield self._store_elem_address(argument)
 
                 case AllocExpression(alloctype, size):
                     target = self.fresh_temporary()
-                    bcount_reg = self.for_expression(size)    # munch the number of blocks and store
+                    bcount_reg = yield self._for_expression(size)    # munch the number of blocks and store
                     self.push("alloc", bcount_reg, TypeSize.size(alloctype), result = target)
                     
                 case _:
@@ -291,11 +349,14 @@ class MM:
         return target
 
 
-    def store_elem_address(self, elem : Assignable) -> str :
+    def store_elem_address(self, elem : Assignable) -> Symbol :
         """
         Computes the address of an assignable.
         Returns a register where that address is stored.
         """
+        return trampoline(self._store_elem_address(elem))
+
+    def _store_elem_address(self, elem : Assignable) -> Rec :
 
         #iterate over class of elem
         match elem : 
@@ -306,22 +367,22 @@ class MM:
                 self.push("ref", var_reg, result = target)
 
             case DerefAssignable(argument=sub_arg):
-                target  = self.for_expression(sub_arg)
+                target  = yield self._for_expression(sub_arg)
 
             case ArrayAssignable(argument = sub_arg, index=index):
 
                 assert(isinstance(sub_arg.type_, ArrayType) or isinstance(sub_arg.type_, PointerType) )
 
-                shift_reg = self.for_expression(index)
+                shift_reg = yield self._for_expression(index)
                 elem_size = TypeSize.size(sub_arg.type_.target)
 
                 #iterate over type of sub_arg
                 match sub_arg.type_:
                     case PointerType(_) :
-                        address_reg = self.for_expression(sub_arg)
+                        address_reg = yield self._for_expression(sub_arg)
                         
                     case ArrayType(_, _):
-                        address_reg = self.store_elem_address(sub_arg)
+                        address_reg = yield self._store_elem_address(sub_arg)
 
                 #bit ugly but does the job
                 bsize_reg = self.fresh_temporary()
@@ -338,7 +399,7 @@ class MM:
                 assert(isinstance(argument.type_, StructType) 
                        and argument.type_.attr_lookup is not None)
 
-                target = self.store_elem_address(argument)
+                target = yield self._store_elem_address(argument)
                 offset = argument.type_.attr_lookup[attribute][0]
 
                 offset_reg = self.fresh_temporary()
@@ -348,7 +409,7 @@ class MM:
             case AttrPointerAssignable(argument, attribute):
                 assert(isinstance(argument.type_, PointerType)
                        and isinstance(argument.type_.target, StructType))
-                struct_address = self.for_expression(argument)
+                struct_address = yield self._for_expression(argument)
                 offset = argument.type_.target.attr_lookup[attribute][0]
                 target = self.fresh_temporary()
                 offset_reg = self.fresh_temporary()
@@ -367,7 +428,10 @@ class MM:
         'cmp-greater-or-equal-than' : 'jle',
     }
 
-    def for_bexpression(self, expr: Expression, tlabel: str, flabel: str):
+    def for_bexpression(self, expr: Expression, tlabel: Symbol, flabel: Symbol):
+        trampoline(self._for_bexpression(expr, tlabel, flabel))
+
+    def _for_bexpression(self, expr: Expression, tlabel: Symbol, flabel: Symbol) -> Rec:
         assert(expr.type_ == BasicType.BOOL)
 
         match expr:
@@ -391,8 +455,8 @@ class MM:
                     'cmp-greater-or-equal-than',
                     [e1, e2]):
 
-                t1 = self.for_expression(e1)
-                t2 = self.for_expression(e2)
+                t1 = yield self._for_expression(e1)
+                t2 = yield self._for_expression(e2)
                 t  = self.fresh_temporary()
                 self.push(OPCODES['subtraction'], t2, t1, result = t)
 
@@ -401,26 +465,26 @@ class MM:
 
             case OpAppExpression('boolean-and', [e1, e2]):
                 olabel = self.fresh_label()
-                self.for_bexpression(e1, olabel, flabel)
+                yield self._for_bexpression(e1, olabel, flabel)
                 self.push_label(olabel)
-                self.for_bexpression(e2, tlabel, flabel)
+                yield self._for_bexpression(e2, tlabel, flabel)
 
             case OpAppExpression('boolean-or', [e1, e2]):
                 olabel = self.fresh_label()
-                self.for_bexpression(e1, tlabel, olabel)
+                yield self._for_bexpression(e1, tlabel, olabel)
                 self.push_label(olabel)
-                self.for_bexpression(e2, tlabel, flabel)
+                yield self._for_bexpression(e2, tlabel, flabel)
 
             case OpAppExpression('boolean-not', [e]):
-                self.for_bexpression(e, flabel, tlabel)
+                yield self._for_bexpression(e, flabel, tlabel)
 
             case CallExpression(_):
-                temp = self.for_expression(expr, force = True)
+                temp = yield self._for_expression(expr, force = True)
                 self.push('jz', temp, flabel)
                 self.push('jmp', tlabel)
 
             case Assignable():
-                address = self.store_elem_address(expr)
+                address = yield self._store_elem_address(expr)
                 temp = self.fresh_temporary()
                 self.push("load", address, result = temp)
                 self.push('jz', temp, flabel)
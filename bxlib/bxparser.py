@@ -1,9 +1,11 @@
 # --------------------------------------------------------------------
 import ply.yacc
 
-from .bxast    import *
-from .bxerrors import Reporter
-from .bxlexer  import Lexer
+from .bxast     import *
+from .bxcache   import cache_dir
+from .bxerrors  import Reporter
+from .bxflatast import FlatAST
+from .bxlexer   import Lexer
 
 # ====================================================================
 # BX parser definition
@@ -57,10 +59,26 @@ class Parser:
 
     def __init__(self, reporter: Reporter):
         self.lexer    = Lexer(reporter = reporter)
-        self.parser   = ply.yacc.yacc(module = self)
+        self.parser   = ply.yacc.yacc(module = self, tabledir = cache_dir('parsetab'))
         self.reporter = reporter
+        self.flat     = False
+
+    def reset(self, reporter: Reporter):
+        """
+        Attaches a new reporter, so that the same (warm) parser can be
+        used for several programs
+        """
+        self.reporter = reporter
+        self.lexer.reset(reporter)
+
+    def parse(self, program: str, flat: bool = False):
+        """
+        Parses `program`, returning its declarations as a list, or as
+        a FlatAST if `flat` is set. Returns None on errors
+        """
+        self.lexer.reset()
+        self.flat = flat
 
-    def parse(self, program: str):
         with self.reporter.checkpoint() as checkpoint:
             ast = self.parser.parse(
                 program,
@@ -73,8 +91,8 @@ class Parser:
     def _position(self, p) -> Range:
         n = len(p) - 1
         return Range(
-            start = (p.linespan(1)[0], self.lexer.column_of_pos(p.lexspan(1)[0])    ),
-            end   = (p.linespan(n)[1], self.lexer.column_of_pos(p.lexspan(n)[1]) + 1),
+            p.linespan(1)[0], self.lexer.column_of_pos(p.lexspan(1)[0])    ,
+            p.linespan(n)[1], self.lexer.column_of_pos(p.lexspan(n)[1]) + 1,
         )
 
     def p_name(self, p):
@@ -460,7 +478,7 @@ class Parser:
         """prgm :
                 | prgm topdecl"""
         if len(p) == 1:
-            p[0] = []
+            p[0] = FlatAST() if self.flat else []
         else:
             p[0] = p[1]
             p[0].append(p[2])
@@ -0,0 +1,698 @@
+# --------------------------------------------------------------------
+from .bxast        import *
+from .bxerrors     import Reporter
+from .bxflatast    import FlatAST
+from .bxlexer      import Lexer
+from .bxparser     import Parser
+from .bxtrampoline import Rec, trampoline
+
+# ====================================================================
+# Hand-written BX parser
+#
+# A recursive descent parser (with precedence climbing for the binary
+# operators) that accepts the same language as the PLY parser of
+# bxparser.py and produces the same AST, with the same positions:
+#
+#  - operators precedences & associativities are those of
+#    Parser.precedence, and the conflicts of the LALR grammar are
+#    resolved the same way (e.g. `*p[0]` is `(*p)[0]`, `alloc int[4]`
+#    allocates an array of 4 ints);
+#
+#  - positions follow PLY position tracking: a range ends one column
+#    after the *start* of its last token, and the (empty) else branch
+#    of an if statement ends at the lexer position, one token after
+#    the closing brace of the last block;
+#
+#  - syntax errors are reported, and recovered from, as PLY does: the
+#    statements of the innermost block are skipped up to the next `;`
+#    and, outside of any block, tokens are skipped up to the next
+#    declaration. An error is only reported if at least 3 tokens have
+#    been consumed since the previous one.
+#
+# The parsing functions that can nest (expressions, statements, types)
+# are recursive generators run by bxtrampoline.trampoline, so that the
+# parser accepts any nesting that the (non-recursive) LALR parser
+# accepts, whatever the recursion limit.
+#
+# It does not need the PLY parser tables and does not call back for
+# every reduction. See unit_tests/diff_parsers.py (differential test)
+# and unit_tests/bench_parser.py (throughput).
+
+class _SyntaxError(Exception):
+    pass
+
+class _Abort(Exception):
+    pass
+
+class _EOF:
+    type   = '$end'
+    value  = None
+
+EOF = _EOF()
+
+# --------------------------------------------------------------------
+class RDParser:
+    UNIOP = Parser.UNIOP
+    BINOP = Parser.BINOP
+
+    # Token -> (level, associativity), lowest level first
+    PRECEDENCE = {
+        token: (level, assoc)
+        for level, (assoc, *tokens) in enumerate(Parser.precedence, 1)
+        for token in tokens
+    }
+
+    # Unary operator token -> precedence of its rule (see %prec)
+    UNARY = {
+        'DASH' : PRECEDENCE['UMINUS'],
+        'TILD' : PRECEDENCE['UNEG'  ],
+        'BANG' : PRECEDENCE['BANG'  ],
+    }
+
+    # Binary operator token -> precedence
+    BINARY = {
+        token: prec for token, prec in PRECEDENCE.items()
+        if token not in ('BANG', 'UMINUS', 'UNEG')
+    }
+
+    # Tokens that may follow an expression
+    FOLLOW = { 'COLON', 'RPAREN', 'COMMA', 'RSQUARE', 'SEMICOLON', *BINARY }
+
+    ERROR_COUNT = 3             # As PLY's yacc.error_count
+    TOPDECLS    = ('DEF', 'VAR', 'TYPE')
+
+    def __init__(self, reporter: Reporter):
+        self.lexer    = Lexer(reporter = reporter)
+        self.reporter = reporter
+        self.flat     = False
+
+    def reset(self, reporter: Reporter):
+        """
+        Attaches a new reporter, so that the same parser can be used
+        for several programs
+        """
+        self.reporter = reporter
+        self.lexer.reset(reporter)
+
+    def parse(self, program: str, flat: bool = False):
+        """
+        Same as Parser.parse
+        """
+        self.lexer.reset()
+        self.lexer.lexer.input(program)
+        self.flat = flat
+
+        self._token    = self.lexer.lexer.token
+        self._errcount = 0
+        self._tok      = self._next()
+
+        with self.reporter.checkpoint() as checkpoint:
+            try:
+                ast = self._program()
+            except _Abort:
+                ast = None
+
+            return ast if checkpoint else None
+
+    # ----------------------------------------------------------------
+    # Tokens, positions & errors
+
+    def _next(self):
+        tok = self._token()
+        return EOF if tok is None else tok
+
+    def _advance(self):
+        tok = self._tok
+        self._tok = self._next()
+        if self._errcount:
+            self._errcount -= 1
+        return tok
+
+    def _expect(self, type_: str):
+        if self._tok.type != type_:
+            self._error()
+        return self._advance()
+
+    def _error(self):
+        tok = self._tok
+
+        if self._errcount == 0:
+            if tok is EOF:
+                self.reporter('syntax error at end of file')
+            else:
+                self.reporter(
+                    f'syntax error',
+                    position = Range.of_position(
+                        tok.lineno,
+                        self.lexer.column_of_pos(tok.lexpos),
+                    ),
+                )
+
+        self._errcount = self.ERROR_COUNT
+        raise _SyntaxError
+
+    def _discard(self):
+        self._tok      = self._next()
+        self._errcount = self.ERROR_COUNT
+
+    def _range(self, start, end) -> Range:
+        # `start` & `end` are spans: (line, pos, endline, endpos)
+        return Range(
+            start[0], self.lexer.column_of_pos(start[1])    ,
+            end  [2], self.lexer.column_of_pos(end  [3]) + 1,
+        )
+
+    @staticmethod
+    def _span(tok):
+        return (tok.lineno, tok.lexpos, tok.lineno, tok.lexpos)
+
+    # ----------------------------------------------------------------
+    # Program & declarations
+
+    def _program(self):
+        prgm = FlatAST() if self.flat else []
+
+        while self._tok is not EOF:
+            try:
+                prgm.append(trampoline(self._topdecl()))
+
+            except _SyntaxError:
+                # PLY unwinds the whole stack: the parsing restarts
+                # (from an empty program) at the next declaration
+                if self._tok is EOF:
+                    return None
+                self._discard()
+                while self._tok is not EOF and self._tok.type not in self.TOPDECLS:
+                    self._discard()
+                prgm = FlatAST() if self.flat else []
+
+        return prgm
+
+    def _topdecl(self) -> Rec:
+        match self._tok.type:
+            case 'DEF':
+                return (yield self._procdecl())
+
+            case 'VAR':
+                first = self._advance()
+                name  = self._name()
+                self._expect('EQ')
+                init, _ = yield self._expr()
+                self._expect('COLON')
+                type_, _ = yield self._type()
+                last = self._expect('SEMICOLON')
+
+                return GlobVarDecl(
+                    name     = name,
+                    init     = init,
+                    type_    = type_,
+                    position = self._range(self._span(first), self._span(last)),
+                )
+
+            case 'TYPE':
+                first = self._advance()
+                alias = self._name()
+                self._expect('EQ')
+                type_, _ = yield self._type()
+                last = self._expect('SEMICOLON')
+
+                return TypedefDecl(
+                    alias         = alias,
+                    original_type = type_,
+                    position      = self._range(self._span(first), self._span(last)),
+                )
+
+        self._error()
+
+    def _procdecl(self) -> Rec:
+        first     = self._advance()
+        name      = self._name()
+        arguments = []
+        rettype   = None
+
+        self._expect('LPAREN')
+        if self._tok.type != 'RPAREN':
+            arguments.append((yield self._arg()))
+            while self._tok.type == 'COMMA':
+                self._advance()
+                arguments.append((yield self._arg()))
+        self._expect('RPAREN')
+
+        if self._tok.type == 'COLON':
+            self._advance()
+            rettype, _ = yield self._type()
+
+        body, span = yield self._block()
+
+        return ProcDecl(
+            name      = name,
+            arguments = arguments,
+            rettype   = rettype,
+            body      = body,
+            position  = self._range(self._span(first), span),
+        )
+
+    def _arg(self) -> Rec:
+        name = self._name()
+        self._expect('COLON')
+        return (name, (yield self._type())[0])
+
+    def _name(self) -> Name:
+        tok  = self._expect('IDENT')
+        span = self._span(tok)
+        return Name(value = tok.value, position = self._range(span, span))
+
+    # ----------------------------------------------------------------
+    # Types
+
+    def _type(self) -> Rec:
+        type_, span = yield self._basetype()
+
+        while True:
+            match self._tok.type:
+                case 'STAR':
+                    last  = self._advance()
+                    type_ = PointerType(target = type_)
+
+                case 'LSQUARE':
+                    self._advance()
+                    size  = self._expect('NUMBER').value
+                    last  = self._expect('RSQUARE')
+                    type_ = ArrayType(target = type_, size = size)
+
+                case _:
+                    return type_, span
+
+            span = (span[0], span[1], last.lineno, last.lexpos)
+
+    def _basetype(self) -> Rec:
+        tok = self._tok
+
+        match tok.type:
+            case 'BOOL':
+                self._advance()
+                return BasicType.BOOL, self._span(tok)
+
+            case 'INT':
+                self._advance()
+                return BasicType.INT, self._span(tok)
+
+            case 'STRUCT':
+                self._advance()
+                self._expect('LBRACE')
+                attributes = [(yield self._arg())]
+                while self._tok.type == 'COMMA':
+                    self._advance()
+                    attributes.append((yield self._arg()))
+                last = self._expect('RBRACE')
+
+                return StructType(attributes = attributes), \
+                    (tok.lineno, tok.lexpos, last.lineno, last.lexpos)
+
+            case 'IDENT':
+                return StandinType(type_name = self._name()), self._span(tok)
+
+        self._error()
+
+    # ----------------------------------------------------------------
+    # Statements
+
+    def _block(self) -> Rec:
+        first = self._expect('LBRACE')
+        body  = []
+
+        while self._tok.type != 'RBRACE':
+            try:
+                body.append((yield self._stmt()))
+
+            except _SyntaxError:
+                # stmts : stmts error SEMICOLON
+                self._errcount -= 1
+                while self._tok.type != 'SEMICOLON':
+                    if self._tok is EOF:
+                        raise _Abort
+                    self._discard()
+                self._advance()
+
+        last = self._advance()
+        span = (first.lineno, first.lexpos, last.lineno, last.lexpos)
+
+        return BlockStatement(body = body, position = self._range(span, span)), span
+
+    def _stmt(self) -> Rec:
+        first = self._tok
+
+        match first.type:
+            case 'VAR':
+                self._advance()
+                name = self._name()
+                self._expect('EQ')
+                init, _ = yield self._expr()
+                self._expect('COLON')
+                type_, _ = yield self._type()
+                last = self._expect('SEMICOLON')
+
+                return VarDeclStatement(
+                    name     = name,
+                    init     = init,
+                    type_    = type_,
+                    position = self._range(self._span(first), self._span(last)),
+                )
+
+            case 'IF':
+                return (yield self._if(first))[0]
+
+            case 'WHILE':
+                self._advance()
+                self._expect('LPAREN')
+                condition, _ = yield self._expr()
+                self._expect('RPAREN')
+                body, span = yield self._block()
+
+                return WhileStatement(
+                    condition = condition,
+                    body      = body,
+                    position  = self._range(self._span(first), span),
+                )
+
+            case 'BREAK' | 'CONTINUE':
+                self._advance()
+                last  = self._expect('SEMICOLON')
+                klass = BreakStatement if first.type == 'BREAK' else ContinueStatement
+
+                return klass(position = self._range(self._span(first), self._span(last)))
+
+            case 'RETURN':
+                self._advance()
+                expr = None
+                if self._tok.type != 'SEMICOLON':
+                    expr, _ = yield self._expr()
+                last = self._expect('SEMICOLON')
+
+                return ReturnStatement(
+                    expr     = expr,
+                    position = self._range(self._span(first), self._span(last)),
+                )
+
+            case 'LBRACE':
+                return (yield self._block())[0]
+
+            case 'IDENT' | 'STAR':
+                lhs, span = yield self._unary()
+
+                if isinstance(lhs, Assignable) and self._tok.type == 'EQ':
+                    self._advance()
+                    rhs, _ = yield self._expr()
+                    last = self._expect('SEMICOLON')
+
+                    return AssignStatement(
+                        lhs      = lhs,
+                        rhs      = rhs,
+                        position = self._range(span, self._span(last)),
+                    )
+
+                expr, span = yield self._binary(lhs, span, 0, 'right')
+
+            case _:
+                expr, span = yield self._expr()
+
+        last = self._expect('SEMICOLON')
+
+        return ExprStatement(
+            expression = expr,
+            position   = self._range(span, self._span(last)),
+        )
+
+    def _if(self, first) -> Rec:
+        # `first` is the IF token, or the ELSE token of an `else if`
+        self._expect('IF')
+        self._expect('LPAREN')
+        condition, _ = yield self._expr()
+        self._expect('RPAREN')
+        then, _ = yield self._block()
+
+        if self._tok.type == 'ELSE':
+            elsetok = self._advance()
+
+            match self._tok.type:
+                case 'IF':
+                    else_, span = yield self._if(elsetok)
+                case 'LBRACE':
+                    else_, span = yield self._block()
+                case _:
+                    self._error()
+
+        else:
+            # Empty `stmt_elif`: PLY uses the position of the lexer
+            lexer = self.lexer.lexer
+            else_ = None
+            span  = (lexer.lineno, lexer.lexpos, lexer.lineno, lexer.lexpos)
+
+        span = (first.lineno, first.lexpos, span[2], span[3])
+
+        return IfStatement(
+            condition = condition,
+            then      = then,
+            else_     = else_,
+            position  = self._range(span, span),
+        ), span
+
+    # ----------------------------------------------------------------
+    # Expressions
+    #
+    # All the parsing functions return the parsed node, with the span
+    # of its (grammar) symbol: for a parenthesized expression, that is
+    # the span of the parentheses.
+
+    def _expr(self) -> Rec:
+        return (yield self._binary(*(yield self._unary()), 0, 'right'))
+
+    def _binary(self, left, span, rlevel: int, rassoc: str) -> Rec:
+        """
+        Parses the binary operators following `left`, as long as they
+        would be shifted (and not reduced) by the LALR parser when the
+        rule on the top of its stack has precedence (rlevel, rassoc)
+        """
+        while True:
+            tok  = self._tok
+            prec = self.BINARY.get(tok.type)
+
+            if prec is None:
+                return left, span
+
+            level, assoc = prec
+
+            if level < rlevel or (level == rlevel and rassoc == 'left'):
+                return left, span
+            if level == rlevel and rassoc == 'nonassoc':
+                self._error()
+
+            self._advance()
+            right, rspan = yield self._binary(*(yield self._unary()), level, assoc)
+            span = (span[0], span[1], rspan[2], rspan[3])
+
+            left = OpAppExpression(
+                operator  = self.BINOP[tok.value],
+                arguments = [left, right],
+                position  = self._range(span, span),
+            )
+
+    def _unary(self) -> Rec:
+        tok = self._tok
+
+        match tok.type:
+            case 'TRUE' | 'FALSE':
+                self._advance()
+                span = self._span(tok)
+                return BoolExpression(
+                    value    = (tok.value == 'true'),
+                    position = self._range(span, span),
+                ), span
+
+            case 'NUMBER':
+                self._advance()
+                span = self._span(tok)
+                return IntExpression(value = tok.value, position = self._range(span, span)), span
+
+            case 'NULL':
+                self._advance()
+                span = self._span(tok)
+                return NullExpression(position = self._range(span, span)), span
+
+            case 'DASH' | 'TILD' | 'BANG':
+                self._advance()
+                argument, span = yield self._binary(*(yield self._unary()), *self.UNARY[tok.type])
+                span = (tok.lineno, tok.lexpos, span[2], span[3])
+                return OpAppExpression(
+                    operator  = self.UNIOP[tok.value],
+                    arguments = [argument],
+                    position  = self._range(span, span),
+                ), span
+
+            case 'AMP':
+                self._advance()
+                if self._tok.type == 'LPAREN':
+                    self._advance()
+                    argument, _ = yield self._assignable()
+                    span = self._span(self._expect('RPAREN'))
+                else:
+                    argument, span = yield self._assignable()
+                span = (tok.lineno, tok.lexpos, span[2], span[3])
+                return RefExpression(argument = argument, position = self._range(span, span)), span
+
+            case 'LPAREN':
+                self._advance()
+                expr, _ = yield self._expr()
+                last = self._expect('RPAREN')
+                return expr, (tok.lineno, tok.lexpos, last.lineno, last.lexpos)
+
+            case 'PRINT':
+                self._advance()
+                self._expect('LPAREN')
+                argument, _ = yield self._expr()
+                last = self._expect('RPAREN')
+                span = (tok.lineno, tok.lexpos, last.lineno, last.lexpos)
+                return PrintExpression(argument = argument, position = self._range(span, span)), span
+
+            case 'ALLOC':
+                return (yield self._alloc())
+
+            case 'IDENT':
+                name = self._name()
+
+                if self._tok.type != 'LPAREN':
+                    span = self._span(tok)
+                    return (yield self._postfix(VarAssignable(name = name, position = self._range(span, span)), span))
+
+                self._advance()
+                arguments = []
+                if self._tok.type != 'RPAREN':
+                    arguments.append((yield self._expr())[0])
+                    while self._tok.type == 'COMMA':
+                        self._advance()
+                        arguments.append((yield self._expr())[0])
+                last = self._expect('RPAREN')
+                span = (tok.lineno, tok.lexpos, last.lineno, last.lexpos)
+
+                return CallExpression(
+                    proc      = name,
+                    arguments = arguments,
+                    position  = self._range(span, span),
+                ), span
+
+            case 'STAR':
+                return (yield self._assignable())
+
+        self._error()
+
+    def _alloc(self) -> Rec:
+        # `alloc T[N]` is parsed as the allocation of an array type: as
+        # for _type, but `[` may also start the size of the allocation.
+        first = self._advance()
+        type_, span = yield self._basetype()
+
+        while True:
+            match self._tok.type:
+                case 'STAR':
+                    last  = self._advance()
+                    type_ = PointerType(target = type_)
+
+                case 'LSQUARE':
+                    self._advance()
+
+                    if self._tok.type == 'NUMBER':
+                        tok = self._advance()
+
+                        if self._tok.type == 'RSQUARE':
+                            last  = self._advance()
+                            type_ = ArrayType(target = type_, size = tok.value)
+                            span  = (span[0], span[1], last.lineno, last.lexpos)
+                            continue
+
+                        size = self._span(tok)
+                        size = IntExpression(value = tok.value, position = self._range(size, size))
+                        size, _ = yield self._binary(size, self._span(tok), 0, 'right')
+
+                    else:
+                        size, _ = yield self._expr()
+
+                    last = self._expect('RSQUARE')
+                    span = (first.lineno, first.lexpos, last.lineno, last.lexpos)
+
+                    return AllocExpression(
+                        alloctype = type_,
+                        size      = size,
+                        position  = self._range(span, span),
+                    ), span
+
+                case _:
+                    # The LALR parser only reduces (& checks the type)
+                    # when the next token may follow an expression
+                    if self._tok.type not in self.FOLLOW:
+                        self._error()
+
+                    assert(isinstance(type_, ArrayType))
+                    span = (first.lineno, first.lexpos, span[2], span[3])
+
+                    return AllocExpression(
+                        alloctype = type_.target,
+                        size      = IntExpression(type_.size),
+                        position  = self._range(span, span),
+                    ), span
+
+            span = (span[0], span[1], last.lineno, last.lexpos)
+
+    # ----------------------------------------------------------------
+    # Assignables
+
+    def _assignable(self) -> Rec:
+        return (yield self._postfix(*self._deref()))
+
+    def _deref(self):
+        # assignable : STAR assignable, reduced before any postfix
+        # operator (by precedence, as STAR binds more than LSQUARE...)
+        stars = []
+
+        while self._tok.type == 'STAR':
+            stars.append(self._advance())
+
+        tok      = self._tok
+        name     = self._name()
+        span     = self._span(tok)
+        argument = VarAssignable(name = name, position = self._range(span, span))
+
+        for star in reversed(stars):
+            span     = (star.lineno, star.lexpos, span[2], span[3])
+            argument = DerefAssignable(argument = argument, position = self._range(span, span))
+
+        return argument, span
+
+    def _postfix(self, argument, span) -> Rec:
+        while True:
+            match self._tok.type:
+                case 'LSQUARE':
+                    self._advance()
+                    index, _ = yield self._expr()
+                    last = self._expect('RSQUARE')
+                    span = (span[0], span[1], last.lineno, last.lexpos)
+
+                    argument = ArrayAssignable(
+                        argument = argument,
+                        index    = index,
+                        position = self._range(span, span),
+                    )
+
+                case 'PERIOD' | 'RARROW':
+                    klass = AttributeAssignable if self._tok.type == 'PERIOD' else AttrPointerAssignable
+                    self._advance()
+                    last = self._expect('IDENT')
+                    span = (span[0], span[1], last.lineno, last.lexpos)
+
+                    argument = klass(
+                        argument  = argument,
+                        attribute = last.value,
+                        position  = self._range(span, span),
+                    )
+
+                case _:
+                    return argument, span
@@ -3,43 +3,55 @@ import contextlib as cl
 import typing as tp
 
 # ====================================================================
+# Lexical scopes
+#
+# All the bindings live in a single map, from a name to the stack of
+# its bindings (innermost last), each binding being tagged with the
+# depth of the frame it belongs to. Each frame logs the names it binds,
+# so that closing it only pops their bindings. Looking up, binding or
+# rebinding a name is then O(1), whatever the nesting depth.
+
 class Scope:
     def __init__(self):
-        self.vars = [dict()]
+        self.bindings : dict[str, list[tuple[int, tp.Any]]] = dict()
+        self.frames   : list[list[str]] = [[]]
 
     def open(self):
-        self.vars.append(dict())
+        self.frames.append([])
 
     def close(self):
-        assert(len(self.vars) > 0)
-        self.vars.pop()
+        assert(len(self.frames) > 0)
+        for name in self.frames.pop():
+            stack = self.bindings[name]
+            stack.pop()
+            if not stack:
+                del self.bindings[name]
 
     def push(self, name: str, data: tp.Any):
-        assert(name not in self.vars[-1])
-        self.vars[-1][name] = data
+        assert(not self.islocal(name))
+        self.bindings.setdefault(name, []).append((len(self.frames) - 1, data))
+        self.frames[-1].append(name)
 
     def islocal(self, name: str):
-        return name in self.vars[-1]
+        stack = self.bindings.get(name)
+        return stack is not None and stack[-1][0] == len(self.frames) - 1
 
     def __getitem__(self, name: str):
-        for s in self.vars[::-1]:
-            if name in s:
-                return s[name]
-        assert(False)
+        stack = self.bindings.get(name)
+        assert(stack is not None)
+        return stack[-1][1]
 
     def __setitem__(self, name: str, newdata : tp.Any):
-        if name not in self : 
-            return self.push(name, newdata)
+        stack = self.bindings.get(name)
 
-        #set value in most recent scope 
-        for i in range(len(self.vars) - 1, -1, -1):
-            if name in self.vars[i]:
-                self.vars[i][name] = newdata
-                break
+        if stack is None:
+            return self.push(name, newdata)
 
+        # set value in most recent scope
+        stack[-1] = (stack[-1][0], newdata)
 
     def __contains__(self, name: str):
-        return any(name in s for s in self.vars)
+        return name in self.bindings
 
     @cl.contextmanager
     def in_subscope(self):
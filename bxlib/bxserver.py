@@ -0,0 +1,126 @@
+# --------------------------------------------------------------------
+import errno
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+
+from typing import Optional as Opt
+
+from .bxapi    import CompileOptions, compile_source, shared_parser
+
+# ====================================================================
+# Resident compile server
+#
+# The server listens on a Unix domain socket and keeps a warm parser
+# (lexer & parser tables) and backend registry. Each connection carries
+# exactly one request, as a single line of JSON:
+#
+#   {"source": <BX program>, "tac": <bool, optional>}
+#
+# and receives a single line of JSON as reply:
+#
+#   {"ok": <bool>, "diagnostics": <str>, "asm": <str|null>, "tac": <str|null>}
+#
+# Requests are served in forked children, so that they run concurrently
+# and never share the (per-program) compilation state.
+
+def default_socket_path() -> str:
+    rundir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(rundir, f'bxc-{os.getuid()}.sock')
+
+def remove_stale_socket(path: str):
+    """
+    Removes the socket left at `path` by a server that is not running
+    anymore. Raises OSError if a server is still listening on it, if
+    `path` is not a socket (that is then left untouched) or if `path`
+    cannot be probed.
+    """
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise OSError(errno.EEXIST, 'file exists and is not a socket', path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+
+    raise OSError(errno.EADDRINUSE, 'a compile server is already running', path)
+
+# --------------------------------------------------------------------
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+
+        # Connections without any request only probe the socket (see
+        # remove_stale_socket)
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            assert(isinstance(request, dict) and isinstance(request['source'], str))
+        except (ValueError, KeyError, AssertionError):
+            reply = dict(ok = False, diagnostics = 'malformed request', asm = None, tac = None)
+        else:
+            reply = self.server.compile(request['source'], bool(request.get('tac')))
+
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+# --------------------------------------------------------------------
+class CompileServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    def __init__(self, path: str, idle_timeout: Opt[float] = None, parser: str = 'ply'):
+        self.path    = path
+        self.timeout = idle_timeout
+        self.idle    = False
+        self.options = CompileOptions(parser = parser)
+
+        # Build the parser once, before forking the request handlers
+        shared_parser(parser)
+
+        # Remove a stale socket left by a previous server, but never
+        # the one of a running server
+        if os.path.exists(path):
+            remove_stale_socket(path)
+
+        super().__init__(path, _RequestHandler)
+
+    def compile(self, source: str, with_tac: bool = False) -> dict:
+        reply = dict(ok = False, diagnostics = '', asm = None, tac = None)
+
+        try:
+            result = compile_source(source, options = self.options)
+
+            reply['diagnostics'] = result.messages
+
+            if result.ok:
+                if with_tac:
+                    reply['tac'] = result.tac_text()
+                reply['asm'] = result.asm
+                reply['ok']  = result.ok
+
+            if result.error is not None:
+                raise result.error
+
+        except Exception as e:
+            reply['diagnostics'] += f'internal compiler error: {e!r}\n'
+
+        return reply
+
+    def handle_timeout(self):
+        # Only stop once all the pending requests have been served
+        super().handle_timeout()
+        if not self.active_children:
+            self.idle = True
+
+    def serve(self):
+        try:
+            while not self.idle:
+                self.handle_request()
+        finally:
+            self.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
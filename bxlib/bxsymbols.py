@@ -0,0 +1,77 @@
+# --------------------------------------------------------------------
+import enum
+
+# ====================================================================
+# Interned symbols
+#
+# The names of the TAC -- temporaries (`%4`, `%x`), globals (`@x`),
+# labels (`.Lmain.5`) and procedures (`print_int`) -- are interned as
+# Symbols: ints, indices in a process-wide table, that hash & compare
+# as ints. The kind of a symbol is stored in the table, and its name is
+# only rendered when printing the TAC or the assembly (str(), repr()
+# and format() of a symbol are those of its name).
+#
+# Symbols are pickled by name, and interned again in the unpickling
+# process (e.g. in the workers of a process pool).
+
+class Kind(enum.IntEnum):
+    TEMP   = 0                  # %n, %x
+    GLOBAL = 1                  # @x
+    LABEL  = 2                  # .L...
+    PROC   = 3                  # Procedure names
+
+_KINDS = { '%': Kind.TEMP, '@': Kind.GLOBAL, '.': Kind.LABEL }
+
+# --------------------------------------------------------------------
+class Symbol(int):
+    __slots__ = ()
+
+    @property
+    def name(self) -> str:
+        return _names[self]
+
+    @property
+    def kind(self) -> Kind:
+        return _kinds[self]
+
+    def __str__(self):
+        return _names[self]
+
+    def __repr__(self):
+        return repr(_names[self])
+
+    def __format__(self, spec: str):
+        return format(_names[self], spec)
+
+    def __bool__(self):
+        # Symbol #0 is a name, not a false value
+        return True
+
+    def __reduce__(self):
+        return (intern, (_names[self],))
+
+_names : list[str]         = []
+_kinds : list[Kind]        = []
+_ids   : dict[str, Symbol] = {}
+_temps : list[Symbol]      = []     # %n -> symbol
+
+# --------------------------------------------------------------------
+def intern(name: str) -> Symbol:
+    """
+    Returns the symbol of `name`, its kind being given by its first
+    character
+    """
+    symbol = _ids.get(name)
+    if symbol is None:
+        symbol = _ids[name] = int.__new__(Symbol, len(_names))
+        _names.append(name)
+        _kinds.append(_KINDS.get(name[:1], Kind.PROC))
+    return symbol
+
+def temp(index: int) -> Symbol:
+    """
+    Returns the symbol of the temporary `%index`
+    """
+    while len(_temps) <= index:
+        _temps.append(intern(f'%{len(_temps)}'))
+    return _temps[index]
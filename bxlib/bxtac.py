@@ -3,8 +3,14 @@ import dataclasses as dc
 
 from typing import Optional as Opt
 
+from .bxsymbols import Symbol
+
 # ====================================================================
 # Three-Address Code
+#
+# Temporaries, globals, labels and procedure names are Symbols (see
+# bxsymbols.py). The body of a procedure is a list of TAC instructions
+# and of labels (Symbols).
 
 OPCODES = {
     'opposite'            : 'neg',
@@ -21,18 +27,78 @@ OPCODES = {
     'logical-right-shift' : 'shr',
 }
 
+# --------------------------------------------------------------------
+# Instruction set: opcode -> kinds of the arguments, where S is a
+# Symbol (temporary, global or procedure), L a label, I an int and A
+# an address (a Symbol, or a pair (Symbol, offset)). The result, if
+# any, is a Symbol. The index of an opcode in this table is its
+# integer opcode (see bxctac.py)
+
+SIGNATURES = {
+    'const'      : 'IS' ,
+    'copy'       : 'S'  ,
+    'neg'        : 'S'  ,
+    'not'        : 'S'  ,
+    'add'        : 'SS' ,
+    'sub'        : 'SS' ,
+    'mul'        : 'SS' ,
+    'div'        : 'SS' ,
+    'mod'        : 'SS' ,
+    'and'        : 'SS' ,
+    'or'         : 'SS' ,
+    'xor'        : 'SS' ,
+    'shl'        : 'SS' ,
+    'shr'        : 'SS' ,
+    'print'      : 'S'  ,
+    'jmp'        : 'L'  ,
+    'jz'         : 'SL' ,
+    'jnz'        : 'SL' ,
+    'jlt'        : 'SL' ,
+    'jle'        : 'SL' ,
+    'jgt'        : 'SL' ,
+    'jge'        : 'SL' ,
+    'param'      : 'IS' ,
+    'call'       : 'SI' ,
+    'ret'        : 'S'  ,
+    'load'       : 'A'  ,
+    'store'      : 'SA' ,
+    'ref'        : 'S'  ,
+    'alloc'      : 'SI' ,
+    'zero_out'   : 'SI' ,
+    'copy_array' : 'SSI',
+}
+
+OPNAMES = tuple(SIGNATURES)
+OPIDS   = { x: i for i, x in enumerate(OPNAMES) }
+
+# Valid shapes of the instructions: opcode -> set of (number of
+# arguments, whether there is a result). Constants are assigned either
+# to the result or to a second argument, and `ret` takes no argument in
+# procedures without a return value.
+
+_NO_RESULT = (
+    'print', 'jmp', 'jz', 'jnz', 'jlt', 'jle', 'jgt', 'jge',
+    'param', 'ret', 'store', 'zero_out', 'copy_array',
+)
+
+SHAPES = { x: {(len(k), x not in _NO_RESULT)} for x, k in SIGNATURES.items() }
+
+SHAPES['const'] = {(1, True), (2, False)}
+SHAPES['call' ] = {(2, False), (2, True)}
+SHAPES['ret'  ] = {(0, False), (1, False)}
+
 # --------------------------------------------------------------------
 @dc.dataclass
 class TAC:
     opcode    : str
-    arguments : list[str | int]
-    result    : Opt[str | int] = None
+    arguments : list[Symbol | int | tuple[Symbol, int]]
+    result    : Opt[Symbol] = None
 
     def tojson(self):
         return dict(
-            opcode = self.opcode   ,
-            args   = self.arguments,
-            result = self.result   ,
+            opcode = self.opcode,
+            args   = [_tojson(x) for x in self.arguments],
+            result = _tojson(self.result),
         )
 
     def __repr__(self):
@@ -47,13 +113,14 @@ class TAC:
 class TACProc:
     __match_args__ = ('name', 'arguments', 'tac')
 
-    def __init__(self, name: str, arguments: list[str]):
+    def __init__(self, name: str, arguments: list[Symbol]):
         self.name      = name
         self.arguments = arguments
         self.tac       = []
         self.temp_sizes = dict()
+        self.counter   = -1     # Last index used for fresh temporaries/labels (see MM.numbering)
 
-    def add_temp_size(self, temp_name : str, bytesize : int):
+    def add_temp_size(self, temp_name : Symbol, bytesize : int):
         self.temp_sizes[temp_name] = bytesize
 
     def __repr__(self):
@@ -62,8 +129,10 @@ class TACProc:
             aout = f"{aout}({', '.join(map(repr, self.arguments))})"
         aout = [f"{aout}:"]
         for tac in self.tac:
-            is_label = (isinstance(tac, str) and tac[0] == "." and tac[-1] == ":")
-            aout.append(f"    {tac}{';' * (not is_label)}")
+            if isinstance(tac, Symbol):
+                aout.append(f"    {tac}:")
+            else:
+                aout.append(f"    {tac};")
         return "\n".join(aout) + "\n"
 
 # --------------------------------------------------------------------
@@ -76,3 +145,13 @@ class TACVar:
 
     def __repr__(self):
         return f"var @{self.name} = {self.value};"
+
+# --------------------------------------------------------------------
+def _tojson(x):
+    match x:
+        case Symbol():
+            return str(x)
+        case tuple():
+            return [_tojson(y) for y in x]
+        case _:
+            return x
@@ -0,0 +1,321 @@
+# --------------------------------------------------------------------
+import array
+import io
+import json
+import struct
+import sys
+import typing as tp
+
+from .bxctac    import CompactProc, STRIDE
+from .bxsymbols import Symbol, intern
+from .bxtac     import *
+
+# ====================================================================
+# TAC files
+#
+# A TAC program (a list of TACProc & TACVar) is saved in one of two
+# formats, that both record the stage of the program -- 'mm' for
+# munched TAC, 'opt' for optimized TAC -- and everything needed to
+# resume the pipeline from it (temporaries sizes & numbering counters
+# of the procedures):
+#
+#  - bin   : MAGIC, the stage, then one record by declaration. The body
+#            of a procedure is stored as the arrays of its CompactProc
+#            (see bxctac.py), in little-endian order;
+#  - jsonl : a header object, then one JSON object by declaration, the
+#            instructions being those of TAC.tojson and the labels
+#            being strings.
+#
+# load() reads both formats (telling them apart by their first bytes).
+
+FORMATS = { 'bin': 'btac', 'jsonl': 'jtac' }    # Format -> file extension
+STAGES  = ('mm', 'opt')
+
+MAGIC   = b'BXTAC\x01'
+VERSION = 1
+
+_SWAP = sys.byteorder != 'little'
+
+# --------------------------------------------------------------------
+def dump(
+        tac    : tp.Iterable[TACProc | TACVar],
+        stream : tp.BinaryIO,
+        format : str = 'bin',
+        stage  : str = 'opt',
+):
+    """
+    Writes the TAC program `tac`, at stage `stage`, to `stream`
+    """
+    assert(format in FORMATS and stage in STAGES)
+
+    if format == 'bin':
+        _BinWriter(stream).program(tac, stage)
+    else:
+        _dump_jsonl(tac, stream, stage)
+
+def dumps(tac: tp.Iterable[TACProc | TACVar], format: str = 'bin', stage: str = 'opt') -> bytes:
+    aout = io.BytesIO()
+    dump(tac, aout, format, stage)
+    return aout.getvalue()
+
+def load(stream: tp.BinaryIO) -> tuple[str, list[TACProc | TACVar]]:
+    """
+    Reads a TAC program, returning its stage & declarations. Raises
+    ValueError if `stream` is not a valid TAC file.
+    """
+    return loads(stream.read())
+
+def loads(data: bytes) -> tuple[str, list[TACProc | TACVar]]:
+    try:
+        if data.startswith(MAGIC):
+            return _BinReader(data).program()
+        return _load_jsonl(data)
+
+    except (struct.error, KeyError, IndexError, TypeError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f'invalid TAC file: {e}')
+
+# ====================================================================
+# Binary format
+
+_TAGS = { TACVar: b'V', TACProc: b'P' }
+
+class _BinWriter:
+    def __init__(self, stream: tp.BinaryIO):
+        self.stream = stream
+
+    def u32(self, value: int):
+        self.stream.write(struct.pack('<I', value))
+
+    def i64(self, value: int):
+        self.stream.write(struct.pack('<q', value))
+
+    def str(self, value: str):
+        value = value.encode('utf-8')
+        self.u32(len(value))
+        self.stream.write(value)
+
+    def strs(self, values: tp.Iterable[tp.Any]):
+        # Names never contain NUL characters
+        values = list(values)
+        self.u32(len(values))
+        self.str('\0'.join(map(str, values)))
+
+    def array(self, values: array.array):
+        if _SWAP and values.itemsize > 1:
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        self.stream.write(values.tobytes())
+
+    def program(self, tac: tp.Iterable[TACProc | TACVar], stage: str):
+        self.stream.write(MAGIC)
+        self.str(stage)
+
+        for decl in tac:
+            self.stream.write(_TAGS[type(decl)])
+
+            match decl:
+                case TACVar(name, value):
+                    self.str(name)
+                    self.i64(value)
+
+                case TACProc(name, arguments):
+                    proc = CompactProc.of_proc(decl)
+
+                    self.str(name)
+                    self.i64(proc.counter)
+                    self.strs(arguments)
+                    self.strs(proc.temp_sizes)
+                    self.array(array.array('q', proc.temp_sizes.values()))
+                    self.strs(proc.symbols)
+                    self.strs(proc.labels)
+                    self.u32(len(proc))
+                    self.array(proc.ops)
+                    self.array(proc.shapes)
+                    self.array(proc.operands)
+
+# --------------------------------------------------------------------
+class _BinReader:
+    def __init__(self, data: bytes):
+        self.data     = memoryview(data)
+        self.position = len(MAGIC)
+
+    def _unpack(self, fmt: str) -> int:
+        value, = struct.unpack_from(fmt, self.data, self.position)
+        self.position += struct.calcsize(fmt)
+        return value
+
+    def u32(self) -> int:
+        return self._unpack('<I')
+
+    def i64(self) -> int:
+        return self._unpack('<q')
+
+    def bytes(self, size: int) -> memoryview:
+        if self.position + size > len(self.data):
+            raise struct.error('truncated file')
+        self.position += size
+        return self.data[self.position-size:self.position]
+
+    def str(self) -> str:
+        return str(self.bytes(self.u32()), 'utf-8')
+
+    def strs(self) -> list[str]:
+        size, values = self.u32(), self.str()
+        return values.split('\0') if size else []
+
+    def array(self, typecode: str, size: int) -> array.array:
+        aout = array.array(typecode)
+        aout.frombytes(self.bytes(size * aout.itemsize))
+        if _SWAP and aout.itemsize > 1:
+            aout.byteswap()
+        return aout
+
+    def program(self) -> tuple[str, list[TACProc | TACVar]]:
+        stage, decls = self.str(), []
+
+        if stage not in STAGES:
+            raise ValueError(f'invalid TAC file: unknown stage {stage}')
+
+        while self.position < len(self.data):
+            match bytes(self.bytes(1)):
+                case b'V':
+                    name = self.str()
+                    decls.append(TACVar(name, self.i64()))
+
+                case b'P':
+                    name      = self.str()
+                    counter   = self.i64()
+                    arguments = list(map(intern, self.strs()))
+                    temps     = list(map(intern, self.strs()))
+                    sizes     = _check_sizes(dict(zip(temps, self.array('q', len(temps)))))
+                    proc      = CompactProc(name, arguments, sizes, counter)
+
+                    proc.symbols  = list(map(intern, self.strs()))
+                    proc.labels   = list(map(intern, self.strs()))
+
+                    size = self.u32()
+
+                    proc.ops      = self.array('B', size)
+                    proc.shapes   = self.array('B', size)
+                    proc.operands = self.array('q', size * STRIDE)
+
+                    try:
+                        proc.validate()
+                    except ValueError as e:
+                        raise ValueError(f'invalid TAC file: {name}: {e}')
+
+                    decls.append(proc.to_proc())
+
+                case tag:
+                    raise ValueError(f'invalid TAC file: unknown record {tag!r}')
+
+        return stage, decls
+
+# ====================================================================
+# JSON-lines format
+
+def _dump_jsonl(tac: tp.Iterable[TACProc | TACVar], stream: tp.BinaryIO, stage: str):
+    def write(value: dict):
+        stream.write(json.dumps(value, separators = (',', ':')).encode('utf-8'))
+        stream.write(b'\n')
+
+    write(dict(format = 'bxtac', version = VERSION, stage = stage))
+
+    for decl in tac:
+        match decl:
+            case TACVar(name, value):
+                write(dict(var = name, value = value))
+
+            case TACProc(name, arguments, body):
+                write(dict(
+                    proc       = name,
+                    arguments  = [str(x) for x in arguments],
+                    temp_sizes = { str(x): size for x, size in decl.temp_sizes.items() },
+                    counter    = decl.counter,
+                    tac        = [str(x) if isinstance(x, Symbol) else x.tojson() for x in body],
+                ))
+
+def _check_sizes(sizes: dict[Symbol, int]) -> dict[Symbol, int]:
+    for x, size in sizes.items():
+        if not _isint(size) or size <= 0 or size % 8:
+            raise ValueError(f'invalid TAC file: invalid size for {x}: {size!r}')
+    return sizes
+
+def _isint(value: tp.Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _fromjson(kind: str, value: tp.Any) -> Symbol | int | tuple[Symbol, int]:
+    match kind:
+        case 'I' if _isint(value):
+            return value
+        case 'A' if isinstance(value, list) and len(value) == 2 \
+                    and isinstance(value[0], str) and _isint(value[1]):
+            return (intern(value[0]), value[1])
+        case 'S' | 'L' | 'A' if isinstance(value, str):
+            return intern(value)
+        case _:
+            raise ValueError(f'invalid TAC file: invalid {kind} operand {value!r}')
+
+def _load_jsonl(data: bytes) -> tuple[str, list[TACProc | TACVar]]:
+    lines = iter(data.decode('utf-8').splitlines())
+
+    header = json.loads(next(lines, 'null'))
+
+    if not isinstance(header, dict) or header.get('format') != 'bxtac':
+        raise ValueError('invalid TAC file: not a TAC file')
+    if header.get('version') != VERSION or header.get('stage') not in STAGES:
+        raise ValueError('invalid TAC file: unsupported version or stage')
+
+    decls = []
+
+    for line in lines:
+        if not line.strip():
+            continue
+
+        decl = json.loads(line)
+
+        if not isinstance(decl, dict):
+            raise ValueError(f'invalid TAC file: not a declaration: {line}')
+
+        if 'var' in decl:
+            if not isinstance(decl['var'], str) or not _isint(decl['value']):
+                raise ValueError(f'invalid TAC file: invalid variable: {line}')
+            decls.append(TACVar(decl['var'], decl['value']))
+            continue
+
+        if not isinstance(decl['proc'], str) or not _isint(decl['counter']) \
+           or not all(isinstance(x, str) for x in decl['arguments']) \
+           or not isinstance(decl['temp_sizes'], dict) or not isinstance(decl['tac'], list):
+            raise ValueError(f'invalid TAC file: invalid procedure: {line}')
+
+        proc = TACProc(decl['proc'], [intern(x) for x in decl['arguments']])
+
+        proc.temp_sizes = _check_sizes({ intern(x): size for x, size in decl['temp_sizes'].items() })
+        proc.counter    = decl['counter']
+
+        for instr in decl['tac']:
+            if isinstance(instr, str):
+                proc.tac.append(intern(instr))
+                continue
+
+            if not isinstance(instr, dict):
+                raise ValueError(f'invalid TAC file: invalid instruction {instr!r}')
+
+            opcode, args, result = instr['opcode'], instr['args'], instr['result']
+
+            if opcode not in SIGNATURES:
+                raise ValueError(f'invalid TAC file: unknown opcode {opcode!r}')
+            if not isinstance(args, list) or (len(args), result is not None) not in SHAPES[opcode]:
+                raise ValueError(f'invalid TAC file: invalid instruction {instr!r}')
+            if result is not None and not isinstance(result, str):
+                raise ValueError(f'invalid TAC file: invalid result {result!r}')
+
+            proc.tac.append(TAC(
+                opcode,
+                [_fromjson(k, x) for k, x in zip(SIGNATURES[opcode], args)],
+                None if result is None else intern(result),
+            ))
+
+        decls.append(proc)
+
+    return header['stage'], decls
@@ -0,0 +1,264 @@
+# --------------------------------------------------------------------
+import contextlib as cl
+import dataclasses as dc
+import json
+import os
+import time
+import tracemalloc
+import typing as tp
+
+from typing import Optional as Opt
+
+from .bxast     import *
+from .bxcfg     import CFG
+from .bxflatast import FlatAST
+from .bxtac     import *
+
+# ====================================================================
+# Per-phase timing & IR size instrumentation
+
+# --------------------------------------------------------------------
+@dc.dataclass
+class PassRecord:
+    phase  : str
+    proc   : Opt[str]                   = None
+    start  : float                      = 0.    # time.time() at the start of the phase
+    wall   : float                      = 0.
+    cpu    : float                      = 0.
+    before : Opt[tuple[str, int]]       = None
+    after  : tp.Any                     = None  # IR object, replaced by its size
+
+    # Set by MemoryTracker only (in bytes)
+    mem_peak     : Opt[int]                         = None
+    mem_retained : Opt[int]                         = None
+    sites        : Opt[list[tuple[str, int]]]       = None
+
+# --------------------------------------------------------------------
+class PassTimer:
+    """
+    Records the wall/CPU time spent in each phase of the compiler
+    (optionally per procedure), and the size of the IR before/after
+    each phase. A disabled timer records nothing and never computes
+    IR sizes, so that the phases can be instrumented unconditionally.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.records : list[PassRecord] = []
+
+    @staticmethod
+    def _cpu_time() -> float:
+        # Includes the time spent in (waited for) subprocesses, e.g. gcc
+        t = os.times()
+        return time.process_time() + t.children_user + t.children_system
+
+    @cl.contextmanager
+    def phase(self, name: str, proc: Opt[str] = None, before: tp.Any = None):
+        """
+        Times the body of the `with` statement. `before` is the input IR
+        of the phase; the body can set the `after` attribute of the
+        yielded record to the output IR of the phase.
+        """
+        record = PassRecord(name, proc)
+
+        if not self.enabled:
+            yield record
+            return
+
+        record.before = ir_size(before)
+        record.start  = time.time()
+        wall, cpu = time.perf_counter(), self._cpu_time()
+
+        try:
+            yield record
+        finally:
+            record.wall  = time.perf_counter() - wall
+            record.cpu   = self._cpu_time() - cpu
+            record.after = ir_size(record.after)
+            self.records.append(record)
+
+    def summary(self) -> list[PassRecord]:
+        """
+        Aggregates the records per phase (in order of first occurrence)
+        """
+        phases : dict[str, PassRecord] = {}
+
+        for record in self.records:
+            total = phases.setdefault(record.phase, PassRecord(record.phase, start = record.start))
+            total.wall  += record.wall
+            total.cpu   += record.cpu
+            total.before = _add_sizes(total.before, record.before)
+            total.after  = _add_sizes(total.after , record.after )
+
+            if record.mem_peak is not None:
+                total.mem_peak     = max(total.mem_peak or 0, record.mem_peak)
+                total.mem_retained = (total.mem_retained or 0) + record.mem_retained
+            if record.sites is not None:
+                total.sites = (total.sites or []) + record.sites
+
+        return list(phases.values())
+
+    def tojson(self):
+        return [dc.asdict(record) for record in self.records]
+
+    def report(self, stream: tp.TextIO, nprocs: int = 10):
+        def p(*x):
+            print(*x, file = stream)
+
+        def size(x):
+            return '' if x is None else f'{x[1]} {x[0]}'
+
+        def table(records, first):
+            p(f'{first:<24} {"wall (ms)":>10} {"cpu (ms)":>10} {"IR before":>18} {"IR after":>18}')
+            for r in records:
+                label = r.phase if r.proc is None else f'{r.phase} @{r.proc}'
+                p(f'{label:<24} {1000*r.wall:>10.3f} {1000*r.cpu:>10.3f} {size(r.before):>18} {size(r.after):>18}')
+
+        summary = self.summary()
+        table(summary, 'phase')
+        p(f'{"total":<24} {1000*sum(r.wall for r in summary):>10.3f} {1000*sum(r.cpu for r in summary):>10.3f}')
+
+        procs = sorted(
+            (r for r in self.records if r.proc is not None),
+            key = lambda r: r.wall, reverse = True,
+        )
+
+        if procs:
+            p()
+            table(procs[:nprocs], 'slowest procedure passes')
+
+# --------------------------------------------------------------------
+class MemoryTracker(PassTimer):
+    """
+    A PassTimer that also records, using tracemalloc, the peak and the
+    retained memory of each phase. For the phases that are not
+    per-procedure, the allocation sites that grew the most are also
+    recorded (from snapshots taken around the phase).
+
+    tracemalloc must have been started before the phases to track.
+    """
+
+    def __init__(self, nsites: int = 5):
+        super().__init__(enabled = True)
+        self.nsites = nsites
+
+    @cl.contextmanager
+    def phase(self, name: str, proc: Opt[str] = None, before: tp.Any = None):
+        if not tracemalloc.is_tracing():
+            with super().phase(name, proc, before) as record:
+                yield record
+            return
+
+        snapshot = None if proc is not None else self._snapshot()
+
+        with super().phase(name, proc, before) as record:
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+            try:
+                yield record
+            finally:
+                current, peak = tracemalloc.get_traced_memory()
+                record.mem_peak     = peak - start
+                record.mem_retained = current - start
+
+        if snapshot is not None:
+            stats = self._snapshot().compare_to(snapshot, 'lineno')
+            stats = [x for x in stats if x.size_diff > 0][:self.nsites]
+            record.sites = [
+                (f'{x.traceback[0].filename}:{x.traceback[0].lineno}', x.size_diff)
+                for x in stats
+            ]
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def mem_report(self, stream: tp.TextIO):
+        def p(*x):
+            print(*x, file = stream)
+
+        def kib(x):
+            return '' if x is None else f'{x / 1024:.1f}'
+
+        summary = self.summary()
+
+        p(f'{"phase":<24} {"peak (KiB)":>12} {"retained (KiB)":>15}')
+        for r in summary:
+            p(f'{r.phase:<24} {kib(r.mem_peak):>12} {kib(r.mem_retained):>15}')
+
+        for r in summary:
+            if r.sites:
+                p()
+                p(f'top allocation sites of {r.phase}:')
+                for site, size in sorted(r.sites, key = lambda x: x[1], reverse = True)[:self.nsites]:
+                    p(f'  {kib(size):>10} KiB  {site}')
+
+# A shared disabled timer, used as default by the instrumented functions
+NO_TIMER = PassTimer(enabled = False)
+
+# --------------------------------------------------------------------
+def _add_sizes(x: Opt[tuple[str, int]], y: Opt[tuple[str, int]]):
+    if x is None:
+        return y
+    if y is None or x[0] != y[0]:
+        return x
+    return (x[0], x[1] + y[1])
+
+# --------------------------------------------------------------------
+def ast_size(node: tp.Any) -> int:
+    """
+    Returns the number of AST nodes reachable from `node`
+    """
+    count, todo = 0, [node]
+
+    while todo:
+        node = todo.pop()
+
+        if isinstance(node, (list, tuple)):
+            todo.extend(node)
+        elif isinstance(node, AST):
+            count += 1
+            todo.extend(getattr(node, f.name) for f in dc.fields(node))
+
+    return count
+
+# --------------------------------------------------------------------
+def ir_size(ir: tp.Any) -> Opt[tuple[str, int]]:
+    """
+    Returns the size of an IR object as a pair (unit, size)
+    """
+    match ir:
+        case None:
+            return None
+
+        case CFG():
+            return ('blocks', len(ir.cfg))
+
+        case FlatAST():
+            return ('ast nodes', ir.nnodes)
+
+        case TACProc():
+            return ('tac', len(ir.tac))
+
+        case TACVar():
+            return ('tac', 1)
+
+        case str():
+            return ('asm lines', ir.count('\n'))
+
+        case list() if any(isinstance(x, AST) for x in ir):
+            return ('ast nodes', ast_size(ir))
+
+        case list():
+            return ('tac', sum(ir_size(x)[1] if isinstance(x, (TACProc, TACVar)) else 1 for x in ir))
+
+        case _:
+            return None
+
+# --------------------------------------------------------------------
+def dump_json(timers: dict[str, PassTimer], stream: tp.TextIO):
+    json.dump({ name: timer.tojson() for name, timer in timers.items() }, stream, indent = 2)
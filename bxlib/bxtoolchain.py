@@ -0,0 +1,79 @@
+# --------------------------------------------------------------------
+import functools as ft
+import hashlib
+import os
+import subprocess as sp
+
+from .bxcache import cache_dir
+
+# ====================================================================
+# Assembling & linking with gcc
+#
+# The runtime (bxruntime.c) is compiled once into an object file stored
+# in the cache directory, named after the hash of its source, so that
+# it is only rebuilt when bxruntime.c changes. Programs are then
+# assembled & linked against it with a single gcc invocation.
+
+RUNTIME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bxruntime.c')
+CFLAGS  = ['-g']
+
+# Last stage of the compilation, with the extension of its output
+EMITS = { 'tac': 'tac', 'asm': 's', 'obj': 'o', 'exe': 'exe' }
+
+@ft.cache
+def runtime_object() -> str:
+    """
+    Returns the path of the compiled runtime, building it if needed.
+    Falls back to the runtime source (that is then compiled with every
+    program) if caching is disabled or if the runtime cannot be built.
+    """
+    root = cache_dir('runtime')
+
+    if root is None:
+        return RUNTIME
+
+    h = hashlib.sha256()
+    h.update(' '.join(CFLAGS).encode('utf-8'))
+    try:
+        with open(RUNTIME, 'rb') as stream:
+            h.update(stream.read())
+    except OSError:
+        return RUNTIME
+
+    path = os.path.join(root, f'bxruntime-{h.hexdigest()[:16]}.o')
+
+    if os.path.exists(path):
+        return path
+
+    tmppath = f'{path}.{os.getpid()}.tmp'
+
+    # The temporary object is removed whatever happens (e.g. gcc fails
+    # or cannot be run), so that no partial object is left behind
+    try:
+        if sp.call(['gcc', *CFLAGS, '-c', '-o', tmppath, RUNTIME]) != 0:
+            return RUNTIME
+        os.replace(tmppath, path)
+
+    except OSError:
+        return RUNTIME
+
+    finally:
+        if os.path.exists(tmppath):
+            os.unlink(tmppath)
+
+    return path
+
+def commands(basename: str, emit: str = 'exe') -> list[list[str]]:
+    """
+    Returns the gcc commands turning `basename.s` into the output of
+    the `emit` stage (none for the TAC & assembly stages)
+    """
+    match emit:
+        case 'obj':
+            return [['gcc', *CFLAGS, '-c', '-o', f'{basename}.o', f'{basename}.s']]
+
+        case 'exe':
+            return [['gcc', *CFLAGS, '-o', f'{basename}.exe', f'{basename}.s', runtime_object()]]
+
+        case _:
+            return []
@@ -0,0 +1,55 @@
+# --------------------------------------------------------------------
+import typing as tp
+
+# ====================================================================
+# Recursion-free recursive traversals
+#
+# A recursive function is written as a generator that, instead of
+# calling itself, yields the generator of the recursive call and is
+# sent back its result:
+#
+#   def _depth(self, expr):
+#       depth = 0
+#       for x in expr.arguments:
+#           depth = max(depth, (yield self._depth(x)))
+#       return depth + 1
+#
+#   depth = trampoline(self._depth(expr))
+#
+# trampoline() runs it with an explicit stack of suspended generators:
+# the depth of the recursion is then only bounded by the memory, not
+# by the Python recursion limit, and the traversal happens in the same
+# order as the recursive one. An exception raised by a recursive call
+# is thrown into its caller, at the `yield`, as if it had been raised
+# by a call.
+
+Rec = tp.Generator[tp.Any, tp.Any, tp.Any]
+
+def trampoline(gen: Rec) -> tp.Any:
+    """
+    Runs the recursive generator `gen` and returns its result
+    """
+    stack, value, error = [gen], None, None
+
+    while True:
+        try:
+            if error is None:
+                child = stack[-1].send(value)
+            else:
+                child = stack[-1].throw(error)
+
+        except StopIteration as e:
+            stack.pop()
+            if not stack:
+                return e.value
+            value, error = e.value, None
+
+        except BaseException as e:
+            stack.pop()
+            if not stack:
+                raise
+            value, error = None, e
+
+        else:
+            stack.append(child)
+            value, error = None, None
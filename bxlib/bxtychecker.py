@@ -2,10 +2,11 @@
 import contextlib as cl
 import typing as tp
 
-from .bxerrors  import Reporter
-from .bxast     import *
-from .bxscope   import Scope
-from .bxtysizer import TypeSize
+from .bxerrors     import Reporter
+from .bxast        import *
+from .bxscope      import Scope
+from .bxtrampoline import Rec, trampoline
+from .bxtysizer    import TypeSize
 
 # ====================================================================
 SigType    = tuple[tuple[Type], Opt[Type]]
@@ -106,6 +107,7 @@ class TypeChecker:
         self.loops    = 0
         self.proc     = None
         self.reporter = reporter
+        self.resolved : dict[int, tuple[Type, Type]] = dict()   # id(type) -> (type, resolved type)
 
     def report(self, msg: str, position: Opt[Range] = None):
         self.reporter(msg, position = position)
@@ -188,25 +190,57 @@ class TypeChecker:
     def resolve_type(self, type_ : Type, seen_names : None | set[str] = None) -> Type : 
         """
         Processes type info to make it into a format appropriate for the 
-        muncher (only directly affects structs and type stand-ins)
+        muncher (only directly affects structs and type stand-ins).
+        Each type is only resolved once: the result is memoised (by
+        identity) in `self.resolved`, resolved types resolving to
+        themselves
+        """
+        # Pointer & array chains (e.g. int**[4]*) are walked down
+        # iteratively, then rebuilt from their resolved base
+        chain = []
+
+        while True:
+            #untouched types
+            if isinstance(type_, BasicType) or not type_: 
+                real_type = type_
+                break
+
+            cached = self.resolved.get(id(type_))
+            if cached is not None:
+                real_type = cached[1]
+                break
+
+            if not isinstance(type_, (PointerType, ArrayType)):
+                real_type = self._resolve_type(type_, seen_names)
+                self._memoise(type_, real_type)
+                break
+
+            # A pointer can refer to the type being defined
+            if isinstance(type_, PointerType):
+                seen_names = None
+
+            chain.append(type_)
+            type_ = type_.target
+
+        for type_ in reversed(chain):
+            if isinstance(type_, PointerType):
+                real_type = PointerType(target = real_type)
+            else:
+                real_type = ArrayType(target = real_type, size = type_.size)
+            self._memoise(type_, real_type)
+
+        return real_type
+
+    def _memoise(self, type_ : Type, real_type : Type):
+        # The keys are kept alive by the values, so that ids are not reused
+        self.resolved[id(type_)]     = (type_, real_type)
+        self.resolved[id(real_type)] = (real_type, real_type)
+
+    def _resolve_type(self, type_ : Type, seen_names : None | set[str] = None) -> Type : 
+        """
+        Resolves a struct or a type stand-in
         """
-        #untouched types
-        if isinstance(type_, BasicType) or not type_: 
-            return type_
-
-        #special cases
         match type_ : 
-            case PointerType(target):
-                return PointerType(
-                    target = self.resolve_type(target)
-                )
-            
-            case ArrayType(target, size):
-                return ArrayType(
-                    target = self.resolve_type(target, seen_names),
-                    size = size
-                )
-
             case StructType(attributes, attr_lookup = attr_lookup):
                 if attr_lookup is not None : 
                     return type_
@@ -220,6 +254,8 @@ class TypeChecker:
                     type_.attr_lookup[attr_name.value] = (offset, real_t)
                     offset += TypeSize.size(real_t)
 
+                type_.nbytes = offset
+
                 return type_
 
 
@@ -259,6 +295,9 @@ class TypeChecker:
         
 
     def for_expression(self, expr : Expression, etype : tp.Optional[Type] = None):
+        trampoline(self._for_expression(expr, etype))
+
+    def _for_expression(self, expr : Expression, etype : tp.Optional[Type] = None) -> Rec:
         type_ = None
 
         etype = self.resolve_type(etype)
@@ -283,7 +322,7 @@ class TypeChecker:
                 
                 arg_types = []
                 for arg in arguments: 
-                    self.for_expression(arg)
+                    yield self._for_expression(arg)
                     arg_types.append(arg.type_)
 
                 opsig = TypeChecker.op_signature(opname, arg_types)
@@ -316,12 +355,12 @@ class TypeChecker:
                         )
 
                 for i, a in enumerate(arguments):
-                    self.for_expression(a, atypes[i] if i in range(len(atypes)) else None)
+                    yield self._for_expression(a, atypes[i] if i in range(len(atypes)) else None)
 
                 type_ = retty
 
             case PrintExpression(e):
-                self.for_expression(e);
+                yield self._for_expression(e);
 
                 if e.type_ is not None:
                     if e.type_ not in (BasicType.INT, BasicType.BOOL):
@@ -335,12 +374,12 @@ class TypeChecker:
             case AllocExpression(alloctype, size):
                 real_alloctype = self.resolve_type(alloctype)
                 expr.alloctype = real_alloctype
-                self.for_expression(size, BasicType.INT)
+                yield self._for_expression(size, BasicType.INT)
 
                 type_ = PointerType(real_alloctype)
 
             case RefExpression(argument):
-                self.for_expression(argument)
+                yield self._for_expression(argument)
 
                 if argument.type_ == BasicType.NULL:
                     self.report(
@@ -352,7 +391,7 @@ class TypeChecker:
 
 
             case Assignable():
-                self.for_assignable(expr)
+                yield self._for_assignable(expr)
                 type_ = expr.type_
                 
 
@@ -373,6 +412,9 @@ class TypeChecker:
         """
         Computes and stores the type of an assignable object
         """
+        trampoline(self._for_assignable(assign))
+
+    def _for_assignable(self, assign : Assignable) -> Rec:
         type_ = None 
 
         match assign : 
@@ -380,7 +422,7 @@ class TypeChecker:
                 type_ = self.check_local_bound(name)
 
             case DerefAssignable(argument):
-                self.for_expression(argument)
+                yield self._for_expression(argument)
 
                 if not isinstance(argument.type_, PointerType) :
                     self.report(
@@ -392,8 +434,8 @@ class TypeChecker:
 
 
             case ArrayAssignable(argument, index):
-                self.for_expression(argument)
-                self.for_expression(index, BasicType.INT)
+                yield self._for_expression(argument)
+                yield self._for_expression(index, BasicType.INT)
 
                 correct_type = (isinstance(argument.type_, ArrayType) or 
                                 isinstance(argument.type_, PointerType)) 
@@ -417,7 +459,7 @@ class TypeChecker:
                 type_ = argument.type_.target
 
             case AttributeAssignable(argument, attribute):
-                self.for_expression(argument)
+                yield self._for_expression(argument)
                 if not isinstance(argument.type_, StructType):
                     self.report(
                         'illegal field access on non-struct type',
@@ -436,7 +478,7 @@ class TypeChecker:
                     type_ = attr_entry[1]
 
             case AttrPointerAssignable(argument, attribute):
-                self.for_expression(argument)
+                yield self._for_expression(argument)
                 if not (isinstance(argument.type_, PointerType) and
                         isinstance(argument.type_.target, StructType)):
                     self.report(
@@ -464,6 +506,9 @@ class TypeChecker:
         assign.type_ = type_
 
     def for_statement(self, stmt : Statement):
+        trampoline(self._for_statement(stmt))
+
+    def _for_statement(self, stmt : Statement) -> Rec:
         match stmt:
             case VarDeclStatement(name, init, type_):
                 real_type = self.resolve_type(type_)
@@ -475,7 +520,7 @@ class TypeChecker:
 
                 #check zero initialization for arrays and struct
                 if isinstance(real_type, ArrayType) or isinstance(real_type, StructType): 
-                    self.for_expression(init)
+                    yield self._for_expression(init)
                     
                     match init : 
                         case IntExpression(value = 0):
@@ -486,28 +531,32 @@ class TypeChecker:
                                 position = stmt.position,
                             )                
                 else: 
-                    self.for_expression(init, etype = real_type)
+                    yield self._for_expression(init, real_type)
 
             case AssignStatement(lhs, rhs):
-                self.for_assignable(lhs)
-                self.for_expression(rhs, etype = lhs.type_)
+                yield self._for_assignable(lhs)
+                yield self._for_expression(rhs, lhs.type_)
 
             case ExprStatement(expression):
-                self.for_expression(expression)
+                yield self._for_expression(expression)
 
             case BlockStatement(block):
-                self.for_block(block)
+                yield self._for_block(block)
 
-            case IfStatement(condition, iftrue, iffalse):
-                self.for_expression(condition, etype = BasicType.BOOL)
-                self.for_statement(iftrue)
-                if iffalse is not None:
-                    self.for_statement(iffalse)
+            case IfStatement():
+                # `else if` chains are walked iteratively
+                while isinstance(stmt, IfStatement):
+                    yield self._for_expression(stmt.condition, BasicType.BOOL)
+                    yield self._for_statement(stmt.then)
+                    stmt = stmt.else_
+
+                if stmt is not None:
+                    yield self._for_statement(stmt)
 
             case WhileStatement(condition, body):
-                self.for_expression(condition, etype = BasicType.BOOL)
+                yield self._for_expression(condition, BasicType.BOOL)
                 with self.in_loop():
-                    self.for_statement(body)
+                    yield self._for_statement(body)
 
             case BreakStatement() | ContinueStatement():
                 if self.loops == 0:
@@ -517,7 +566,7 @@ class TypeChecker:
                     )
 
             case PrintStatement(init):
-                self.for_expression(init, etype = BasicType.INT)
+                yield self._for_expression(init, BasicType.INT)
 
             case ReturnStatement(e):
                 
@@ -527,7 +576,7 @@ class TypeChecker:
                             'value-less return statement in a function',
                             position = stmt.position,
                         )
-                    self.for_expression(e, etype = self.proc.retty)
+                    yield self._for_expression(e, self.proc.retty)
                 else:
                     if self.proc.rettype is None:
                         self.report(
@@ -539,9 +588,12 @@ class TypeChecker:
                 assert(False)
 
     def for_block(self, block : Block):
+        trampoline(self._for_block(block))
+
+    def _for_block(self, block : Block) -> Rec:
         with self.scope.in_subscope():
             for stmt in block:
-                self.for_statement(stmt)
+                yield self._for_statement(stmt)
 
     def for_topdecl(self, decl : TopDecl):
         """
@@ -616,17 +668,26 @@ class TypeChecker:
                 return False
 
     def has_return(self, stmt: Statement):
+        return trampoline(self._has_return(stmt))
+
+    def _has_return(self, stmt: Statement) -> Rec:
         match stmt:
             case ReturnStatement(_):
                 return True
 
-            case IfStatement(_, iftrue, iffalse):
-                return \
-                    self.has_return(iftrue) and \
-                    self.has_return(iffalse)
+            case IfStatement():
+                while isinstance(stmt, IfStatement):
+                    if not (yield self._has_return(stmt.then)):
+                        return False
+                    stmt = stmt.else_
+
+                return (yield self._has_return(stmt))
 
             case BlockStatement(block):
-                return any(self.has_return(b) for b in block)
+                for b in block:
+                    if (yield self._has_return(b)):
+                        return True
+                return False
 
             case _:
                 return False
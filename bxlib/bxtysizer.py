@@ -4,27 +4,28 @@ class TypeSize :
     @staticmethod 
     def size(type_ : Type): 
         """
-        Compute and return the size of a type (IN BYTES)
+        Compute and return the size of a type (IN BYTES), cached in
+        type_.nbytes
         Only accepts already RESOLVED types 
         """
         if isinstance(type_, BasicType):
             return 8
 
-        size = 0
-
         match type_ : 
-            case PointerType(target):
-                size = 8
+            case PointerType():
+                return 8
 
             case ArrayType(target, size):
-                size = TypeSize.size(target) * size
+                if type_.nbytes is None:
+                    type_.nbytes = TypeSize.size(target) * size
+                return type_.nbytes
+
+            case StructType(attributes) if type_.nbytes is not None:
+                return type_.nbytes
 
-            case StructType(attributes):
-                for (a_name, (a_offset, a_type)) in type_.attr_lookup.items() : 
-                    size += TypeSize.size(a_type)
+            case StructType(attributes) if type_.attr_lookup is not None:
+                # Still being resolved (see TypeChecker.resolve_type)
+                return sum(TypeSize.size(a_type) for (a_offset, a_type) in type_.attr_lookup.values())
 
             case _ : 
                 raise ValueError("Input type must be resolved")
-                
-
-        return size
\ No newline at end of file
@@ -39,6 +39,10 @@ import types
 import copy
 import os
 import inspect
+import hashlib
+import pickle
+
+__tabversion__ = '4.0-bx1'
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -146,6 +150,87 @@ class Lexer:
             c.lexmodule = object
         return c
 
+    # ------------------------------------------------------------
+    # writetab() - Write lexer information to a table file
+    #
+    # Only plain data is saved (regex sources and rule names); the
+    # rules are bound back to their functions by readtab().
+    # ------------------------------------------------------------
+    def writetab(self, filename, signature):
+        data = {
+            'tabversion'   : __tabversion__,
+            'signature'    : signature,
+            'lextokens'    : self.lextokens,
+            'lexliterals'  : self.lexliterals,
+            'lexreflags'   : self.lexreflags,
+            'lexstateinfo' : self.lexstateinfo,
+            'lexstatere'   : {state: list(zip(self.lexstateretext[state], self.lexstaterenames[state]))
+                              for state in self.lexstatere},
+            'lexstateignore' : self.lexstateignore,
+            'lexstateerrorf' : {state: (ef.__name__ if ef else None)
+                                for state, ef in self.lexstateerrorf.items()},
+            'lexstateeoff'   : {state: (ef.__name__ if ef else None)
+                                for state, ef in self.lexstateeoff.items()},
+        }
+
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(tmpname, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        except OSError:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            return False
+        return True
+
+    # ------------------------------------------------------------
+    # readtab() - Read lexer information from a table file
+    #
+    # Returns False if the file is missing or stale, in which case
+    # the lexer must be built from the rules.
+    # ------------------------------------------------------------
+    def readtab(self, filename, signature, ldict, toknames):
+        try:
+            with open(filename, 'rb') as f:
+                data = pickle.load(f)
+        except Exception:
+            return False
+
+        if not isinstance(data, dict):
+            return False
+        if data.get('tabversion') != __tabversion__ or data.get('signature') != signature:
+            return False
+
+        self.lextokens      = data['lextokens']
+        self.lexliterals    = data['lexliterals']
+        self.lextokens_all  = self.lextokens | set(self.lexliterals)
+        self.lexreflags     = data['lexreflags']
+        self.lexstateinfo   = data['lexstateinfo']
+        self.lexstateignore = data['lexstateignore']
+
+        self.lexstatere = {}
+        self.lexstateretext = {}
+        self.lexstaterenames = {}
+        for state, relist in data['lexstatere'].items():
+            self.lexstatere[state] = [
+                (re.compile(text, self.lexreflags), _form_lexindexfunc(names, ldict, toknames))
+                for text, names in relist
+            ]
+            self.lexstateretext[state] = [text for text, _ in relist]
+            self.lexstaterenames[state] = [names for _, names in relist]
+
+        self.lexstateerrorf = {state: (ldict[name] if name else None)
+                               for state, name in data['lexstateerrorf'].items()}
+        self.lexstateeoff = {state: (ldict[name] if name else None)
+                             for state, name in data['lexstateeoff'].items()}
+
+        self.begin('INITIAL')
+        return True
+
     # ------------------------------------------------------------
     # input() - Push a new string into the lexer
     # ------------------------------------------------------------
@@ -340,6 +425,29 @@ def get_caller_module_dict(levels):
     f = sys._getframe(levels)
     return { **f.f_globals, **f.f_locals }
 
+# -----------------------------------------------------------------------------
+# _form_lexindexfunc()
+#
+# Build the index to function map for the matching engine from the
+# list of rule names attached to each group of a master regex.
+# -----------------------------------------------------------------------------
+def _form_lexindexfunc(names, ldict, toknames):
+    lexindexfunc = [None] * len(names)
+
+    for i, f in enumerate(names):
+        if f is None:
+            continue
+        handle = ldict.get(f, None)
+        if type(handle) in (types.FunctionType, types.MethodType):
+            lexindexfunc[i] = (handle, toknames[f])
+        elif handle is not None:
+            if f.find('ignore_') > 0:
+                lexindexfunc[i] = (None, None)
+            else:
+                lexindexfunc[i] = (None, toknames[f])
+
+    return lexindexfunc
+
 # -----------------------------------------------------------------------------
 # _form_master_re()
 #
@@ -434,6 +542,24 @@ class LexerReflect(object):
         self.validate_rules()
         return self.error
 
+    # Compute a hash of the lexer specification (tokens, literals,
+    # states and rules), suitable for naming a table file.
+    def signature(self):
+        parts = [
+            __tabversion__,
+            repr(self.reflags),
+            repr(list(self.tokens)),
+            repr(self.literals),
+            repr(sorted(self.stateinfo.items())),
+        ]
+        for state in sorted(self.stateinfo):
+            parts.append(repr([(name, _get_regex(f)) for name, f in self.funcsym[state]]))
+            parts.append(repr(self.strsym[state]))
+            parts.append(repr(self.ignore.get(state)))
+            parts.append(repr(getattr(self.errorf.get(state), '__name__', None)))
+            parts.append(repr(getattr(self.eoff.get(state), '__name__', None)))
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
     # Get the tokens map
     def get_tokens(self):
         tokens = self.ldict.get('tokens', None)
@@ -715,7 +841,8 @@ class LexerReflect(object):
 # Build all of the regular expression rules from definitions in the supplied module
 # -----------------------------------------------------------------------------
 def lex(*, module=None, object=None, debug=False, 
-        reflags=int(re.VERBOSE), debuglog=None, errorlog=None):
+        reflags=int(re.VERBOSE), debuglog=None, errorlog=None,
+        lextabdir=None):
 
     global lexer
 
@@ -748,6 +875,19 @@ def lex(*, module=None, object=None, debug=False,
     # Collect parser information from the dictionary
     linfo = LexerReflect(ldict, log=errorlog, reflags=reflags)
     linfo.get_all()
+
+    # If a table directory is given, try to reuse a previously built
+    # lexer table. This skips the validation of all the rules.
+    tabfile = None
+    if lextabdir is not None and not debug and not linfo.error:
+        signature = linfo.signature()
+        tabfile = os.path.join(lextabdir, 'lextab-%s.pickle' % signature)
+        if lexobj.readtab(tabfile, signature, ldict, linfo.toknames):
+            token = lexobj.token
+            input = lexobj.input
+            lexer = lexobj
+            return lexobj
+
     if linfo.validate_all():
         raise SyntaxError("Can't build lexer")
 
@@ -845,6 +985,10 @@ def lex(*, module=None, object=None, debug=False,
             if s not in linfo.ignore:
                 linfo.ignore[s] = linfo.ignore.get('INITIAL', '')
 
+    # Save the lexer table for the next run
+    if tabfile is not None:
+        lexobj.writetab(tabfile, signature)
+
     # Create global versions of the token() and input() functions
     token = lexobj.token
     input = lexobj.input
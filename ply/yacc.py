@@ -64,7 +64,10 @@
 import re
 import types
 import sys
+import os
 import inspect
+import hashlib
+import pickle
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -79,6 +82,8 @@ debug_file  = 'parser.out'     # Default name of the debugging file
 error_count = 3                # Number of symbols that must be shifted to leave recovery mode
 resultlimit = 40               # Size limit of results when running in debug mode.
 
+__tabversion__ = '4.0-bx1'     # Version of the cached parsing tables (see LRTableCache)
+
 MAXINT = sys.maxsize
 
 # This object is a stand-in for a logging object created by the
@@ -682,6 +687,34 @@ class Production(object):
         if self.func:
             self.callable = pdict[self.func]
 
+# -----------------------------------------------------------------------------
+# class MiniProduction
+#
+# A minimal production used by parsers restored from a table cache. Only the
+# attributes needed by LRParser.parse() are kept.
+# -----------------------------------------------------------------------------
+
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
 # -----------------------------------------------------------------------------
 # class LRItem
 #
@@ -1922,6 +1955,74 @@ class LRTable:
             goto[st] = st_goto
             st += 1
 
+# -----------------------------------------------------------------------------
+# class LRTableCache
+#
+# Parsing tables restored from (or saved to) an on-disk pickle. The file is
+# keyed by the grammar signature, so any change to the rules, precedence or
+# tokens yields a different file and the tables are simply rebuilt.
+# -----------------------------------------------------------------------------
+
+class LRTableCache:
+    def __init__(self, productions, action, goto):
+        self.lr_productions = productions
+        self.lr_action      = action
+        self.lr_goto        = goto
+
+    # Bind all production function names to callable objects in pdict
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
+    @staticmethod
+    def filename(tabledir, signature):
+        return os.path.join(tabledir, 'parsetab-%s.pickle' % signature)
+
+    # Read the tables from a file. Returns None if the file is missing,
+    # unreadable or was written for another grammar/table version.
+    @staticmethod
+    def read(filename, signature):
+        try:
+            with open(filename, 'rb') as f:
+                data = pickle.load(f)
+        except Exception:
+            return None
+
+        if not isinstance(data, dict):
+            return None
+        if data.get('tabversion') != __tabversion__ or data.get('signature') != signature:
+            return None
+
+        productions = [MiniProduction(*p) for p in data['productions']]
+        return LRTableCache(productions, data['action'], data['goto'])
+
+    # Write the tables of a freshly built LRTable. The file is written
+    # atomically so that concurrent processes never see a partial table.
+    @staticmethod
+    def write(filename, lr, signature):
+        data = {
+            'tabversion'  : __tabversion__,
+            'signature'   : signature,
+            'productions' : [(p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line)
+                             for p in lr.lr_productions],
+            'action'      : lr.lr_action,
+            'goto'        : lr.lr_goto,
+        }
+
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(tmpname, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        except OSError:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            return False
+        return True
+
 # -----------------------------------------------------------------------------
 #                            === INTROSPECTION ===
 #
@@ -2040,6 +2141,15 @@ class ParserReflect(object):
             pass
         return ''.join(parts)
 
+    # Compute a hash of the grammar signature suitable for naming a table
+    # cache file. The rule function names are included since the cached
+    # productions are bound back to them by name.
+    def table_signature(self):
+        parts = [__tabversion__, self.signature()]
+        for f in self.pfuncs or ():
+            parts.append(f[2])
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
     # -----------------------------------------------------------------------------
     # validate_modules()
     #
@@ -2270,7 +2380,7 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, tabledir=None):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2303,6 +2413,19 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # If a table directory is given, try to reuse previously built tables.
+    # This skips grammar validation and LALR table construction entirely.
+    tabfile = None
+    if tabledir is not None and not debug:
+        signature = pinfo.table_signature()
+        tabfile = LRTableCache.filename(tabledir, signature)
+        lr = LRTableCache.read(tabfile, signature)
+        if lr is not None:
+            lr.bind_callables(pinfo.pdict)
+            parser = LRParser(lr, pinfo.error_func)
+            parse = parser.parse
+            return parser
+
     if debuglog is None:
         if debug:
             try:
@@ -2474,6 +2597,10 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Save the tables for the next run
+    if tabfile is not None:
+        LRTableCache.write(tabfile, lr, signature)
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
@@ -0,0 +1,181 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Compile-time scaling benchmarks
+#
+# Every generator of test_gen.GENERATORS is run at several sizes (the
+# base size of the generator times each scale) and the resulting
+# program is compiled in-process, recording the time of each phase
+# of the compiler (as with `bxc.py --time-passes`).
+#
+# For two consecutive sizes n1 < n2 with times t1 & t2, the growth
+# exponent of a phase is log(t2/t1) / log(n2/n1): 1 is linear, 2 is
+# quadratic... Exponents do not depend much on the speed of the
+# machine, so they can be compared against the baselines stored in
+# bench_compile.json. A phase is flagged when its exponent exceeds
+# both the baseline and 1 (linear growth) by more than --tolerance.
+
+# --------------------------------------------------------------------
+import argparse
+import gc
+import json
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import test_gen
+
+from bxlib.bxerrors import DefaultReporter
+from bxlib.bxparser import Parser
+from bxlib.bxdriver import frontend, middleend, backend
+from bxlib.bxtiming import PassTimer
+
+# ====================================================================
+# Base sizes, chosen so that the smallest programs compile in a few ms
+
+SIZES = {
+    "many_procs"      : 50,
+    "deep_expression" : 25,
+    "straight_line"   : 500,
+    "nested_control"  : 10,
+    "many_structs"    : 10,
+    "pointer_depth"   : 50,
+}
+
+SCALES    = (1, 2, 4, 8)
+NOISE     = 2e-3                # Times below that (in s) are not compared
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_compile.json')
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--only", action = "append", choices = sorted(test_gen.GENERATORS),
+                        help = "only run the given generator (can be repeated)")
+    parser.add_argument("--scales", type = int, nargs = '+', default = SCALES,
+                        help = "sizes, as multiples of the base size of each generator")
+    parser.add_argument("--repeat", type = int, default = 3,
+                        help = "keep the best time of N runs (default: %(default)s)")
+    parser.add_argument("--tolerance", type = float, default = 0.35,
+                        help = "allowed excess of the growth exponents (default: %(default)s)")
+    parser.add_argument("--baselines", default = BASELINES,
+                        help = "baseline exponents (default: %(default)s)")
+    parser.add_argument("--save-baselines", action = "store_true",
+                        help = "store the measured exponents as the new baselines")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Measures
+
+def measure(parser: Parser, source: str, repeat: int) -> dict[str, float]:
+    """
+    Compiles `source` `repeat` times and returns the best wall time of
+    each phase (and of the whole compilation, as "total")
+    """
+    best = {}
+
+    for _ in range(repeat):
+        timer    = PassTimer()
+        reporter = DefaultReporter(source = source)
+
+        gc.collect()
+        start = time.perf_counter()
+
+        prgm = frontend(source, parser, reporter, timer)
+        if prgm is None:
+            raise ValueError('the generated program is invalid')
+        backend(middleend(prgm, timer = timer), timer = timer)
+
+        times = { r.phase: r.wall for r in timer.summary() }
+        times['total'] = time.perf_counter() - start
+
+        for phase, wall in times.items():
+            best[phase] = min(best.get(phase, math.inf), wall)
+
+    return best
+
+def exponents(sizes: list[int], times: list[dict[str, float]]) -> dict[str, float]:
+    """
+    Returns, for each phase, the largest growth exponent between two
+    consecutive sizes
+    """
+    result = {}
+
+    for (n1, t1), (n2, t2) in zip(zip(sizes, times), zip(sizes[1:], times[1:])):
+        for phase in t1.keys() & t2.keys():
+            if max(t1[phase], t2[phase]) < NOISE or t1[phase] <= 0:
+                continue
+            k = math.log(t2[phase] / t1[phase]) / math.log(n2 / n1)
+            result[phase] = max(result.get(phase, -math.inf), k)
+
+    return result
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args = parse_args()
+
+    try:
+        with open(args.baselines, 'r') as stream:
+            baselines = json.load(stream)
+    except (IOError, ValueError):
+        baselines = {}
+
+    parser   = Parser(reporter = DefaultReporter(source = ''))
+    measured = {}
+    flagged  = []
+
+    for name in args.only or test_gen.GENERATORS:
+        generator = test_gen.GENERATORS[name]
+        sizes     = [SIZES[name] * k for k in sorted(args.scales)]
+        times     = []
+
+        print(f'==== {name}')
+
+        for size in sizes:
+            source = '\n'.join(generator(size))
+
+            try:
+                times.append(measure(parser, source, args.repeat))
+            except (RecursionError, ValueError) as e:
+                print(f'{size:>8}  FAILED: {e!r}')
+                flagged.append((name, f'fails at size {size}'))
+                sizes = sizes[:len(times)]
+                break
+
+            phases = '  '.join(f'{k} {1000*v:.1f}' for k, v in times[-1].items() if k != 'total')
+            print(f'{size:>8}  {1000*times[-1]["total"]:>10.1f} ms   ({phases})')
+
+        measured[name] = exponents(sizes, times)
+
+        for phase, k in sorted(measured[name].items()):
+            baseline = baselines.get(name, {}).get(phase)
+            status   = ''
+            if k > max(1., baseline if baseline is not None else 1.) + args.tolerance:
+                status = '  <-- super-linear'
+                flagged.append((name, f'{phase} grows as n^{k:.2f}'))
+            print(f'{"":>8}  n^{k:.2f} {phase}' + ('' if baseline is None else f' (baseline n^{baseline:.2f})') + status)
+
+    if args.save_baselines:
+        baselines.update({ k: { p: round(x, 2) for p, x in v.items() } for k, v in measured.items() })
+        with open(args.baselines, 'w') as stream:
+            json.dump(baselines, stream, indent = 2, sort_keys = True)
+            stream.write('\n')
+
+    if flagged:
+        print()
+        for name, reason in flagged:
+            print(f'{name}: {reason}')
+        exit(1)
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,100 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# AST memory benchmark
+#
+# Parses large programs (the test_gen.GENERATORS at a large size) and
+# reports the memory retained by their ASTs (as traced by tracemalloc,
+# i.e. the memory still allocated once the parser is done, the AST
+# being alive), in MB and in bytes per AST node. With --flat, the
+# programs are parsed to flat ASTs (see bxlib/bxflatast.py).
+
+# --------------------------------------------------------------------
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import test_gen
+
+from bxlib.bxapi    import PARSERS
+from bxlib.bxerrors import DefaultReporter
+from bxlib.bxtiming import ast_size, ir_size
+
+SIZES = {
+    "many_procs"      : 2000,
+    "deep_expression" : 500,
+    "straight_line"   : 20000,
+    "nested_control"  : 200,
+    "many_structs"    : 500,
+    "pointer_depth"   : 1000,
+}
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--only", action = "append", choices = sorted(test_gen.GENERATORS),
+                        help = "only run the given generator (can be repeated)")
+    parser.add_argument("--scale", type = float, default = 1.0,
+                        help = "multiply the size of the programs by SCALE (default: %(default)s)")
+    parser.add_argument("--parser", choices = sorted(PARSERS), default = 'ply',
+                        help = "parser to use (default: %(default)s)")
+    parser.add_argument("--flat", action = "store_true",
+                        help = "parse to flat ASTs")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Measures
+
+def measure(parser, source: str, flat: bool) -> tuple[int, int]:
+    """
+    Returns the memory retained by the AST of `source` (in bytes) and
+    its number of nodes
+    """
+    parser.reset(DefaultReporter(source = source))
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        ast = parser.parse(source, flat = flat)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if ast is None:
+        raise RuntimeError('the program cannot be parsed')
+
+    return retained, ir_size(ast)[1] if flat else ast_size(ast)
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args   = parse_args()
+    names  = args.only or sorted(test_gen.GENERATORS)
+    parser = PARSERS[args.parser](reporter = DefaultReporter(source = ''))
+
+    # Builds (& warms) the parser before measuring
+    parser.parse('def main() { }')
+
+    print(f'{"generator":<16} {"nodes":>10} {"MB":>8} {"B/node":>8}')
+
+    for name in names:
+        size            = max(1, int(SIZES[name] * args.scale))
+        source          = '\n'.join(test_gen.GENERATORS[name](size))
+        retained, nodes = measure(parser, source, args.flat)
+
+        print(f'{name:<16} {nodes:>10} {retained / 2**20:>8.1f} {retained / nodes:>8.0f}')
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
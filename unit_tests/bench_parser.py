@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Parser throughput benchmark
+#
+# Parses large programs (the test_gen.GENERATORS at a large size) with
+# the PLY parser (bxparser.Parser) and the hand-written one
+# (bxrdparser.RDParser), and reports their throughput (best of several
+# runs) in KB & lines of source per second. The parsers are built (and
+# warmed) before being timed, as in the compile server.
+
+# --------------------------------------------------------------------
+import argparse
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import test_gen
+
+from bxlib.bxerrors   import DefaultReporter
+from bxlib.bxparser   import Parser
+from bxlib.bxrdparser import RDParser
+
+PARSERS = { 'ply': Parser, 'rd': RDParser }
+
+SIZES = {
+    "many_procs"      : 2000,
+    "deep_expression" : 500,
+    "straight_line"   : 20000,
+    "nested_control"  : 200,
+    "many_structs"    : 500,
+    "pointer_depth"   : 1000,
+}
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--only", action = "append", choices = sorted(test_gen.GENERATORS),
+                        help = "only run the given generator (can be repeated)")
+    parser.add_argument("--scale", type = float, default = 1.0,
+                        help = "multiply the size of the programs by SCALE (default: %(default)s)")
+    parser.add_argument("--repeat", type = int, default = 3,
+                        help = "keep the best time of N runs (default: %(default)s)")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Measures
+
+def measure(parser, source: str, repeat: int) -> float:
+    """
+    Returns the best wall time of parsing `source` with `parser`
+    """
+    best = float('inf')
+
+    for _ in range(repeat):
+        reporter = DefaultReporter(source = source)
+        parser.reset(reporter)
+
+        gc.collect()
+        start = time.perf_counter()
+        ast   = parser.parse(source)
+        best  = min(best, time.perf_counter() - start)
+
+        if ast is None:
+            raise RuntimeError('the program cannot be parsed')
+
+    return best
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args    = parse_args()
+    names   = args.only or sorted(test_gen.GENERATORS)
+    parsers = { k: v(reporter = DefaultReporter(source = '')) for k, v in PARSERS.items() }
+
+    print(f'{"generator":<16} {"KB":>8} {"lines":>8}', end = '')
+    for name in parsers:
+        print(f' {name + " (KB/s)":>12} {name + " (lines/s)":>14}', end = '')
+    print(f' {"speedup":>8}')
+
+    for name in names:
+        size   = max(1, int(SIZES[name] * args.scale))
+        source = '\n'.join(test_gen.GENERATORS[name](size))
+        kb     = len(source) / 1024
+        lines  = source.count('\n') + 1
+        times  = { k: measure(v, source, args.repeat) for k, v in parsers.items() }
+
+        print(f'{name:<16} {kb:>8.0f} {lines:>8}', end = '')
+        for t in times.values():
+            print(f' {kb / t:>12.0f} {lines / t:>14.0f}', end = '')
+        print(f' {times["ply"] / times["rd"]:>7.2f}x')
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,174 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Runtime benchmarks of the generated code
+#
+# Every program of unit_tests/bench/ is compiled with bxc.py (in a
+# temporary directory), run several times and its output is checked
+# against the `.expected` file next to it. The median wall time of the
+# runs is reported, together with the number of (user-space)
+# instructions executed when `perf` is available.
+#
+# Results can be saved as JSON (--save) and compared against a previous
+# run (--compare), so that the effect of a backend change is measured.
+
+# --------------------------------------------------------------------
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess as sp
+import sys
+import tempfile
+import time
+
+from typing import Optional as Opt
+
+ROOT  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.join(ROOT, 'unit_tests', 'bench')
+BXC   = os.path.join(ROOT, 'bxc.py')
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--only", action = "append",
+                        help = "only run the given benchmark (can be repeated)")
+    parser.add_argument("--repeat", type = int, default = 5,
+                        help = "number of runs of each benchmark (default: %(default)s)")
+    parser.add_argument("--save", metavar = 'FILE', default = None,
+                        help = "write the results as JSON to FILE")
+    parser.add_argument("--compare", metavar = 'FILE', default = None,
+                        help = "compare against results previously saved with --save")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Compile & run
+
+def build(name: str, workdir: str) -> bool:
+    source = os.path.join(BENCH, f'{name}.bx')
+    result = sp.run(
+        [sys.executable, BXC, '--no-cache', source],
+        cwd = workdir, stdout = sp.PIPE, stderr = sp.PIPE, text = True,
+    )
+    if result.returncode != 0:
+        print(result.stdout + result.stderr, end = '', file = sys.stderr)
+    return result.returncode == 0
+
+def run(exe: str) -> tuple[float, str]:
+    start  = time.perf_counter()
+    result = sp.run([exe], stdout = sp.PIPE, text = True)
+    wall   = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f'{exe} exited with status {result.returncode}')
+
+    return wall, result.stdout
+
+def instructions(exe: str) -> Opt[int]:
+    """
+    Returns the number of user-space instructions executed by `exe`,
+    or None if they cannot be counted (no `perf`, no permission...)
+    """
+    if shutil.which('perf') is None:
+        return None
+
+    result = sp.run(
+        ['perf', 'stat', '-x', ',', '-e', 'instructions:u', exe],
+        stdout = sp.DEVNULL, stderr = sp.PIPE, text = True,
+    )
+
+    for line in result.stderr.splitlines():
+        fields = line.split(',')
+        if len(fields) > 2 and fields[2].startswith('instructions'):
+            try:
+                return int(fields[0])
+            except ValueError:
+                return None
+
+    return None
+
+def benchmark(name: str, workdir: str, repeat: int) -> dict:
+    with open(os.path.join(BENCH, f'{name}.expected'), 'r') as stream:
+        expected = stream.read()
+
+    if not build(name, workdir):
+        return dict(ok = False, error = 'compilation failed')
+
+    exe   = os.path.join(workdir, f'{name}.exe')
+    times = []
+
+    for _ in range(repeat):
+        try:
+            wall, output = run(exe)
+        except RuntimeError as e:
+            return dict(ok = False, error = str(e))
+        if output != expected:
+            return dict(ok = False, error = 'wrong output')
+        times.append(wall)
+
+    return dict(
+        ok           = True,
+        median       = statistics.median(times),
+        min          = min(times),
+        instructions = instructions(exe),
+    )
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args  = parse_args()
+    names = args.only or sorted(
+        os.path.splitext(x)[0] for x in os.listdir(BENCH) if x.endswith('.bx')
+    )
+
+    previous = {}
+    if args.compare is not None:
+        try:
+            with open(args.compare, 'r') as stream:
+                previous = json.load(stream)
+        except (IOError, ValueError) as e:
+            print(f'cannot read results file {args.compare}: {e}')
+            exit(1)
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f'{"benchmark":<12} {"median (ms)":>12} {"min (ms)":>10} {"instructions":>16}')
+
+        for name in names:
+            result = results[name] = benchmark(name, workdir, args.repeat)
+
+            if not result['ok']:
+                print(f'{name:<12} FAILED: {result["error"]}')
+                continue
+
+            insns = '' if result['instructions'] is None else str(result['instructions'])
+            line  = f'{name:<12} {1000*result["median"]:>12.2f} {1000*result["min"]:>10.2f} {insns:>16}'
+
+            old = previous.get(name)
+            if old is not None and old.get('ok'):
+                line += f'   {100 * (result["median"] / old["median"] - 1):+6.1f}% time'
+                if result['instructions'] is not None and old.get('instructions'):
+                    line += f' {100 * (result["instructions"] / old["instructions"] - 1):+6.1f}% insns'
+
+            print(line)
+
+    if args.save is not None:
+        try:
+            with open(args.save, 'w') as stream:
+                json.dump(results, stream, indent = 2)
+        except IOError as e:
+            print(f'cannot write results file {args.save}: {e}')
+
+    if not all(x['ok'] for x in results.values()):
+        exit(1)
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Scope benchmark
+#
+# Times the two users of bxscope.Scope -- the type checker and the
+# maximal munch -- on deeply nested programs (test_gen.nested_control
+# at increasing depths), and the lookup of a variable bound in the
+# outermost of `depth` frames, the worst case of a scope search. The
+# times are the best of several runs; the type checker & MM times
+# include the work that does not depend on the scopes.
+
+# --------------------------------------------------------------------
+import argparse
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import test_gen
+
+from bxlib.bxerrors    import DefaultReporter
+from bxlib.bxmm        import MM
+from bxlib.bxparser    import Parser
+from bxlib.bxscope     import Scope
+from bxlib.bxtychecker import check as tycheck
+
+LOOKUPS = 100000
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--depth", type = int, action = "append",
+                        help = "nesting depth (can be repeated, default: 100, 200, 400, 800)")
+    parser.add_argument("--repeat", type = int, default = 3,
+                        help = "keep the best time of N runs (default: %(default)s)")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Measures
+
+def best_of(repeat: int, setup, run) -> float:
+    """
+    Returns the best wall time of `run(setup())`
+    """
+    best = float('inf')
+
+    for _ in range(repeat):
+        value = setup()
+
+        gc.collect()
+        start = time.perf_counter()
+        run(value)
+        best  = min(best, time.perf_counter() - start)
+
+    return best
+
+def measure_passes(parser, source: str, repeat: int) -> tuple[float, float]:
+    """
+    Returns the best wall times of type checking & munching `source`
+    """
+    reporter = DefaultReporter(source = source)
+
+    def parsed():
+        parser.reset(reporter)
+        return parser.parse(source)
+
+    def checked():
+        prgm = parsed()
+        if not tycheck(prgm, reporter = reporter):
+            raise RuntimeError('the program cannot be type checked')
+        return prgm
+
+    return (
+        best_of(repeat, parsed, lambda prgm: tycheck(prgm, reporter = reporter)),
+        best_of(repeat, checked, MM.mm),
+    )
+
+def measure_lookups(depth: int, repeat: int) -> float:
+    """
+    Returns the best wall time of LOOKUPS lookups of a variable bound
+    in the outermost of `depth` frames
+    """
+    def setup():
+        scope = Scope()
+        scope.push('x', 0)
+        for i in range(depth):
+            scope.open()
+            scope.push(f'x{i}', i)
+        return scope
+
+    def run(scope):
+        for _ in range(LOOKUPS):
+            scope['x']
+
+    return best_of(repeat, setup, run)
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args   = parse_args()
+    depths = args.depth or [100, 200, 400, 800]
+    parser = Parser(reporter = DefaultReporter(source = ''))
+
+    print(f'{"depth":>6} {"tycheck (ms)":>13} {"mm (ms)":>9} {"lookup (ns)":>12}')
+
+    for depth in depths:
+        source    = '\n'.join(test_gen.nested_control(depth))
+        tyck, mm  = measure_passes(parser, source, args.repeat)
+        lookup    = measure_lookups(depth, args.repeat)
+
+        print(f'{depth:>6} {tyck * 1e3:>13.1f} {mm * 1e3:>9.1f} {lookup / LOOKUPS * 1e9:>12.0f}')
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Startup-time budget of bxc.py
+#
+# Measures (median of several cold runs, as fresh processes):
+#
+#  - help        : `bxc.py --help`
+#  - cache-hit   : compiling an unchanged file to assembly, i.e. a hit
+#                  of the build cache;
+#  - first-phase : the time from the launch of `bxc.py` to the start of
+#                  its first compiler phase (parsing), taken from the
+#                  --time-passes-json records.
+#
+# Budgets are given as an overhead (in ms) over the startup time of a
+# bare interpreter (`python3 -c pass`), so that they do not depend much
+# on the speed of the machine. Exits with status 1 if a budget is
+# exceeded.
+
+# --------------------------------------------------------------------
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess as sp
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BXC  = os.path.join(ROOT, 'bxc.py')
+
+BUDGETS = {
+    'help'        : 100,
+    'cache-hit'   : 100,
+    'first-phase' : 150,
+}
+
+PROGRAM = """\
+def main() {
+    print(42);
+}
+"""
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--repeat", type = int, default = 11,
+                        help = "number of runs of each measure (default: %(default)s)")
+    parser.add_argument("--budget", action = "append", default = [], metavar = 'NAME=MS',
+                        help = "override the budget of a measure (e.g. help=80)")
+
+    aout = parser.parse_args()
+
+    aout.budgets = dict(BUDGETS)
+
+    for budget in aout.budget:
+        name, _, value = budget.partition('=')
+        if name not in BUDGETS:
+            parser.error(f'unknown measure: {name}')
+        try:
+            aout.budgets[name] = float(value)
+        except ValueError:
+            parser.error(f'invalid budget: {budget}')
+
+    return aout
+
+# ====================================================================
+# Measures
+
+def run(*args: str, cwd: str, env: dict[str, str]) -> float:
+    """
+    Runs a Python process and returns its wall time
+    """
+    start = time.perf_counter()
+    sp.run([sys.executable, *args], cwd = cwd, env = env, stdout = sp.DEVNULL, check = True)
+    return time.perf_counter() - start
+
+def first_phase(cwd: str, env: dict[str, str]) -> float:
+    """
+    Returns the time from the launch of bxc.py to its first phase
+    """
+    start = time.time()
+    sp.run(
+        [sys.executable, BXC, '--no-cache', '--emit', 'asm', '--time-passes-json', 'passes.json', 'prog.bx'],
+        cwd = cwd, env = env, stdout = sp.DEVNULL, stderr = sp.DEVNULL, check = True,
+    )
+
+    with open(os.path.join(cwd, 'passes.json'), 'r') as stream:
+        records = json.load(stream)['prog.bx']
+
+    return min(x['start'] for x in records) - start
+
+def measure(repeat: int, workdir: str) -> dict[str, float]:
+    env = dict(os.environ, BXC_CACHE_DIR = os.path.join(workdir, 'cache'))
+
+    with open(os.path.join(workdir, 'prog.bx'), 'w') as stream:
+        stream.write(PROGRAM)
+
+    # Warms the OS caches, the parser tables & the build cache
+    run(BXC, '--emit', 'asm', 'prog.bx', cwd = workdir, env = env)
+
+    measures = {
+        'bare'        : lambda: run('-c', 'pass', cwd = workdir, env = env),
+        'help'        : lambda: run(BXC, '--help', cwd = workdir, env = env),
+        'cache-hit'   : lambda: run(BXC, '--emit', 'asm', 'prog.bx', cwd = workdir, env = env),
+        'first-phase' : lambda: first_phase(workdir, env),
+    }
+
+    return {
+        name: statistics.median(f() for _ in range(repeat))
+        for name, f in measures.items()
+    }
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args = parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        times = measure(args.repeat, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors = True)
+
+    bare = times.pop('bare')
+    ok   = True
+
+    print(f'bare interpreter: {1000*bare:.1f} ms')
+    print(f'{"measure":<12} {"time (ms)":>10} {"overhead":>10} {"budget":>10}')
+
+    for name, value in times.items():
+        overhead = 1000 * (value - bare)
+        budget   = args.budgets[name]
+        status   = '' if overhead <= budget else '  <-- over budget'
+        ok       = ok and not status
+        print(f'{name:<12} {1000*value:>10.1f} {overhead:>10.1f} {budget:>10.1f}{status}')
+
+    if not ok:
+        exit(1)
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,232 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Test of the TAC files (bxtacio.py)
+#
+#  - the TAC of every BX program of unit_tests/ (and its sub-directories)
+#    and of the test_gen.GENERATORS, at both stages, is saved & loaded
+#    again in both formats, and must be unchanged;
+#  - the MALFORMED .jtac files, and binary files with invalid opcodes,
+#    shapes or operands, must be rejected with a ValueError;
+#  - mutants of the saved files (a byte changed at a random place) must
+#    either load, or be rejected with a ValueError -- never with another
+#    exception;
+#  - bxc.py must reject the MALFORMED .jtac files without a traceback.
+#
+# Exits with status 1 on failures.
+
+# --------------------------------------------------------------------
+import argparse
+import array
+import glob
+import os
+import random
+import subprocess as sp
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import test_gen
+
+from bxlib.bxapi   import CompileOptions, compile_source
+from bxlib.bxctac  import CompactProc, STRIDE
+from bxlib.bxtacio import FORMATS, STAGES, dumps, loads
+
+SIZES = (1, 5)
+
+# Header of the JSON-lines files
+HEADER = '{"format":"bxtac","version":1,"stage":"opt"}\n'
+
+def _proc(*tac: str, temp_sizes: str = '{}') -> str:
+    return (
+        '{"proc":"main","arguments":[],"temp_sizes":%s,"counter":4,"tac":[%s]}\n'
+        % (temp_sizes, ','.join(tac))
+    )
+
+MALFORMED = {
+    'missing-argument'  : _proc('{"opcode":"jmp","args":[],"result":null}'),
+    'extra-argument'    : _proc('{"opcode":"copy","args":["%0","%1"],"result":"%2"}'),
+    'missing-result'    : _proc('{"opcode":"add","args":["%0","%1"],"result":null}'),
+    'const-3-arguments' : _proc('{"opcode":"const","args":[1,"%0","%1"],"result":null}'),
+    'unknown-opcode'    : _proc('{"opcode":"frobnicate","args":[],"result":null}'),
+    'invalid-operand'   : _proc('{"opcode":"const","args":["1"],"result":"%0"}'),
+    'invalid-address'   : _proc('{"opcode":"load","args":[["%0"]],"result":"%1"}'),
+    'invalid-result'    : _proc('{"opcode":"copy","args":["%0"],"result":3}'),
+    'invalid-size'      : _proc(temp_sizes = '{"%0":12}'),
+    'not-a-declaration' : '["proc","main"]\n',
+    'not-an-instruction': _proc('42'),
+    'not-a-proc'        : '{"procedure":"main"}\n',
+}
+
+# Program whose binary TAC is corrupted (see bin_malformed)
+SMALL = 'def main() { var x = 1 : int; print(x + x); }'
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--mutants", type = int, default = 20,
+                        help = "number of mutants of each saved file (default: %(default)s)")
+    parser.add_argument("--seed", type = int, default = 0,
+                        help = "seed of the mutations (default: %(default)s)")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Programs
+
+def programs():
+    """
+    Yields the (name, source) of the programs to save the TAC of
+    """
+    for filename in sorted(glob.glob(os.path.join(ROOT, 'unit_tests', '**', '*.bx'), recursive = True)):
+        with open(filename, 'r') as stream:
+            yield os.path.relpath(filename, ROOT), stream.read()
+
+    for name, generator in sorted(test_gen.GENERATORS.items()):
+        for size in SIZES:
+            yield f'{name}({size})', '\n'.join(generator(size))
+
+# ====================================================================
+# Checks
+
+def check_roundtrip(name: str, tac: list, format: str, stage: str) -> bool:
+    data = dumps(tac, format, stage)
+
+    lstage, ltac = loads(data)
+
+    if lstage != stage or list(map(repr, ltac)) != list(map(repr, tac)):
+        print(f'ROUNDTRIP: {name} [{format}, {stage}]')
+        return False
+
+    return True
+
+def check_rejected(name: str, data: bytes, must_fail: bool) -> bool:
+    try:
+        loads(data)
+    except ValueError:
+        return True
+    except Exception as e:
+        print(f'UNCAUGHT: {name}: {type(e).__name__}: {e}')
+        return False
+
+    if must_fail:
+        print(f'ACCEPTED: {name}')
+        return False
+
+    return True
+
+def bin_malformed():
+    """
+    Yields the (name, contents) of binary TAC files whose instruction
+    arrays are corrupted
+    """
+    proc = compile_source(SMALL, 'tac').tac[-1]
+    data = dumps([proc], 'bin')
+    size = len(CompactProc.of_proc(proc))
+
+    # The arrays of the last procedure end the file
+    at = len(data) - size * (2 + 8 * STRIDE)
+
+    def patched(ops = {}, shapes = {}, operands = {}) -> bytes:
+        bops      = bytearray(data[at:at+size])
+        bshapes   = bytearray(data[at+size:at+2*size])
+        aoperands = array.array('q', data[at+2*size:])
+
+        if sys.byteorder != 'little':
+            aoperands.byteswap()
+
+        for target, values in ((bops, ops), (bshapes, shapes), (aoperands, operands)):
+            for i, x in values.items():
+                target[i] = x
+
+        if sys.byteorder != 'little':
+            aoperands.byteswap()
+
+        return data[:at] + bytes(bops) + bytes(bshapes) + aoperands.tobytes()
+
+    # Instruction 0 is the entry label, instruction 1 is `%1 = const 1`
+    yield 'bin-unknown-opcode'  , patched(ops = { 1: 200 })
+    yield 'bin-unknown-bits'    , patched(shapes = { 1: 0x35 })
+    yield 'bin-extra-argument'  , patched(shapes = { 1: 0x7 })
+    yield 'bin-missing-result'  , patched(shapes = { 1: 0x1 })
+    yield 'bin-label-range'     , patched(operands = { 0: 10**6 })
+    yield 'bin-symbol-range'    , patched(operands = { 2*STRIDE-1: 10**6 })
+    yield 'bin-negative-symbol' , patched(operands = { 2*STRIDE-1: -1 })
+
+def mutants(data: bytes, count: int, rng: random.Random):
+    for i in range(count):
+        at = rng.randrange(len(data))
+        yield f'byte@{at}', data[:at] + bytes([rng.randrange(256)]) + data[at+1:]
+
+def check_bxc(name: str, contents: str, tmpdir: str) -> bool:
+    filename = os.path.join(tmpdir, f'{name}.jtac')
+
+    with open(filename, 'w') as stream:
+        stream.write(HEADER + contents)
+
+    process = sp.run(
+        [sys.executable, os.path.join(ROOT, 'bxc.py'), '--no-cache', filename],
+        cwd = tmpdir, capture_output = True, text = True,
+    )
+
+    if process.returncode == 0 or 'Traceback' in process.stdout + process.stderr:
+        print(f'BXC: {name}: exit status {process.returncode}')
+        print(process.stdout + process.stderr)
+        return False
+
+    return True
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args = parse_args()
+    rng  = random.Random(args.seed)
+
+    # The generators use the global random state
+    random.seed(args.seed)
+
+    total, failures = 0, 0
+
+    def record(ok: bool):
+        nonlocal total, failures
+        total += 1
+        failures += not ok
+
+    for name, source in programs():
+        for stage in STAGES:
+            result = compile_source(source, 'tac', CompileOptions(optimize = stage == 'opt'))
+
+            if not result.ok:
+                continue
+
+            for format in FORMATS:
+                record(check_roundtrip(name, result.tac, format, stage))
+
+                data = dumps(result.tac, format, stage)
+                for mname, mdata in mutants(data, args.mutants, rng):
+                    record(check_rejected(f'{name} [{format}, {stage}, {mname}]', mdata, False))
+
+    for name, contents in MALFORMED.items():
+        record(check_rejected(name, (HEADER + contents).encode('utf-8'), True))
+
+    for name, contents in bin_malformed():
+        record(check_rejected(name, contents, True))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, contents in MALFORMED.items():
+            record(check_bxc(name, contents, tmpdir))
+
+    print(f'{total} checks, {failures} failures')
+
+    if failures:
+        exit(1)
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
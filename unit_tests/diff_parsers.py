@@ -0,0 +1,151 @@
+#! /usr/bin/env python3
+
+# --------------------------------------------------------------------
+# Differential test of the hand-written parser (bxrdparser.RDParser)
+# against the PLY parser (bxparser.Parser)
+#
+# Both parsers are run on:
+#
+#  - every BX program of unit_tests/ (and its sub-directories);
+#  - the programs of the test_gen.GENERATORS, at a few sizes;
+#  - mutants of all these programs (a character deleted, duplicated or
+#    inserted at a random place), that are mostly invalid programs.
+#
+# and must produce equal ASTs (positions included) and the same
+# diagnostics. Exits with status 1 on the first mismatches.
+
+# --------------------------------------------------------------------
+import argparse
+import glob
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import test_gen
+
+from bxlib.bxerrors   import CollectingReporter
+from bxlib.bxparser   import Parser
+from bxlib.bxrdparser import RDParser
+
+SIZES     = (1, 5, 20)
+MUTATIONS = '(){}[];:,.=+-*&|!<>~^% \nx0'
+
+# ====================================================================
+# Parse command line arguments
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog = os.path.basename(sys.argv[0]))
+
+    parser.add_argument("--mutants", type = int, default = 20,
+                        help = "number of mutants of each program (default: %(default)s)")
+    parser.add_argument("--seed", type = int, default = 0,
+                        help = "seed of the mutations (default: %(default)s)")
+    parser.add_argument("--max-failures", type = int, default = 10,
+                        help = "stop after N mismatches (default: %(default)s)")
+    parser.add_argument("-v", "--verbose", action = "store_true",
+                        help = "print the ASTs/diagnostics of the mismatches")
+
+    return parser.parse_args()
+
+# ====================================================================
+# Programs
+
+def programs():
+    """
+    Yields the (name, source) of the programs to compare the parsers on
+    """
+    for filename in sorted(glob.glob(os.path.join(ROOT, 'unit_tests', '**', '*.bx'), recursive = True)):
+        with open(filename, 'r') as stream:
+            yield os.path.relpath(filename, ROOT), stream.read()
+
+    for name, generator in sorted(test_gen.GENERATORS.items()):
+        for size in SIZES:
+            yield f'{name}({size})', '\n'.join(generator(size))
+
+def mutants(source: str, count: int, rng: random.Random):
+    for i in range(count):
+        at = rng.randrange(len(source) + 1)
+
+        match rng.randrange(3):
+            case 0:
+                yield f'delete@{at}', source[:at] + source[at+1:]
+            case 1:
+                yield f'duplicate@{at}', source[:at] + source[at:at+1] + source[at:]
+            case _:
+                c = rng.choice(MUTATIONS)
+                yield f'insert-{c!r}@{at}', source[:at] + c + source[at:]
+
+# ====================================================================
+# Comparison
+
+def run(parser, source: str):
+    """
+    Returns the AST (None on errors), the diagnostics & the exception
+    (e.g. failed assertion) raised by `parser` on `source`
+    """
+    reporter = CollectingReporter(source = source)
+    parser.reset(reporter)
+
+    try:
+        ast, error = parser.parse(source), None
+    except Exception as e:
+        ast, error = None, type(e).__name__
+
+    return ast, reporter.diagnostics, error
+
+def compare(plyparser: Parser, rdparser: RDParser, name: str, source: str, verbose: bool) -> bool:
+    expected = run(plyparser, source)
+    actual   = run(rdparser , source)
+
+    if expected == actual:
+        return True
+
+    print(f'MISMATCH: {name}')
+
+    if verbose:
+        for label, (ast, diagnostics, error) in (('ply', expected), ('rd', actual)):
+            print(f'  {label}: error = {error}')
+            for diagnostic in diagnostics:
+                print(f'  {label}: {diagnostic}')
+            print(f'  {label}: {ast!r}')
+
+    return False
+
+# ====================================================================
+# Main entry point
+
+def _main():
+    args = parse_args()
+    rng  = random.Random(args.seed)
+
+    # The generators use the global random state
+    random.seed(args.seed)
+
+    plyparser = Parser  (reporter = CollectingReporter(source = ''))
+    rdparser  = RDParser(reporter = CollectingReporter(source = ''))
+
+    total, failures = 0, 0
+
+    for name, source in programs():
+        for mname, msource in [(name, source), *(
+            (f'{name} [{x}]', y) for x, y in mutants(source, args.mutants, rng)
+        )]:
+            total += 1
+            if not compare(plyparser, rdparser, mname, msource, args.verbose):
+                failures += 1
+                if failures >= args.max_failures:
+                    break
+        if failures >= args.max_failures:
+            break
+
+    print(f'{total} programs, {failures} mismatches')
+
+    if failures:
+        exit(1)
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    _main()
@@ -7,34 +7,46 @@ def make_main(commands):
 
     return ["def main(){"] + commands + ["}"]
 
-def pointer_decl(output_file):
+def write_program(output_file, lines):
+    with open(output_file, "w") as file : 
+        file.write("\n".join(lines))
+
+
+
+def pointer_decl(output_file, depth = 50):
     """
     Outputs many pointer var declarations
     """
+
+    write_program(output_file, make_main(pointer_decl_lines(depth)))
+
+def pointer_decl_lines(depth = 50):
     output = []
 
     t1 = "int"
     t2 = "bool"
 
-    for i in range(50):
+    for i in range(depth):
         output.append(f"\tvar x{i} = null : {t1};")
         output.append(f"\tvar y{i} = null : {t2};")
 
         t1 += "*"
         t2 += "*"
 
-    with open(output_file, "w") as file : 
-        file.write("\n".join(make_main(output)))
+    return output
 
 
 
-def pointer_assign(output_file):
+def pointer_assign(output_file, depth = 20, width = 50):
     """
     Outputs many pointer assignments
     """
 
+    write_program(output_file, make_main(pointer_assign_lines(depth, width)))
+
+def pointer_assign_lines(depth = 20, width = 50):
     output = []
-    var_names = [f"a{i}" for i in range(50)]
+    var_names = [f"a{i}" for i in range(width)]
     star_suffix = ""
 
     #define many dummy ints 
@@ -43,7 +55,7 @@ def pointer_assign(output_file):
 
 
     #define pointers to those dummy vars
-    for i in range(20):
+    for i in range(depth):
         
         output.append("\n\n")
         star_suffix += "*"
@@ -51,8 +63,114 @@ def pointer_assign(output_file):
         for var_name in var_names : 
             output.append(f"\tvar {var_name}{'p' * (i+1)} = &{var_name}{'p' * (len(star_suffix) -1)} : int{star_suffix};")
 
-    with open(output_file, "w") as file : 
-        file.write("\n".join(make_main(output)))
+    return output
+
+
+
+# --------------------------------------------------------------------
+# Parameterised stress programs, used by bench_compile.py
+#
+# Each generator takes a size and returns the lines of a program whose
+# size (in AST nodes) grows linearly with it, except for pointer_depth
+# whose types (and thus source) grow quadratically.
+
+def many_procs(n):
+    """
+    Outputs n small procedures, all called from main
+    """
+
+    output = []
+
+    for i in range(n):
+        output.append(f"def f{i}(x : int) : int {{")
+        output.append(f"\tvar y = x * {i} + 1 : int;")
+        output.append("\twhile (y > 100) {")
+        output.append("\t\tif (y % 3 == 0) { y = y - 1; } else { y = y / 2; }")
+        output.append("\t}")
+        output.append("\treturn y;")
+        output.append("}")
+
+    return output + make_main(
+        ["\tvar s = 0 : int;"] + [f"\ts = s + f{i}({i});" for i in range(n)] + ["\tprint(s);"]
+    )
+
+def deep_expression(n):
+    """
+    Outputs a single expression nested n times
+    """
+
+    expr = "x"
+
+    for i in range(n):
+        expr = f"({expr} {'+-*'[i % 3]} {i % 7 + 1})"
+
+    return make_main(["\tvar x = 1 : int;", f"\tx = {expr};", "\tprint(x);"])
+
+def straight_line(n):
+    """
+    Outputs a single basic block of n assignments
+    """
+
+    output = [f"\tvar v{i} = {i} : int;" for i in range(10)]
+
+    for i in range(n):
+        output.append(f"\tv{i % 10} = v{(i + 3) % 10} + v{(i + 7) % 10} * {i % 5 + 1};")
+
+    return make_main(output + ["\tprint(v0);"])
+
+def nested_control(n):
+    """
+    Outputs n nested while loops & conditionals
+    """
+
+    output = ["\tvar x = 0 : int;"]
+
+    for i in range(n):
+        indent = "\t" * (i + 1)
+        if i % 2 == 0:
+            output.append(f"{indent}var c{i} = 1 : int;")
+            output.append(f"{indent}while (c{i} > 0) {{")
+            output.append(f"{indent}\tc{i} = c{i} - 1;")
+        else:
+            output.append(f"{indent}if (x % {i + 1} == 0) {{ x = x + 1; }} else if (x > {i}) {{")
+
+    for i in reversed(range(n)):
+        output.append("\t" * (i + 1) + "}")
+
+    return make_main(output + ["\tprint(x);"])
+
+def many_structs(n):
+    """
+    Outputs n struct typedefs, each one embedding the previous one
+    """
+
+    output = ["type s0 = struct { a : int, b : bool };"]
+
+    for i in range(1, n):
+        output.append(f"type s{i} = struct {{ a : int, prev : s{i-1}, next : s{i}* }};")
+
+    body = []
+    for i in range(n):
+        body.append(f"\tvar x{i} = 0 : s{i};")
+        body.append(f"\tx{i}.a = {i};")
+
+    return output + make_main(body + [f"\tprint(x{n-1}.a);"])
+
+def pointer_depth(n):
+    """
+    Outputs pointer declarations up to depth n
+    """
+
+    return make_main(pointer_decl_lines(n))
+
+GENERATORS = {
+    "many_procs"      : many_procs,
+    "deep_expression" : deep_expression,
+    "straight_line"   : straight_line,
+    "nested_control"  : nested_control,
+    "many_structs"    : many_structs,
+    "pointer_depth"   : pointer_depth,
+}
 
 
 